@@ -1,5 +1,14 @@
 from .client import AppNexusClient, client, connect, connect_from_file, find
-from .model import *
+from .model import Model, Relation, services_list
+
+
+def __getattr__(name):
+    """Give access to the models, which are created on first access"""
+    if name in services_list:
+        return getattr(model, name)
+    raise AttributeError("module '{}' has no attribute '{}'".format(
+        __name__, name))
+
 
 __all__ = ["AppNexusClient", "Model", "client", "connect", "connect_from_file",
            "find", "services_list"] + services_list
@@ -0,0 +1,437 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from appnexus.client import AppNexusClient, _unset
+from appnexus.cursor import Cursor
+from appnexus.exceptions import (AppNexusException, BadCredentials, NoAuth,
+                                 RateExceeded, ServerError)
+from appnexus.utils import BufferedResponse
+
+try:
+    import aiohttp
+except ImportError:  # pragma: nocover
+    aiohttp = None
+
+logger = logging.getLogger("appnexus-client")
+
+
+class AsyncAppNexusClient(AppNexusClient):
+    """Represents an active connection to the AppNexus API, for asyncio
+
+    It exposes the same interface as :class:`AppNexusClient`, except that
+    methods sending requests are coroutines and `find` returns an
+    :class:`AsyncCursor`. `bulk_write` and the compact representation are
+    only supported by :class:`AppNexusClient`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        if aiohttp is None:
+            raise ImportError("aiohttp is required to use AsyncAppNexusClient")
+        super(AsyncAppNexusClient, self).__init__(*args, **kwargs)
+        self._token_lock = None
+        # Requests are only coalesced between threads
+        self.single_flight = None
+        self.batcher = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def __enter__(self):
+        raise TypeError("use 'async with' with an AsyncAppNexusClient")
+
+    def __exit__(self, *exc_info):  # pragma: nocover
+        pass
+
+    def _create_session(self):
+        connector = aiohttp.TCPConnector(limit=self.pool_size)
+        return aiohttp.ClientSession(connector=connector)
+
+    async def close(self):
+        """Close the connections kept alive by the client"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def token_lock(self):
+        if self._token_lock is None:
+            self._token_lock = asyncio.Lock()
+        return self._token_lock
+
+    async def _request(self, method, uri, **kwargs):
+        """Send an HTTP request and read its whole response"""
+        async with self.session.request(method, uri, **kwargs) as response:
+            content = await response.read()
+            return BufferedResponse(response.status, response.headers,
+                                    content)
+
+    async def _handle_rate_exceeded(self, response, default_waiting_time=10):
+        """Handles rate exceeded errors"""
+        waiting_time = int(response.headers.get("Retry-After",
+                                                default_waiting_time))
+        await asyncio.sleep(waiting_time)
+
+    async def _wait_for_rate_limiter(self, method, service_name=None):
+        """Wait until the rate limiter allows a request with `method`"""
+        if self.rate_limiter is not None:
+            waiting_time = self.rate_limiter.reserve(method)
+            if waiting_time:
+                await asyncio.sleep(waiting_time)
+                self._emit("rate_limited", service_name, method,
+                           source="limiter", waiting_time=waiting_time)
+
+    def _failure_reason(self, error):
+        """The reason of a retry for a request exception, None if the
+        exception isn't transient
+        """
+        if isinstance(error, getattr(aiohttp, "ConnectionTimeoutError", ())):
+            return "CONNECT_TIMEOUT"
+        if isinstance(error, aiohttp.ClientSSLError):
+            return None
+        if isinstance(error, aiohttp.ClientConnectorError):
+            return "CONNECT_ERROR"
+        if isinstance(error, asyncio.TimeoutError):
+            return "TIMEOUT"
+        if isinstance(error, aiohttp.ClientConnectionError):
+            return "CONNECTION_ERROR"
+
+    def _timeout(self):
+        """The timeouts of the retry policy, for aiohttp"""
+        timeout = self.retry_policy.timeout
+        if not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+        return aiohttp.ClientTimeout(total=None, sock_connect=timeout[0],
+                                     sock_read=timeout[1])
+
+    async def _send(self, method, service_name, data=None, **kwargs):
+        """Send a request to the AppNexus API (used for internal routing)
+
+        :param method: The HTTP method of the request
+        :type method: str
+        :param service_name: The target service
+        :param data: The payload of the request (optionnal)
+        :type data: anything JSON-serializable
+
+        Transient failures are retried as the client's `retry_policy`
+        decides.
+        """
+        policy = self.retry_policy
+        raw = kwargs.pop("raw", False)
+        # Appending twice would add the elements twice
+        idempotent = False if kwargs.get("append") else None
+        uri = self._request_uri(service_name, kwargs)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            expires_in = self._token_expires_in()
+            if expires_in < self.token_refresh_margin and (
+                    expires_in <= 0 or not self.token_lock.locked()):
+                await self.update_token(expired_token=self.token)
+            token = self.token
+            headers = dict(Authorization=token)
+            logger.debug("%s %s", method, uri)
+
+            policy.before_request(service_name)
+            await self._wait_for_rate_limiter(method, service_name)
+            self._emit("request", service_name, method, uri=uri,
+                       attempt=attempt)
+            started = time.perf_counter()
+            try:
+                response = await self._request(method, uri, headers=headers,
+                                               json=data,
+                                               timeout=self._timeout())
+            except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                reason = self._failure_reason(error)
+                delay = reason and self._retry_delay(
+                    service_name, method, uri, attempt, reason, idempotent)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._emit("response", service_name, method, uri=uri,
+                       attempt=attempt, status_code=response.status_code,
+                       elapsed=time.perf_counter() - started,
+                       bytes=len(response.content))
+            content_type = response.headers["Content-Type"].split(";")[0]
+
+            reason = policy.status_reason(response.status_code)
+            if reason is None:
+                policy.record_success(service_name)
+            else:
+                delay = self._retry_delay(service_name, method, uri, attempt,
+                                          reason, idempotent)
+                if delay is not None:
+                    await asyncio.sleep(delay)
+                    continue
+                if content_type != "application/json":
+                    raise ServerError(response)
+
+            if response.content and content_type == "application/json":
+                response_data = response.json()
+                if "response" in response_data:
+                    response_data = response_data["response"]
+            elif response.content:
+                return response.content
+            else:
+                return None
+
+            try:
+                self.check_errors(response, response_data)
+            except RateExceeded:
+                self._emit("rate_limited", service_name, method, source="api",
+                           waiting_time=response.headers.get("Retry-After"))
+                self._emit("retry", service_name, method, uri=uri,
+                           attempt=attempt, reason="RATE_EXCEEDED")
+                await self._handle_rate_exceeded(response)
+            except NoAuth:
+                self._emit("retry", service_name, method, uri=uri,
+                           attempt=attempt, reason="NOAUTH")
+                await self.update_token(expired_token=token)
+            else:
+                break
+        if raw:
+            return response.json()
+        return response_data
+
+    async def update_token(self, expired_token=_unset):
+        """Request a new token and store it for future use
+
+        Concurrent requests failing with the same expired token share a single
+        authentication: once the first one got a new token, the others reuse
+        it instead of authenticating again.
+        """
+        async with self.token_lock:
+            if expired_token is not _unset and self.token != expired_token:
+                return self.token
+            logger.info('updating token')
+            if None in self.credentials.values():
+                raise RuntimeError("You must provide an username and a "
+                                   "password")
+            credentials = dict(auth=self.credentials)
+            await self._wait_for_rate_limiter("auth", "auth")
+            started = time.perf_counter()
+            response = await self._request("POST", self.base_url + "auth",
+                                           json=credentials)
+            data = response.json()["response"]
+            if "error_id" in data and data["error_id"] == "NOAUTH":
+                raise BadCredentials()
+            if "error_code" in data and data["error_code"] == "RATE_EXCEEDED":
+                await self._handle_rate_exceeded(response,
+                                                 default_waiting_time=150)
+                return
+            if "error_code" in data or "error_id" in data:
+                raise AppNexusException(response)
+            self._set_token(data["token"])
+            self.save_token()
+            self._emit("token_refresh", "auth", "POST",
+                       elapsed=time.perf_counter() - started)
+            return self.token
+
+    async def get(self, service_name, **kwargs):
+        """Retrieve data from AppNexus API"""
+        if not self._cached(service_name):
+            return await self._send("GET", service_name, **kwargs)
+        parameters = {key: value for key, value in kwargs.items()
+                      if key != "prepared"}
+        response = self.cache.get(service_name, parameters)
+        if response is None:
+            generation = self.cache.generation(service_name)
+            response = await self._send("GET", service_name, **kwargs)
+            self.cache.set(service_name, parameters, response, generation)
+        return response
+
+    async def modify(self, service_name, json, **kwargs):
+        """Modify an AppNexus object"""
+        try:
+            return await self._send("PUT", service_name, json, **kwargs)
+        finally:
+            self._after_write(service_name)
+
+    async def create(self, service_name, json, **kwargs):
+        """Create a new AppNexus object"""
+        try:
+            return await self._send("POST", service_name, json, **kwargs)
+        finally:
+            self._after_write(service_name)
+
+    async def delete(self, service_name, *ids, **kwargs):
+        """Delete an AppNexus object"""
+        try:
+            return await self._send("DELETE", service_name, id=ids, **kwargs)
+        finally:
+            self._after_write(service_name)
+
+    async def append(self, service_name, json, **kwargs):
+        kwargs.update({"append": True})
+        return await self.modify(service_name, json, **kwargs)
+
+    def bulk_write(self, *args, **kwargs):
+        raise TypeError("bulk_write isn't supported by AsyncAppNexusClient, "
+                        "gather the coroutines of create, modify and delete "
+                        "instead")
+
+    async def meta(self, service_name):
+        """Retrieve meta-informations about a service"""
+        return await self.get(service_name + "/meta")
+
+    def find(self, service_name, arguments=None, representation=None,
+             **kwargs):
+        representation = representation or self.representation
+        args = arguments.copy() if arguments else dict()
+        args.update(kwargs)
+        return AsyncCursor(self, service_name, representation, **args)
+
+
+class AsyncCursor(Cursor):
+    """Represents a cursor on collection of AppNexus objects, for asyncio
+
+    Iterate over it with ``async for``; indexes, `count`, `size` and `first`
+    must be awaited. Slices, adaptive batch sizes, streaming, prefetching,
+    columns and exports are only supported by :class:`Cursor`.
+    """
+
+    def __iter__(self):
+        raise TypeError("use 'async for' to iterate over an AsyncCursor")
+
+    def __len__(self):
+        raise TypeError("use 'await cursor.count()' on an AsyncCursor")
+
+    async def __getitem__(self, idx):
+        """Returns the nth element matching the specifications"""
+        if isinstance(idx, slice):
+            raise TypeError("AsyncCursor can't be sliced, use skip and limit")
+        if idx < 0:
+            idx += await self.count()
+        page = self._cached_page(idx)
+        if page is None and idx >= 0 and (self._count is None
+                                          or idx < self._count):
+            self._cache_page(await self.get_page(idx - idx % self._batch_size))
+            page = self._cached_page(idx)
+        if page is None:
+            raise IndexError("cursor index out of range")
+        return self._extract_element(page, idx)
+
+    async def __aiter__(self):
+        """Iterate over all AppNexus objects matching the specifications"""
+        skip = self._skip
+        retrieved = 0
+        async for page in self.iter_pages():
+            data = self.extract_data(page)
+            if skip >= len(data):
+                skip -= len(data)
+                continue
+            elif skip:
+                data = data[skip:]
+                skip = 0
+            lasting = self._limit - retrieved
+            if lasting < len(data):
+                data = data[:lasting]
+            retrieved += len(data)
+            for entity in data:
+                self.retrieved += 1
+                yield entity
+            if retrieved >= self._limit:
+                break
+
+    @property
+    async def first(self):
+        """Extract the first AppNexus object present in the response"""
+        page = self._cached_page(0) or await self.get_page(num_elements=1)
+        data = self.extract_data(page)
+        if data:
+            return data[0]
+
+    async def get_page(self, start_element=0, num_elements=None):
+        """Get a page (100 elements) starting from `start_element`"""
+        if num_elements is None:
+            num_elements = self._batch_size
+        specs = self.specs.copy()
+        specs.update(start_element=start_element, num_elements=num_elements,
+                     prepared=self.prepared)
+        page = await self.client.get(self.service_name, **specs)
+        if "count" in page:
+            self._count = page["count"]
+        return page
+
+    async def iter_pages(self, skip_elements=0):
+        """Iterate as much as needed to get all available pages"""
+        start_element = skip_elements
+        count = -1
+        while start_element < count or count == -1:
+            page = self._pages.get(start_element)
+            if page is None:
+                page = await self.get_page(start_element)
+                self._cache_page(page)
+            yield page
+            start_element = page["start_element"] + page["num_elements"]
+            count = page["count"]
+            if self._workers > 1 and start_element < count:
+                async for page in self._iter_pages_parallel(
+                        start_element, count, page["num_elements"]):
+                    self._cache_page(page)
+                    yield page
+                return
+
+    async def _iter_pages_parallel(self, start_element, count, page_size):
+        """Fetch the pages from `start_element` to `count` concurrently"""
+        stop = min(count, self._skip + self._limit)
+        offsets = range(start_element, stop, page_size)
+        pending = deque()
+        try:
+            for offset in offsets:
+                pending.append(asyncio.ensure_future(self.get_page(offset)))
+                if len(pending) >= self._workers:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def count(self):
+        """Returns the number of elements matching the specifications"""
+        if self._count is None:
+            self._cache_page(await self.get_page())
+        return self._count
+
+    def batch_size(self, number=None, adaptive=False, minimum=10):
+        if adaptive:
+            raise TypeError("AsyncCursor doesn't support adaptive batch "
+                            "sizes")
+        return super().batch_size(number, minimum=minimum)
+
+    def stream(self):
+        raise TypeError("AsyncCursor can't be streamed")
+
+    def prefetch(self, *names):
+        raise TypeError("AsyncCursor doesn't support prefetch")
+
+    def export(self, *args, **kwargs):
+        raise TypeError("AsyncCursor can't be exported, use a Cursor of "
+                        "AppNexusClient")
+
+    def to_columns(self, *args, **kwargs):
+        raise TypeError("AsyncCursor can't be loaded in columns, use a "
+                        "Cursor of AppNexusClient")
+
+    to_arrow = to_dataframe = to_columns
+
+    def clone(self):
+        return AsyncCursor(self.client, self.service_name,
+                           self.representation, **self.specs)
+
+    async def size(self):
+        """Return the number of elements of the cursor with skip and limit"""
+        initial_count = await self.count()
+        count_with_skip = max(0, initial_count - self._skip)
+        size = min(count_with_skip, self._limit)
+        return size
+
+
+__all__ = ["AsyncAppNexusClient", "AsyncCursor"]
@@ -0,0 +1,62 @@
+import logging
+import time
+
+logger = logging.getLogger("appnexus-client")
+
+
+class BulkWriteResult(object):
+    """Outcome of a batch of write operations
+
+    `results` and `errors` are indexed like the operations that were
+    submitted: an operation either has a result or an error.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.results = {}
+        self.errors = {}
+        self.elapsed = 0.0
+
+    def __repr__(self):
+        return "<BulkWriteResult succeeded={} failed={} elapsed={:.2f}s>"\
+            .format(len(self.results), len(self.errors), self.elapsed)
+
+    @property
+    def succeeded(self):
+        return not self.errors
+
+    @property
+    def throughput(self):
+        """Number of operations processed per second"""
+        if not self.elapsed:
+            return 0.0
+        return self.size / self.elapsed
+
+
+def run_bulk(calls, workers=8):
+    """Run `calls` concurrently and collect their results
+
+    :param calls: a list of callables taking no argument
+    :param workers: the number of threads sending requests
+    :return: a :class:`BulkWriteResult`
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    result = BulkWriteResult(len(calls))
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(call) for call in calls]
+        for index, future in enumerate(futures):
+            try:
+                result.results[index] = future.result()
+            except Exception as exception:
+                logger.warning("bulk operation %d failed: %s", index,
+                               exception)
+                result.errors[index] = exception
+    result.elapsed = time.monotonic() - start
+    logger.info("%d bulk operations in %.2fs (%.1f/s)", result.size,
+                result.elapsed, result.throughput)
+    return result
+
+
+__all__ = ["BulkWriteResult", "run_bulk"]
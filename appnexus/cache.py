@@ -0,0 +1,167 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from appnexus.prepared import encode_query
+
+reference_services = ["browser", "city", "country", "creative-format",
+                      "currency", "device-make", "language",
+                      "operating-system", "region"]
+
+
+class Cache(object):
+    """Base class for the caches of GET responses
+
+    Only the services having a TTL (in seconds) in `ttls` are cached. By
+    default, these are near-static reference services kept for a day.
+    Responses are stored as JSON so that callers can't alter cached data.
+    """
+
+    default_ttl = 24 * 60 * 60
+
+    def __init__(self, ttls=None, max_size=1024):
+        if ttls is None:
+            ttls = dict.fromkeys(reference_services, self.default_ttl)
+        self.ttls = ttls
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def key(self, service_name, parameters):
+        """Build the cache key of a request"""
+        return "{}?{}".format(service_name, encode_query(parameters))
+
+    def is_cached(self, service_name):
+        return service_name in self.ttls
+
+    def get(self, service_name, parameters):
+        """Return the cached response of a request, or None"""
+        key = self.key(service_name, parameters)
+        with self._lock:
+            value = self._get(key, time.time())
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(value)
+
+    def generation(self, service_name):
+        """A number which changes whenever a service is invalidated"""
+        with self._lock:
+            return self._generations.get(service_name, 0)
+
+    def set(self, service_name, parameters, response, generation=None):
+        """Store the response of a request
+
+        Responses which aren't JSON objects, such as files, aren't stored.
+        With the `generation` of the service read before the request was
+        sent, the response isn't stored either if the service was invalidated
+        since, as it may predate a write.
+        """
+        if not isinstance(response, dict):
+            return
+        key = self.key(service_name, parameters)
+        expires = time.time() + self.ttls[service_name]
+        value = json.dumps(response)
+        with self._lock:
+            if generation is not None and \
+                    generation != self._generations.get(service_name, 0):
+                return
+            self._set(key, service_name, value, expires)
+
+    def invalidate(self, service_name):
+        """Drop every cached response of a service"""
+        with self._lock:
+            self._generations[service_name] = \
+                self._generations.get(service_name, 0) + 1
+            self._invalidate(service_name)
+
+    def _get(self, key, now):  # pragma: nocover
+        raise NotImplementedError
+
+    def _set(self, key, service_name, value, expires):  # pragma: nocover
+        raise NotImplementedError
+
+    def _invalidate(self, service_name):  # pragma: nocover
+        raise NotImplementedError
+
+
+class MemoryCache(Cache):
+    """An in-memory LRU cache"""
+
+    def __init__(self, ttls=None, max_size=1024):
+        super(MemoryCache, self).__init__(ttls, max_size)
+        self._entries = OrderedDict()
+
+    def _get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        service_name, value, expires = entry
+        if expires < now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set(self, key, service_name, value, expires):
+        self._entries[key] = (service_name, value, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _invalidate(self, service_name):
+        for key, entry in list(self._entries.items()):
+            if entry[0] == service_name:
+                del self._entries[key]
+
+
+class SQLiteCache(Cache):
+    """An LRU cache stored in a SQLite database, persisted across runs"""
+
+    def __init__(self, path, ttls=None, max_size=1024):
+        super(SQLiteCache, self).__init__(ttls, max_size)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, "
+                "service TEXT, value TEXT, expires REAL, accessed REAL)")
+
+    def _get(self, key, now):
+        row = self.connection.execute(
+            "SELECT value, expires FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        with self.connection:
+            if row[1] < now:
+                self.connection.execute("DELETE FROM cache WHERE key = ?",
+                                        (key,))
+                return None
+            self.connection.execute(
+                "UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def _set(self, key, service_name, value, expires):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)",
+                (key, service_name, value, expires, time.time()))
+            self.connection.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+                "ORDER BY accessed DESC LIMIT -1 OFFSET ?)", (self.max_size,))
+
+    def _invalidate(self, service_name):
+        with self.connection:
+            self.connection.execute("DELETE FROM cache WHERE service = ?",
+                                    (service_name,))
+
+    def close(self):
+        self.connection.close()
+
+
+__all__ = ["Cache", "MemoryCache", "SQLiteCache", "reference_services"]
@@ -1,14 +1,24 @@
+import contextlib
 import functools
+import json
 import logging
 import os
+import tempfile
+import threading
 import time
 
 import requests
+from urllib3.exceptions import NewConnectionError
 
+from appnexus.bulk import BulkWriteResult, run_bulk
+from appnexus.coalesce import Batcher, SingleFlight, request_key
 from appnexus.cursor import Cursor
 from appnexus.exceptions import (AppNexusException, BadCredentials, NoAuth,
-                                 RateExceeded)
-from appnexus.utils import normalize_service_name
+                                 RateExceeded, ServerError)
+from appnexus.instrumentation import Hooks
+from appnexus.prepared import PreparedRequest
+from appnexus.retry import RetryPolicy
+from appnexus.utils import BufferedResponse, file_lock, normalize_service_name
 
 try:
     from configparser import ConfigParser
@@ -17,6 +27,10 @@ except ImportError:  # pragma: nocover
 
 logger = logging.getLogger("appnexus-client")
 
+# Default of `expired_token`, as None is the expired token of a client which
+# wasn't authenticated yet
+_unset = object()
+
 
 class AppNexusClient(object):
     """Represents an active connection to the AppNexus API"""
@@ -25,16 +39,69 @@ class AppNexusClient(object):
     error_codes = {"RATE_EXCEEDED": RateExceeded}
     error_ids = {"NOAUTH": NoAuth}
 
+    pool_size = 10
+    stream_chunk_size = 64 * 1024
+    token_lifetime = 2 * 60 * 60
+    token_refresh_margin = 5 * 60
+
     def __init__(self, username=None, password=None, test=False,
-                 representation=None, token_file=None):
+                 representation=None, token_file=None, pool_size=None,
+                 rate_limiter=None, cache=None, mirror=None,
+                 retry_policy=None, coalesce=True, batch_window=None):
         self.credentials = {"username": username, "password": password}
         self.token = None
         self.token_file = None
+        self._token_expiry = None
+        self._refresh_lock = threading.Lock()
         self.load_token(token_file)
         self.representation = representation
         self.test = bool(test)
+        if pool_size is not None:
+            self.pool_size = pool_size
+        self._session = None
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.mirror = mirror
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.single_flight = SingleFlight() if coalesce else None
+        self.batcher = None
+        if batch_window is not None:
+            self.batcher = Batcher(self, batch_window)
+        self.hooks = Hooks()
+        if mirror is not None and mirror.client is None:
+            mirror.client = self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def session(self):
+        """The HTTP session shared by every request of this client
 
-        self._generate_services()
+        The session is created on first use and keeps connections to the API
+        alive, so that consecutive requests don't pay for a new TCP and TLS
+        handshake each time.
+        """
+        if self._session is None:
+            self._session = self._create_session()
+        return self._session
+
+    def _create_session(self):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def close(self):
+        """Close the connections kept alive by the client"""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
 
     def _prepare_uri(self, service_name, **parameters):
         """Prepare the URI for a request
@@ -44,50 +111,212 @@ class AppNexusClient(object):
         :param kwargs: query parameters
         :return: The uri of the request
         """
-        query_parameters = []
-        for key, value in parameters.items():
-            if isinstance(value, (list, tuple)):
-                value = ",".join([str(member) for member in value])
-            if isinstance(value, bool):
-                value = "true" if value else "false"
-            query_parameters.append("{}={}".format(key, value))
-
-        if query_parameters:
-            uri = "{}{}?{}".format(self.base_url, service_name,
-                                   "&".join(query_parameters))
-        else:
-            uri = "{}{}".format(self.base_url, service_name)
-        return uri
+        return self.base_url + PreparedRequest(service_name,
+                                               parameters).target()
+
+    def prepare(self, service_name, **parameters):
+        """Prepare the requests to a service with fixed `parameters`
+
+        The returned :class:`appnexus.prepared.PreparedRequest` can be given
+        as the `prepared` argument of `get` and `delete`, along with the same
+        parameters: only the other parameters are then encoded.
+        """
+        return PreparedRequest(service_name, parameters)
 
     # shiro: Coverage is disabled for this function because it's mocked and it
     # doesn't need testing (for the moment) since it's a simple instruction
-    def _handle_rate_exceeded(self, response):  # pragma: no cover
+    def _handle_rate_exceeded(self, response,  # pragma: no cover
+                              default_waiting_time=10):
         """Handles rate exceeded errors"""
-        waiting_time = int(response.headers.get("Retry-After", 10))
+        waiting_time = int(response.headers.get("Retry-After",
+                                                default_waiting_time))
         time.sleep(waiting_time)
 
-    def _send(self, send_method, service_name, data=None, **kwargs):
+    def _wait_for_rate_limiter(self, method, service_name=None):
+        """Wait until the rate limiter allows a request with `method`"""
+        if self.rate_limiter is not None:
+            waiting_time = self.rate_limiter.acquire(method)
+            if waiting_time:
+                self._emit("rate_limited", service_name, method.upper(),
+                           source="limiter", waiting_time=waiting_time)
+
+    def on_request(self, callback):
+        """Call `callback` with an event before each request is sent"""
+        return self.hooks.register("on_request", callback)
+
+    def on_response(self, callback):
+        """Call `callback` with an event after each response is received
+
+        The event holds the `status_code`, the `elapsed` time in seconds and
+        the number of `bytes` of the response.
+        """
+        return self.hooks.register("on_response", callback)
+
+    def on_retry(self, callback):
+        """Call `callback` with an event when a request is sent again"""
+        return self.hooks.register("on_retry", callback)
+
+    def on_rate_limited(self, callback):
+        """Call `callback` with an event when a request must wait
+
+        The `source` of the event is ``limiter`` when the client's rate
+        limiter delays the request, and ``api`` when AppNexus answered
+        ``RATE_EXCEEDED``.
+        """
+        return self.hooks.register("on_rate_limited", callback)
+
+    def on_token_refresh(self, callback):
+        """Call `callback` with an event when a new token was obtained"""
+        return self.hooks.register("on_token_refresh", callback)
+
+    def on_circuit_open(self, callback):
+        """Call `callback` with an event when the requests to a service are
+        suspended after repeated failures
+        """
+        return self.hooks.register("on_circuit_open", callback)
+
+    def _emit(self, name, service_name=None, method=None, **fields):
+        if self.hooks:
+            from appnexus.instrumentation import Event
+
+            self.hooks.emit(Event(name, service_name, method, **fields))
+
+    def _failure_reason(self, error):
+        """The reason of a retry for a request exception, None if the
+        exception isn't transient
+        """
+        if isinstance(error, requests.ConnectTimeout):
+            return "CONNECT_TIMEOUT"
+        if isinstance(error, requests.Timeout):
+            return "TIMEOUT"
+        if isinstance(error, requests.exceptions.SSLError):
+            return None
+        if isinstance(error, requests.ConnectionError):
+            cause = error.args[0] if error.args else None
+            if isinstance(getattr(cause, "reason", cause),
+                          NewConnectionError):
+                return "CONNECT_ERROR"
+            return "CONNECTION_ERROR"
+
+    def _retry_delay(self, service_name, method, uri, attempt, reason,
+                     idempotent=None):
+        """Record a transient failure and return the time to wait before
+        sending the request again, or None if it mustn't be retried
+        """
+        policy = self.retry_policy
+        if policy.record_failure(service_name):
+            self._emit("circuit_open", service_name, method, uri=uri,
+                       reason=reason)
+            return None
+        if not policy.should_retry(method, attempt, reason, idempotent):
+            return None
+        delay = policy.delay(attempt)
+        logger.debug("%s %s failed (%s), retrying in %.2f s", method, uri,
+                     reason, delay)
+        self._emit("retry", service_name, method, uri=uri, attempt=attempt,
+                   reason=reason, waiting_time=delay)
+        return delay
+
+    def _request_uri(self, service_name, parameters):
+        """Build the URI of a request, with its `prepared` request if any"""
+        prepared = parameters.pop("prepared", None)
+        if prepared is None:
+            return self._prepare_uri(service_name, **parameters)
+        return self.base_url + prepared.target(**parameters)
+
+    def _send(self, method, service_name, data=None, **kwargs):
         """Send a request to the AppNexus API (used for internal routing)
 
-        :param send_method: The method sending the request (usualy requests.*)
-        :type send_method: function
+        :param method: The HTTP method of the request (``GET``, ``PUT``,
+                       ``POST`` or ``DELETE``)
+        :type method: str
         :param service_name: The target service
         :param data: The payload of the request (optionnal)
         :type data: anything JSON-serializable
+
+        With ``stream=True``, a JSON response is returned as a
+        :class:`appnexus.streaming.StreamedPage` decoding its data as it is
+        iterated over, and any other response is returned unread.
+
+        Transient failures are retried as the client's `retry_policy`
+        decides.
         """
+        policy = self.retry_policy
         valid_response = False
         raw = kwargs.pop("raw", False)
-
+        stream = kwargs.pop("stream", False)
+        request_kwargs = dict(stream=True) if stream else {}
+        # Appending twice would add the elements twice
+        idempotent = False if kwargs.get("append") else None
+        uri = self._request_uri(service_name, kwargs)
+
+        http_method = method.upper()
+        method = method.lower()
+        send_method = getattr(self.session, method)
+        attempt = 0
         while not valid_response:
-            headers = dict(Authorization=self.token)
-            uri = self._prepare_uri(service_name, **kwargs)
-            logger.debug(' '.join(map(str, (headers, uri, data))))
-
-            response = send_method(uri, headers=headers, json=data)
+            attempt += 1
+            if self._token_expires_in() < self.token_refresh_margin:
+                self._refresh_ahead()
+            token = self.token
+            headers = dict(Authorization=token)
+            logger.debug("%s %s", http_method, uri)
+
+            policy.before_request(service_name)
+            self._wait_for_rate_limiter(method, service_name)
+            self._emit("request", service_name, http_method, uri=uri,
+                       attempt=attempt)
+            started = time.perf_counter()
+            try:
+                response = send_method(uri, headers=headers, json=data,
+                                       timeout=policy.timeout,
+                                       **request_kwargs)
+            except requests.RequestException as error:
+                reason = self._failure_reason(error)
+                delay = reason and self._retry_delay(
+                    service_name, http_method, uri, attempt, reason,
+                    idempotent)
+                if delay is None:
+                    raise
+                policy.sleep(delay)
+                continue
+            if self.hooks:
+                size = (response.headers.get("Content-Length") if stream
+                        else len(response.content or b""))
+                self._emit("response", service_name, http_method, uri=uri,
+                           attempt=attempt, status_code=response.status_code,
+                           elapsed=time.perf_counter() - started,
+                           bytes=int(size or 0))
             content_type = response.headers["Content-Type"].split(";")[0]
 
-            if response.content and content_type == "application/json":
-                response_data = response.json()
+            reason = policy.status_reason(response.status_code)
+            if reason is None:
+                policy.record_success(service_name)
+            else:
+                delay = self._retry_delay(service_name, http_method, uri,
+                                          attempt, reason, idempotent)
+                if delay is not None:
+                    response.close()
+                    policy.sleep(delay)
+                    continue
+                if content_type != "application/json":
+                    raise ServerError(response)
+
+            if stream and content_type == "application/json":
+                from appnexus.streaming import StreamedPage
+
+                streamed_page = StreamedPage(
+                    response.iter_content(self.stream_chunk_size),
+                    Cursor.common_keys, close=response.close)
+                response_data = streamed_page.prime()
+                response = BufferedResponse(
+                    response.status_code, response.headers,
+                    json.dumps({"response": response_data}).encode())
+                raw_data = streamed_page
+            elif stream:
+                return response
+            elif response.content and content_type == "application/json":
+                raw_data = response_data = response.json()
                 if "response" in response_data:
                     response_data = response_data["response"]
             elif response.content:
@@ -98,34 +327,99 @@ class AppNexusClient(object):
             try:
                 self.check_errors(response, response_data)
             except RateExceeded:
+                self._emit("rate_limited", service_name, http_method,
+                           source="api",
+                           waiting_time=response.headers.get("Retry-After"))
+                self._emit("retry", service_name, http_method, uri=uri,
+                           attempt=attempt, reason="RATE_EXCEEDED")
                 self._handle_rate_exceeded(response)
             except NoAuth:
-                self.update_token()
+                self._emit("retry", service_name, http_method, uri=uri,
+                           attempt=attempt, reason="NOAUTH")
+                self.update_token(expired_token=token)
             else:
                 valid_response = True
-        if raw:
-            return response.json()
+        if raw or stream:
+            return raw_data
         return response_data
 
-    def update_token(self):
-        """Request a new token and store it for future use"""
+    def update_token(self, expired_token=_unset):
+        """Request a new token and store it for future use
+
+        Refreshes are single-flight: when threads (or processes sharing the
+        token file) fail with the same `expired_token`, only the first one
+        authenticates and the others reuse its new token.
+        """
+        with self._refresh_lock:
+            return self._refresh_token(expired_token)
+
+    def _refresh_ahead(self):
+        """Refresh the token before it expires
+
+        While the current token is still valid, a single thread refreshes it
+        and the others keep using it instead of waiting.
+        """
+        token = self.token
+        if self._token_expires_in() <= 0:
+            self.update_token(expired_token=token)
+        elif self._refresh_lock.acquire(False):
+            try:
+                self._refresh_token(expired_token=token)
+            finally:
+                self._refresh_lock.release()
+
+    def _token_expires_in(self):
+        """Return the number of seconds left before the token expires
+
+        The lifetime of a token set by hand isn't known, so it never expires.
+        """
+        if self._token_expiry is None or self._token_expiry[0] != self.token:
+            return float("inf")
+        return self._token_expiry[1] - time.time()
+
+    def _set_token(self, token, issued_at=None):
+        if issued_at is None:
+            issued_at = time.time()
+        self.token = token
+        self._token_expiry = (token, issued_at + self.token_lifetime)
+
+    def _token_file_lock(self):
+        if not self.token_file:
+            return contextlib.nullcontext()
+        return file_lock(self.token_file + ".lock")
+
+    def _refresh_token(self, expired_token=_unset):
+        with self._token_file_lock():
+            if expired_token is not _unset:
+                if self.token != expired_token:
+                    return self.token
+                self.load_token()
+                if (self.token != expired_token
+                        and self._token_expires_in() > 0):
+                    return self.token
+            return self._authenticate()
+
+    def _authenticate(self):
         logger.info('updating token')
         if None in self.credentials.values():
             raise RuntimeError("You must provide an username and a password")
         credentials = dict(auth=self.credentials)
         url = self.test_url if self.test else self.url
-        response = requests.post(url + "auth",
-                                 json=credentials)
+        self._wait_for_rate_limiter("auth", "auth")
+        started = time.perf_counter()
+        response = self.session.post(url + "auth", json=credentials)
         data = response.json()["response"]
         if "error_id" in data and data["error_id"] == "NOAUTH":
             raise BadCredentials()
         if "error_code" in data and data["error_code"] == "RATE_EXCEEDED":
-            time.sleep(150)
+            self._handle_rate_exceeded(response, default_waiting_time=150)
             return
         if "error_code" in data or "error_id" in data:
             raise AppNexusException(response)
-        self.token = data["token"]
+        self._set_token(data["token"])
         self.save_token()
+        self._emit("token_refresh", "auth", "POST",
+                   elapsed=time.perf_counter() - started)
         return self.token
 
     def check_errors(self, response, data):
@@ -141,26 +435,119 @@ class AppNexusClient(object):
         if "error_code" in data or "error_id" in data:
             raise AppNexusException(response)
 
+    def _cached(self, service_name):
+        return self.cache is not None and self.cache.is_cached(service_name)
+
+    def _after_write(self, service_name):
+        """Drop what was read from a service before a write to it"""
+        if self._cached(service_name):
+            self.cache.invalidate(service_name)
+        if self.single_flight is not None:
+            self.single_flight.forget(service_name)
+        if self.mirror is not None:
+            self.mirror.expire(service_name)
+
     def get(self, service_name, **kwargs):
-        """Retrieve data from AppNexus API"""
-        return self._send(requests.get, service_name, **kwargs)
+        """Retrieve data from AppNexus API
+
+        Identical requests made by other threads while one is in flight wait
+        for it and get a copy of its response, unless the client was created
+        with `coalesce=False`. Requests sent after a write to the service
+        don't wait for requests sent before it.
+        """
+        if kwargs.get("stream"):
+            return self._send("GET", service_name, **kwargs)
+        cached = self._cached(service_name)
+        if not cached and self.single_flight is None:
+            return self._send("GET", service_name, **kwargs)
+        parameters = {key: value for key, value in kwargs.items()
+                      if key != "prepared"}
+        if cached:
+            response = self.cache.get(service_name, parameters)
+            if response is not None:
+                return response
+            generation = self.cache.generation(service_name)
+        send = functools.partial(self._send, "GET", service_name, **kwargs)
+        if self.single_flight is not None:
+            response = self.single_flight.call(
+                request_key(service_name, parameters), send, service_name)
+        else:
+            response = send()
+        if cached:
+            self.cache.set(service_name, parameters, response, generation)
+        return response
 
     def modify(self, service_name, json, **kwargs):
         """Modify an AppNexus object"""
-        return self._send(requests.put, service_name, json, **kwargs)
+        try:
+            return self._send("PUT", service_name, json, **kwargs)
+        finally:
+            self._after_write(service_name)
 
     def create(self, service_name, json, **kwargs):
         """Create a new AppNexus object"""
-        return self._send(requests.post, service_name, json, **kwargs)
+        try:
+            return self._send("POST", service_name, json,
+                              **kwargs)
+        finally:
+            self._after_write(service_name)
 
     def delete(self, service_name, *ids, **kwargs):
         """Delete an AppNexus object"""
-        return self._send(requests.delete, service_name, id=ids, **kwargs)
+        try:
+            return self._send("DELETE", service_name, id=ids,
+                              **kwargs)
+        finally:
+            self._after_write(service_name)
 
     def append(self, service_name, json, **kwargs):
         kwargs.update({"append": True})
         return self.modify(service_name, json, **kwargs)
 
+    def bulk_write(self, service_name, operations, workers=8,
+                   delete_batch_size=100):
+        """Run many write operations on a service concurrently
+
+        Each operation is a tuple ``(method, argument[, parameters])`` where
+        method is one of ``create``, ``modify``, ``append`` or ``delete``, the
+        argument is the JSON payload (or the id to delete) and the optional
+        parameters are sent as query parameters. Deletions are grouped in
+        requests of `delete_batch_size` ids. A failing operation doesn't
+        abort the others: its exception is stored in the result errors.
+
+        :return: a :class:`appnexus.bulk.BulkWriteResult`
+        """
+        operations = list(operations)
+        calls, indexes, deletions = [], [], []
+        for index, operation in enumerate(operations):
+            method, argument = operation[:2]
+            parameters = operation[2] if len(operation) > 2 else {}
+            if method not in ("create", "modify", "append", "delete"):
+                raise ValueError("unknown bulk operation '{}'".format(method))
+            if method == "delete" and not parameters:
+                deletions.append((index, argument))
+                continue
+            calls.append(functools.partial(getattr(self, method),
+                                           service_name, argument,
+                                           **parameters))
+            indexes.append([index])
+        for start in range(0, len(deletions), delete_batch_size):
+            batch = deletions[start:start + delete_batch_size]
+            calls.append(functools.partial(self.delete, service_name,
+                                           *[id for _, id in batch]))
+            indexes.append([index for index, _ in batch])
+
+        grouped = run_bulk(calls, workers=workers)
+        result = BulkWriteResult(len(operations))
+        result.elapsed = grouped.elapsed
+        for call_index, operation_indexes in enumerate(indexes):
+            for index in operation_indexes:
+                if call_index in grouped.errors:
+                    result.errors[index] = grouped.errors[call_index]
+                else:
+                    result.results[index] = grouped.results[call_index]
+        return result
+
     def meta(self, service_name):
         """Retrieve meta-informations about a service"""
         return self.get(service_name + "/meta")
@@ -170,8 +557,33 @@ class AppNexusClient(object):
         representation = representation or self.representation
         args = arguments.copy() if arguments else dict()
         args.update(kwargs)
+        if self.mirror is not None and self.mirror.answers(service_name, args):
+            return self.mirror.cursor(service_name, representation, **args)
         return Cursor(self, service_name, representation, **args)
 
+    def find_one(self, service_name, arguments=None, representation=None,
+                 **kwargs):
+        """Retrieve the first object matching the parameters, or None
+
+        With a `batch_window`, the lookups of a single object by id are
+        merged with the lookups of the same service made by other threads
+        within that window, into one request for all their ids.
+        """
+        representation = representation or self.representation
+        args = arguments.copy() if arguments else dict()
+        args.update(kwargs)
+        id = args.get("id")
+        if (self.batcher is None or representation is None
+                or list(args) != ["id"] or id is None
+                or isinstance(id, (list, tuple))
+                or (isinstance(id, str) and "," in id)
+                or (self.mirror is not None
+                    and self.mirror.answers(service_name, args))):
+            return self.find(service_name, args, representation).first
+        obj = self.batcher.get(service_name, id)
+        if obj is not None:
+            return representation(self, service_name, obj)
+
     def connect(self, username, password, test=None, representation=None,
                 token_file=None):
         self.credentials = {"username": username, "password": password}
@@ -188,28 +600,52 @@ class AppNexusClient(object):
         connect_data = dict(config["appnexus"])
         self.connect(**connect_data)
 
-    def _generate_services(self):
-        for service_name in services_list:
-            normalized_name = normalize_service_name(service_name)
-            snake_name = normalized_name.replace('-', '_')
-            generated_service = Service(self, normalized_name)
-            setattr(self, snake_name, generated_service)
+    def __getattr__(self, name):
+        """Create the service named `name` (such as `line_item`) when it is
+        first accessed
+        """
+        service_name = service_names.get(name)
+        if service_name is None:
+            raise AttributeError("'{}' object has no attribute '{}'".format(
+                type(self).__name__, name))
+        service = self.__dict__[name] = Service(self, service_name)
+        return service
+
+    def __dir__(self):
+        return sorted(set(super(AppNexusClient, self).__dir__())
+                      | set(service_names))
 
     def save_token(self):
+        """Write the token to the token file, atomically
+
+        The token is written to a temporary file which then replaces the
+        token file, so other processes never read a partial token.
+        """
         if not self.token_file or not self.token:
             return
-        with open(self.token_file, mode='w') as fp:
-            fp.write(self.token)
+        directory = os.path.dirname(os.path.abspath(self.token_file))
+        fd, path = tempfile.mkstemp(dir=directory, prefix=".token-")
+        try:
+            with os.fdopen(fd, mode='w') as fp:
+                fp.write(self.token)
+            os.replace(path, self.token_file)
+        except BaseException:
+            os.unlink(path)
+            raise
 
     def load_token(self, token_file=None):
         if not self.token_file:
             if not token_file:
                 return
             self.token_file = token_file
-        if not os.path.exists(self.token_file):
+        try:
+            with open(self.token_file) as fp:
+                token = fp.read().strip()
+                issued_at = os.fstat(fp.fileno()).st_mtime
+        except FileNotFoundError:
             return
-        with open(self.token_file) as fp:
-            self.token = fp.read().strip()
+        if token:
+            self._set_token(token, issued_at)
 
     @property
     def base_url(self):
@@ -243,6 +679,11 @@ services_list = ["AccountRecovery", "AdProfile", "AdQualityRule", "Adserver",
                  "ThirdpartyPixel", "User", "UsergroupPattern",
                  "VisibilityProfile"]
 
+# Maps the attribute names of the services on clients (such as `line_item`)
+# to their names in the API (such as `line-item`)
+service_names = {normalize_service_name(name, "_"):
+                 normalize_service_name(name) for name in services_list}
+
 
 class Service(object):
 
@@ -254,7 +695,7 @@ class Service(object):
         return self.client.find(self.name, arguments, **kwargs)
 
     def find_one(self, arguments=None, **kwargs):
-        return self.find(arguments, **kwargs).first
+        return self.client.find_one(self.name, arguments, **kwargs)
 
     def get(self, **kwargs):
         return self.client.get(self.name, **kwargs)
@@ -268,6 +709,9 @@ class Service(object):
     def delete(self, *args):
         return self.client.delete(self.name, *args)
 
+    def bulk_write(self, operations, **kwargs):
+        return self.client.bulk_write(self.name, operations, **kwargs)
+
 
 client = AppNexusClient()
 
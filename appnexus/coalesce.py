@@ -0,0 +1,177 @@
+import copy
+import threading
+
+from appnexus.cursor import Cursor
+from appnexus.prepared import encode_query
+
+
+def request_key(service_name, parameters):
+    """Identify a request: the same service and parameters, in any order,
+    give the same key
+    """
+    return "{}?{}".format(service_name, encode_query(parameters))
+
+
+def extract_objects(page, common_keys):
+    """The list of objects of a response page, whatever its data key"""
+    for key, element in page.items():
+        if key in common_keys:
+            continue
+        if isinstance(element, dict):
+            return [element]
+        if isinstance(element, list):
+            return element
+    return []
+
+
+class _Call(object):
+
+    def __init__(self):
+        from concurrent.futures import Future
+
+        self.future = Future()
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    """Shares the result of identical calls running at the same time
+
+    The first thread calling with a key runs the call; the threads calling
+    with the same key while it runs wait for it and get a copy of its result,
+    or its exception. A call made after it ended, or after its group was
+    forgotten, runs again.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def call(self, key, function, group=None):
+        """Return the result of `function`, shared with the other calls with
+        `key` in flight
+
+        :param group: what the call depends on, to :meth:`forget` it
+        """
+        with self._lock:
+            call = self._calls.get((group, key))
+            leader = call is None
+            if leader:
+                call = self._calls[group, key] = _Call()
+            else:
+                call.waiters += 1
+                self.shared += 1
+        if not leader:
+            return copy.deepcopy(call.future.result())
+
+        try:
+            result = function()
+        except BaseException as error:
+            if self._end(group, key, call):
+                call.future.set_exception(error)
+            raise
+        if self._end(group, key, call):
+            # The caller may modify the result while the waiters copy it, so
+            # they copy a snapshot instead
+            call.future.set_result(copy.deepcopy(result))
+        return result
+
+    def forget(self, group):
+        """Let the calls of `group` from now on run again instead of joining
+        the calls in flight, whose results may be outdated
+        """
+        with self._lock:
+            for group_key in [group_key for group_key in self._calls
+                              if group_key[0] == group]:
+                del self._calls[group_key]
+
+    def _end(self, group, key, call):
+        """Forget `call`, return its number of waiters"""
+        with self._lock:
+            if self._calls.get((group, key)) is call:
+                del self._calls[group, key]
+            return call.waiters
+
+
+class _Batch(object):
+
+    def __init__(self, service_name, parameters):
+        self.service_name = service_name
+        self.parameters = parameters
+        self.futures = {}
+        self.full = threading.Event()
+
+    def add(self, id):
+        from concurrent.futures import Future
+
+        future = Future()
+        self.futures.setdefault(id, []).append(future)
+        return future
+
+
+class Batcher(object):
+    """Merges the lookups of objects by id made at the same time
+
+    The first thread looking up an object of a service waits `window`
+    seconds, during which the lookups of other threads on the same service
+    (with the same other parameters) join its batch. A single request then
+    retrieves all the ids of the batch, and each thread gets its object, or
+    None if it doesn't exist. A batch is sent early once it has `max_size`
+    ids, the maximum number of objects of a page.
+    """
+
+    def __init__(self, client, window=0.005, max_size=100):
+        if window < 0 or max_size < 1:
+            raise ValueError("window must be positive and max_size at "
+                             "least 1")
+        self.client = client
+        self.window = window
+        self.max_size = max_size
+        self._batches = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.lookups = 0
+
+    def get(self, service_name, id, **parameters):
+        """Return the raw object of `service_name` with `id`, or None"""
+        key = request_key(service_name, parameters)
+        with self._lock:
+            self.lookups += 1
+            batch = self._batches.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._batches[key] = _Batch(service_name, parameters)
+                self.requests += 1
+            future = batch.add(id)
+            if len(batch.futures) >= self.max_size:
+                del self._batches[key]
+                batch.full.set()
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._batches.get(key) is batch:
+                    del self._batches[key]
+            self._send(batch)
+        return future.result()
+
+    def _send(self, batch):
+        """Retrieve the objects of `batch` and hand them to their threads"""
+        ids = list(batch.futures)
+        try:
+            page = self.client.get(batch.service_name, id=ids,
+                                   num_elements=len(ids), **batch.parameters)
+            objects = extract_objects(page, Cursor.common_keys)
+        except BaseException as error:
+            for futures in batch.futures.values():
+                for future in futures:
+                    future.set_exception(error)
+            return
+        found = {str(obj.get("id")): obj for obj in objects}
+        for id, futures in batch.futures.items():
+            obj = found.get(str(id))
+            futures[0].set_result(obj)
+            for future in futures[1:]:
+                future.set_result(copy.deepcopy(obj))
+
+
+__all__ = ["Batcher", "SingleFlight", "extract_objects", "request_key"]
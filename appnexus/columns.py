@@ -0,0 +1,176 @@
+import array
+import importlib
+import json
+
+typecodes = {"int": "q", "double": "d", "money": "d", "boolean": "b"}
+pandas_dtypes = {"int": "Int64", "double": "float64", "money": "float64",
+                 "boolean": "boolean", "string": "string", "enum": "string",
+                 "date": "string"}
+
+
+def import_optional(name, purpose):
+    """Import a heavy optional dependency when it is first needed"""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        raise ImportError("{} is required to {}".format(name, purpose))
+
+
+def arrow_types(pyarrow):
+    return {"int": pyarrow.int64(), "double": pyarrow.float64(),
+            "money": pyarrow.float64(), "boolean": pyarrow.bool_(),
+            "string": pyarrow.string(), "enum": pyarrow.string(),
+            "date": pyarrow.string()}
+
+
+def meta_types(client, service_name):
+    """Map the fields of a service to their types, as given by its meta"""
+    meta = client.meta(service_name) or {}
+    return {field["name"]: field.get("type")
+            for field in meta.get("fields", ())}
+
+
+class ColumnBuffer(object):
+    """Accumulates the values of a column
+
+    Values of numeric and boolean columns are packed in an `array.array`
+    as long as they are not null, other values are kept in a list. Booleans
+    are packed as 0 and 1, and turned back into `bool` by :meth:`column`.
+    """
+
+    def __init__(self, type=None, length=0):
+        self.type = type
+        typecode = typecodes.get(type)
+        if typecode is not None and not length:
+            self.values = array.array(typecode)
+        else:
+            self.values = [None] * length
+
+    def __len__(self):
+        return len(self.values)
+
+    def extend(self, values):
+        if isinstance(self.values, array.array):
+            length = len(self.values)
+            try:
+                self.values.extend(values)
+                return
+            except (TypeError, OverflowError):
+                self.values = list(self.column())[:length]
+        self.values.extend(values)
+
+    def column(self):
+        """The values of the column"""
+        if self.type == "boolean" and isinstance(self.values, array.array):
+            return [bool(value) for value in self.values]
+        return self.values
+
+
+class ColumnsBuilder(object):
+    """Builds columns page by page from the raw objects of a cursor
+
+    :param fields: the fields to keep, in order (all of them by default)
+    :param types: maps fields to AppNexus types (``int``, ``double``,
+                  ``money``, ``boolean``, ``string``...)
+    """
+
+    def __init__(self, fields=None, types=None):
+        self.fields = list(fields) if fields is not None else None
+        self.types = types or {}
+        self.columns = {}
+        self.length = 0
+        for field in self.fields or ():
+            self.columns[field] = ColumnBuffer(self.types.get(field))
+
+    def page_fields(self, objects):
+        """List the fields of a page, adding the new ones to the columns"""
+        if self.fields is not None:
+            return self.fields
+        for obj in objects:
+            for field in obj:
+                if field not in self.columns:
+                    self.columns[field] = ColumnBuffer(self.types.get(field),
+                                                       self.length)
+        return list(self.columns)
+
+    def add_page(self, objects):
+        for field in self.page_fields(objects):
+            self.columns[field].extend([obj.get(field) for obj in objects])
+        self.length += len(objects)
+
+
+def to_columns(cursor, fields=None, types=None):
+    """Load the objects of a cursor as columns
+
+    :return: a dictionary mapping each field to the sequence of its values
+    """
+    builder = ColumnsBuilder(fields, types)
+    for objects in cursor.iter_batches():
+        builder.add_page(objects)
+    return {field: column.column()
+            for field, column in builder.columns.items()}
+
+
+def _arrow_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def to_arrow(cursor, fields=None, types=None):
+    """Load the objects of a cursor in a `pyarrow.Table`
+
+    Each page is converted to Arrow arrays right away, so the Python objects
+    of only one page are alive at a time. Nested values (lists, objects) are
+    stored as JSON strings.
+    """
+    pyarrow = import_optional("pyarrow", "export to Arrow")
+    known_types = arrow_types(pyarrow)
+    types = types or {}
+    chunks = {field: [] for field in fields or ()}
+    length = 0
+    for objects in cursor.iter_batches():
+        if fields is None:
+            for obj in objects:
+                for field in obj:
+                    if field not in chunks:
+                        chunks[field] = [pyarrow.nulls(length)]
+        for field, field_chunks in chunks.items():
+            values = [_arrow_value(obj.get(field)) for obj in objects]
+            field_chunks.append(pyarrow.array(
+                values, type=known_types.get(types.get(field))))
+        length += len(objects)
+
+    arrays = []
+    for field, field_chunks in chunks.items():
+        type = next((chunk.type for chunk in field_chunks
+                     if chunk.type != pyarrow.null()), pyarrow.null())
+        arrays.append(pyarrow.chunked_array(
+            [chunk.cast(type) for chunk in field_chunks], type=type))
+    return pyarrow.Table.from_arrays(arrays, names=list(chunks))
+
+
+def to_dataframe(cursor, fields=None, types=None):
+    """Load the objects of a cursor in a `pandas.DataFrame`
+
+    The columns are built with Arrow if it is installed, and with
+    :func:`to_columns` otherwise.
+    """
+    pandas = import_optional("pandas", "export to a DataFrame")
+    try:
+        importlib.import_module("pyarrow")
+    except ImportError:
+        pass
+    else:
+        return to_arrow(cursor, fields, types).to_pandas()
+    columns = to_columns(cursor, fields, types)
+    dataframe = pandas.DataFrame({field: list(values)
+                                  for field, values in columns.items()})
+    for field, type in (types or {}).items():
+        if field in dataframe and type in pandas_dtypes:
+            dataframe[field] = dataframe[field].astype(pandas_dtypes[type])
+    return dataframe
+
+
+__all__ = ["ColumnBuffer", "ColumnsBuilder", "import_optional", "meta_types",
+           "to_arrow", "to_columns", "to_dataframe"]
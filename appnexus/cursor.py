@@ -1,9 +1,51 @@
+import time
+from collections import OrderedDict, deque
+
+
+class AdaptiveBatchSize(object):
+    """Adjusts the size of the pages requested by a cursor
+
+    The size grows while the time spent per element falls, and shrinks when
+    a page takes more than `target_time` seconds (slow or large payloads) or
+    when a request times out.
+    """
+
+    def __init__(self, size, minimum, maximum, target_time=5.0, factor=2):
+        self.size = size
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_time = target_time
+        self.factor = factor
+        self._time_per_element = None
+
+    def record(self, num_elements, elapsed):
+        """Adjust the size after a page of `num_elements` took `elapsed`"""
+        time_per_element = elapsed / max(num_elements, 1)
+        if elapsed > self.target_time:
+            self.shrink()
+        elif (self._time_per_element is None
+                or time_per_element < self._time_per_element):
+            self.size = min(self.maximum, int(self.size * self.factor))
+        self._time_per_element = time_per_element
+
+    def shrink(self):
+        """Reduce the size, return False if it is already the minimum"""
+        if self.size <= self.minimum:
+            return False
+        self.size = max(self.minimum, int(self.size / self.factor))
+        self._time_per_element = None
+        return True
+
+
 class Cursor(object):
     """Represents a cursor on collection of AppNexus objects"""
 
-    batch_size = 100
+    default_batch_size = 100
+    max_batch_size = 100
+    max_batch_sizes = {}
     common_keys = {"status", "count", "dbg_info", "num_elements",
                    "start_element"}
+    page_cache_size = 8
 
     def __init__(self, client, service_name, representation, **specs):
         """Initialize the object
@@ -26,84 +68,404 @@ class Cursor(object):
         self.retrieved = 0
         self._skip = 0
         self._limit = float('inf')
+        self._workers = 1
+        self._streamed = False
+        self._batch_size = self.default_batch_size
+        self._adaptive = None
+        self._count = None
+        self._pages = OrderedDict()
+        self._prefetch = ()
+        self._prepared = None
 
     def __len__(self):
         """Returns the number of elements matching the specifications"""
         return self.count()
 
     def __getitem__(self, idx):
-        """Returns the nth element matching the specifications"""
-        page = self.get_page(num_elements=1, start_element=idx)
-        data = self.extract_data(page)
-        return data[0]
+        """Returns the nth element matching the specifications
+
+        Slices are supported. Elements are read from pages aligned on the
+        batch size, which are kept in a small cache shared with iteration, so
+        close indexes cost a single request. Negative indexes need the count.
+        """
+        if isinstance(idx, slice):
+            return self._get_slice(idx)
+        if idx < 0:
+            idx += self.count()
+        page = self._page_containing(idx) if idx >= 0 else None
+        if page is None:
+            raise IndexError("cursor index out of range")
+        return self._extract_element(page, idx)
+
+    def _get_slice(self, index):
+        start, stop, step = index.start, index.stop, index.step or 1
+        if (step < 0 or stop is None
+                or any(x is not None and x < 0 for x in (start, stop))):
+            positions = range(*index.indices(self.count()))
+        else:
+            positions = range(start or 0, stop, step)
+        entities = []
+        for position in positions:
+            page = self._page_containing(position)
+            if page is None:
+                break
+            entities.append(self._extract_element(page, position))
+        return entities
+
+    def _cache_page(self, page):
+        """Keep `page` in the LRU cache of pages"""
+        if "start_element" not in page or "num_elements" not in page:
+            return
+        start_element = page["start_element"]
+        self._pages[start_element] = page
+        self._pages.move_to_end(start_element)
+        while len(self._pages) > self.page_cache_size:
+            self._pages.popitem(last=False)
+
+    def _cached_page(self, idx):
+        """Return the cached page containing the `idx`th element, if any"""
+        for start_element, page in self._pages.items():
+            if start_element <= idx < start_element + page["num_elements"]:
+                self._pages.move_to_end(start_element)
+                return page
+
+    def _page_containing(self, idx):
+        """Return the page containing the `idx`th element, or None"""
+        page = self._cached_page(idx)
+        if page is not None:
+            return page
+        if self._count is not None and idx >= self._count:
+            return None
+        page = self.get_page(idx - idx % self._batch_size)
+        self._cache_page(page)
+        return self._cached_page(idx)
+
+    def _extract_element(self, page, idx):
+        element = self._raw_data(page)[idx - page["start_element"]]
+        return self.representation(self.client, self.service_name, element)
 
     def __iter__(self):
         """Iterate over all AppNexus objects matching the specifications"""
+        if self._streamed and not self._prefetch:
+            for entity in self._iter_streamed():
+                yield entity
+            return
+        for data in self.iter_batches():
+            entities = [self.representation(self.client, self.service_name,
+                                            element) for element in data]
+            if self._prefetch and entities:
+                self._prefetch_related(entities)
+            for entity in entities:
+                self.retrieved += 1
+                yield entity
+
+    def _prefetch_related(self, entities):
+        prefetch_related = getattr(type(entities[0]), "prefetch_related",
+                                   None)
+        if prefetch_related is None:
+            raise TypeError("the representation of '{}' can't prefetch "
+                            "related objects".format(self.service_name))
+        prefetch_related(entities, *self._prefetch)
+
+    def iter_batches(self):
+        """Iterate over the raw objects of each page, with skip and limit
+
+        Each batch is the list of objects (as dictionaries) of a page.
+        """
+        skip = self._skip
+        retrieved = 0
         for page in self.iter_pages():
-            data = self.extract_data(page)
-            if self._skip >= len(data):
-                self._skip -= len(data)
+            data = self._raw_data(page) or []
+            if skip >= len(data):
+                skip -= len(data)
                 continue
-            elif self._skip:
-                self._skip = 0
-                data = data[self._skip:]
-            lasting = self._limit - self.retrieved
-            if not lasting:
-                break
-            elif lasting < len(data):
+            elif skip:
+                data = data[skip:]
+                skip = 0
+            lasting = self._limit - retrieved
+            if lasting < len(data):
                 data = data[:lasting]
-            for entity in data:
-                self.retrieved += 1
-                yield entity
+            retrieved += len(data)
+            yield data
+            if retrieved >= self._limit:
+                break
 
-    def extract_data(self, page):
-        """Extract the AppNexus object or list of objects from the response"""
+    def _iter_streamed(self):
+        """Iterate over the objects as they are decoded from the responses"""
+        start_element = self._skip
+        retrieved = 0
+        count = -1
+        while start_element < count or count == -1:
+            page = self.get_page(start_element, stream=True)
+            try:
+                for element in page:
+                    if retrieved >= self._limit:
+                        return
+                    retrieved += 1
+                    self.retrieved += 1
+                    yield self.representation(self.client, self.service_name,
+                                              element)
+            finally:
+                page.close()
+            if retrieved >= self._limit:
+                return
+            start_element = (page.page["start_element"]
+                             + page.page["num_elements"])
+            count = self._count = page.page["count"]
+
+    def _raw_data(self, page):
+        """Extract the list of raw AppNexus objects from the response"""
         response_keys = set(page.keys())
         uncommon_keys = response_keys - self.common_keys
 
         for possible_data_key in uncommon_keys:
             element = page[possible_data_key]
             if isinstance(element, dict):
-                return [self.representation(self.client, self.service_name,
-                                            element)]
+                return [element]
             if isinstance(element, list):
-                return [self.representation(self.client, self.service_name, x)
-                        for x in element]
+                return element
+
+    def extract_data(self, page):
+        """Extract the AppNexus object or list of objects from the response"""
+        data = self._raw_data(page)
+        if data is not None:
+            return [self.representation(self.client, self.service_name, x)
+                    for x in data]
 
     @property
     def first(self):
         """Extract the first AppNexus object present in the response"""
-        page = self.get_page(num_elements=1)
+        page = self._cached_page(0) or self.get_page(num_elements=1)
         data = self.extract_data(page)
         if data:
             return data[0]
 
-    def get_page(self, start_element=0, num_elements=None):
-        """Get a page (100 elements) starting from `start_element`"""
+    @property
+    def prepared(self):
+        """The request to the service with the specifications of the cursor
+
+        Its query string is encoded once, only the pagination parameters are
+        encoded for each page.
+        """
+        if self._prepared is None:
+            self._prepared = self.client.prepare(self.service_name,
+                                                 **self.specs)
+        return self._prepared
+
+    def get_page(self, start_element=0, num_elements=None, stream=False):
+        """Get a page (100 elements) starting from `start_element`
+
+        With `stream`, the page is a :class:`appnexus.streaming.StreamedPage`.
+        """
         if num_elements is None:
-            num_elements = self.batch_size
+            num_elements = self._batch_size
         specs = self.specs.copy()
-        specs.update(start_element=start_element, num_elements=num_elements)
-        return self.client.get(self.service_name, **specs)
+        specs.update(start_element=start_element, num_elements=num_elements,
+                     prepared=self.prepared)
+        if stream:
+            specs.update(stream=True)
+            return self.client.get(self.service_name, **specs)
+        page = self.client.get(self.service_name, **specs)
+        if "count" in page:
+            self._count = page["count"]
+        return page
 
     def iter_pages(self, skip_elements=0):
         """Iterate as much as needed to get all available pages"""
         start_element = skip_elements
         count = -1
         while start_element < count or count == -1:
-            page = self.get_page(start_element)
+            page = self._pages.get(start_element)
+            if page is None:
+                if self._adaptive is not None:
+                    page = self._get_adaptive_page(start_element)
+                else:
+                    page = self.get_page(start_element)
+                self._cache_page(page)
             yield page
             start_element = page["start_element"] + page["num_elements"]
             count = page["count"]
+            if self._workers > 1 and start_element < count:
+                for page in self._iter_pages_parallel(
+                        start_element, count, page["num_elements"]):
+                    self._cache_page(page)
+                    yield page
+                return
+
+    def _get_adaptive_page(self, start_element):
+        """Get a page whose size is chosen by the adaptive batch size"""
+        import requests
+
+        while True:
+            started = time.monotonic()
+            try:
+                page = self.get_page(start_element, self._adaptive.size)
+            except requests.Timeout:
+                if not self._adaptive.shrink():
+                    raise
+                continue
+            self._adaptive.record(page["num_elements"],
+                                  time.monotonic() - started)
+            return page
+
+    def _iter_pages_parallel(self, start_element, count, page_size):
+        """Fetch the pages from `start_element` to `count` concurrently
+
+        Pages are requested ahead by a pool of threads, but are yielded in
+        order. Only the pages needed to honour `skip` and `limit` are fetched.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        stop = min(count, self._skip + self._limit)
+        offsets = iter(range(start_element, stop, page_size))
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            try:
+                for offset in offsets:
+                    pending.append(executor.submit(self.get_page, offset))
+                    if len(pending) >= self._workers * 2:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
 
     def count(self):
-        """Returns the number of elements matching the specifications"""
-        return self.get_page(num_elements=1)["count"]
+        """Returns the number of elements matching the specifications
+
+        The count is memoized. When no page was fetched yet, the first page is
+        requested and kept to be reused when iterating over the cursor.
+        """
+        if self._count is None:
+            self._cache_page(self.get_page())
+        return self._count
+
+    @property
+    def cached_count(self):
+        """The number of elements, if known from a fetched page, or None"""
+        return self._count
+
+    def _column_types(self, types, meta):
+        from appnexus import columns
+
+        if not meta:
+            return types
+        column_types = columns.meta_types(self.client, self.service_name)
+        column_types.update(types or {})
+        return column_types
+
+    def to_columns(self, fields=None, types=None, meta=False):
+        """Load the elements as a dictionary of columns
+
+        Columns are built page by page from the raw responses, without
+        creating an object per element. `fields` restricts and orders the
+        columns. `types` maps fields to AppNexus types (``int``, ``double``,
+        ``boolean``...) and, with `meta`, is completed by the service's meta.
+        """
+        from appnexus import columns
+
+        return columns.to_columns(self, fields,
+                                  self._column_types(types, meta))
+
+    def to_arrow(self, fields=None, types=None, meta=False):
+        """Load the elements in a `pyarrow.Table` (see `to_columns`)"""
+        from appnexus import columns
+
+        return columns.to_arrow(self, fields, self._column_types(types, meta))
+
+    def to_dataframe(self, fields=None, types=None, meta=False):
+        """Load the elements in a `pandas.DataFrame` (see `to_columns`)"""
+        from appnexus import columns
+
+        return columns.to_dataframe(self, fields,
+                                    self._column_types(types, meta))
+
+    def export(self, path, processes=4, format=None, fields=None,
+               types=None, meta=False):
+        """Export the elements to newline-delimited JSON or Parquet
+
+        The pages are fetched and decoded by `processes` worker processes,
+        sharing the client's token and rate budget, and each writes a shard
+        of disjoint pages. The shards are merged in order in the file at
+        `path`. See :func:`appnexus.export.export`.
+
+        :return: the number of exported elements
+        """
+        from appnexus import export
+
+        return export.export(self, path, processes, format, fields,
+                             self._column_types(types, meta))
 
     def clone(self):
         return Cursor(self.client, self.service_name, self.representation,
                       **self.specs)
 
+    @property
+    def service_max_batch_size(self):
+        """The maximum number of elements the service returns per page"""
+        return self.max_batch_sizes.get(self.service_name,
+                                        self.max_batch_size)
+
+    def batch_size(self, number=None, adaptive=False, minimum=10):
+        """Request pages of `number` elements
+
+        With `adaptive`, `number` is only the initial size, a quarter of the
+        maximum of the service by default: it then grows while the time spent
+        per element falls, up to that maximum, and shrinks (down to
+        `minimum`) on slow pages or timeouts. A size starting at the maximum
+        can only shrink.
+        """
+        maximum = self.service_max_batch_size
+        if number is None:
+            if not adaptive:
+                raise TypeError("batch_size() needs a number of elements "
+                                "unless it is adaptive")
+            number = max(min(minimum, maximum), maximum // 4)
+        if not 1 <= number <= maximum:
+            raise ValueError("batch size must be between 1 and {} for '{}'"
+                             .format(maximum, self.service_name))
+        self._batch_size = number
+        if adaptive:
+            self._adaptive = AdaptiveBatchSize(number, min(minimum, number),
+                                               maximum)
+        else:
+            self._adaptive = None
+        return self
+
+    def stream(self):
+        """Decode the objects one by one while iterating over the cursor
+
+        Instead of loading whole pages in memory, the objects are yielded as
+        soon as they are decoded from the response, keeping memory usage
+        proportional to the size of one object. Streaming disables `parallel`.
+        """
+        self._streamed = True
+        return self
+
+    def parallel(self, workers=8):
+        """Fetch the pages following the first one with `workers` threads
+
+        The first page gives the number of elements matching the
+        specifications, the remaining pages are then requested concurrently.
+        Elements are still yielded in order.
+        """
+        if workers < 1:
+            raise ValueError("workers must be a positive integer")
+        self._workers = workers
+        return self
+
+    def prefetch(self, *names):
+        """Load the related objects `names` of the elements page by page
+
+        For each page, the related objects (such as ``profile`` or
+        ``budget_splitter``) of all its elements are requested together, and
+        attached to the elements. The representation must be a model.
+        Prefetching disables `stream`.
+        """
+        self._prefetch = names
+        return self
+
     def limit(self, number):
         """Limit the cursor to retrieve at most `number` elements"""
         self._limit = number
@@ -121,5 +483,16 @@ class Cursor(object):
         size = min(count_with_skip, self._limit)
         return size
 
+    def offsets(self):
+        """Return the offsets of the first element of the cursor, with skip
+        and limit, and of the element following its last one
+        """
+        return self._skip, self._skip + self.size()
+
+    @property
+    def page_size(self):
+        """The number of elements requested per page"""
+        return self._batch_size
+
 
 __all__ = ["Cursor"]
@@ -30,4 +30,39 @@ class BadCredentials(AppNexusException):
         return "You provided bad credentials for the AppNexus API"
 
 
-__all__ = ["AppNexusException", "RateExceeded", "NoAuth", "BadCredentials"]
+class ReportError(AppNexusException):
+    """Exception raised when a report failed or took too long"""
+
+    def __init__(self, report_id, reason):
+        super(ReportError, self).__init__()
+        self.report_id = report_id
+        self.reason = reason
+
+    def __str__(self):
+        return "Report {} failed: {}".format(self.report_id, self.reason)
+
+
+class ServerError(AppNexusException):
+    """Exception raised when AppNexus kept answering with a server error"""
+
+    def __str__(self):
+        return "AppNexus answered with HTTP status {}".format(
+            self.response.status_code)
+
+
+class CircuitOpen(AppNexusException):
+    """Exception raised when requests to a failing service are suspended"""
+
+    def __init__(self, service_name, retry_after):
+        super(CircuitOpen, self).__init__()
+        self.service_name = service_name
+        self.retry_after = retry_after
+
+    def __str__(self):
+        return ("Requests to '{}' are suspended after repeated failures, "
+                "retry in {:.0f} s").format(self.service_name,
+                                            self.retry_after)
+
+
+__all__ = ["AppNexusException", "RateExceeded", "NoAuth", "BadCredentials",
+           "ReportError", "ServerError", "CircuitOpen"]
@@ -0,0 +1,222 @@
+import json
+import os
+import shutil
+import tempfile
+
+from appnexus import columns
+from appnexus.representations import raw
+
+formats = ("ndjson", "parquet")
+start_method = "spawn"
+
+
+def partition(start, stop, page_size, parts):
+    """Split the offsets from `start` to `stop` in contiguous ranges
+
+    The ranges are made of whole pages of `page_size` elements, so that no
+    page is requested twice, and there are at most `parts` of them.
+    """
+    pages = -(-(stop - start) // page_size)
+    parts = min(parts, pages)
+    ranges = []
+    for part in range(parts):
+        first = start + pages * part // parts * page_size
+        last = min(stop, start + pages * (part + 1) // parts * page_size)
+        ranges.append((first, last))
+    return ranges
+
+
+def infer_format(path):
+    if path.endswith(".parquet"):
+        return "parquet"
+    return "ndjson"
+
+
+class PageRange(object):
+    """The raw objects of a cursor from offset `start` to `stop`"""
+
+    def __init__(self, cursor, start, stop):
+        self.cursor = cursor
+        self.start = start
+        self.stop = stop
+
+    def iter_batches(self):
+        for page in self.cursor.iter_pages(self.start):
+            offset = page["start_element"]
+            data = self.cursor._raw_data(page) or []
+            data = data[max(0, self.start - offset):self.stop - offset]
+            if not data:
+                break
+            yield data
+            if offset + page["num_elements"] >= self.stop:
+                break
+
+
+def client_options(client, directory):
+    """What a worker process needs to create a client sharing `client`'s
+    token and rate budget, using files in `directory`
+    """
+    token_file = client.token_file
+    if token_file is None:
+        token_file = os.path.join(directory, "token")
+        if client.token:
+            fd = os.open(token_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                         0o600)
+            with os.fdopen(fd, "w") as fp:
+                fp.write(client.token)
+    rate_limiter = None
+    if client.rate_limiter is not None:
+        rate_limiter = client.rate_limiter.shared(
+            os.path.join(directory, "ratelimit"))
+    return {"client_class": type(client),
+            "username": client.credentials["username"],
+            "password": client.credentials["password"],
+            "test": client.test, "url": client.url,
+            "test_url": client.test_url, "token_file": token_file,
+            "rate_limiter": rate_limiter}
+
+
+def create_client(options):
+    client = options["client_class"](
+        options["username"], options["password"], options["test"],
+        token_file=options["token_file"],
+        rate_limiter=options["rate_limiter"])
+    client.url = options["url"]
+    client.test_url = options["test_url"]
+    return client
+
+
+def write_ndjson(batches, path, fields=None):
+    count = 0
+    with open(path, "w") as fp:
+        for objects in batches.iter_batches():
+            if fields is not None:
+                objects = [{field: obj.get(field) for field in fields}
+                           for obj in objects]
+            fp.write("".join(json.dumps(obj) + "\n" for obj in objects))
+            count += len(objects)
+    return count
+
+
+def write_parquet(batches, path, fields=None, types=None):
+    parquet = columns.import_optional("pyarrow.parquet", "export to Parquet")
+    table = columns.to_arrow(batches, fields, types)
+    parquet.write_table(table, path)
+    return table.num_rows
+
+
+def export_range(options, service_name, specs, batch_size, start, stop,
+                 path, format, fields=None, types=None):
+    """Write the objects of a service from offset `start` to `stop`
+
+    This runs in the worker processes of :func:`export`.
+    """
+    from appnexus.cursor import Cursor
+    client = create_client(options)
+    try:
+        cursor = Cursor(client, service_name, raw, **specs)
+        cursor.batch_size(batch_size)
+        batches = PageRange(cursor, start, stop)
+        if format == "parquet":
+            return write_parquet(batches, path, fields, types)
+        return write_ndjson(batches, path, fields)
+    finally:
+        client.close()
+
+
+def merge_ndjson(shards, path):
+    with open(path, "wb") as output:
+        for shard in shards:
+            with open(shard, "rb") as fp:
+                shutil.copyfileobj(fp, output)
+
+
+def merge_parquet(shards, path, fields=None, types=None):
+    """Concatenate Parquet shards whose columns may differ
+
+    Missing columns are filled with nulls, and columns which are null in a
+    shard take the type they have in the others.
+    """
+    pyarrow = columns.import_optional("pyarrow", "export to Parquet")
+    parquet = columns.import_optional("pyarrow.parquet", "export to Parquet")
+    schemas = [parquet.read_schema(shard) for shard in shards]
+    known_types = columns.arrow_types(pyarrow)
+    fields_types = {field: known_types.get((types or {}).get(field))
+                    for field in fields or ()}
+    for schema in schemas:
+        for field in schema:
+            if fields_types.get(field.name) in (None, pyarrow.null()):
+                fields_types[field.name] = field.type
+    schema = pyarrow.schema([(name, type or pyarrow.null())
+                             for name, type in fields_types.items()])
+    with parquet.ParquetWriter(path, schema) as writer:
+        for shard in shards:
+            table = parquet.read_table(shard)
+            arrays = []
+            for field in schema:
+                if field.name in table.column_names:
+                    arrays.append(table[field.name].cast(field.type))
+                else:
+                    arrays.append(pyarrow.nulls(table.num_rows, field.type))
+            writer.write_table(pyarrow.Table.from_arrays(arrays,
+                                                         schema=schema))
+
+
+def export(cursor, path, processes=4, format=None, fields=None, types=None):
+    """Export the objects of `cursor` to the file at `path`
+
+    The offsets from the cursor's `skip` to its `limit` are split in
+    contiguous ranges of pages, which are fetched and decoded by `processes`
+    worker processes. Each worker writes a shard, and the shards are merged
+    in order at the end. The workers share the token of the cursor's client
+    through its token file (or a temporary one, only readable by its owner),
+    and its rate limiter, if any, through files, so that their requests fit
+    in a single budget.
+
+    :param format: ``ndjson`` (newline-delimited JSON) or ``parquet``,
+                   inferred from the extension of `path` by default
+    :param fields: the fields to keep, in order (all of them by default)
+    :param types: maps fields to AppNexus types, for Parquet columns
+    :return: the number of exported objects
+    """
+    format = format or infer_format(path)
+    if format not in formats:
+        raise ValueError("unknown export format '{}'".format(format))
+    if processes < 1:
+        raise ValueError("processes must be a positive integer")
+    start, stop = cursor.offsets()
+    ranges = partition(start, stop, cursor.page_size, processes)
+
+    directory = tempfile.mkdtemp(prefix=".export-",
+                                 dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        options = client_options(cursor.client, directory)
+        shards = [os.path.join(directory, "part{:03}".format(index))
+                  for index in range(len(ranges))]
+        arguments = [(options, cursor.service_name, cursor.specs,
+                      cursor.page_size, first, last, shard, format,
+                      fields, types)
+                     for (first, last), shard in zip(ranges, shards)]
+        if len(arguments) > 1:
+            # Imported here, as multiprocessing is slow to import
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            context = multiprocessing.get_context(start_method)
+            with ProcessPoolExecutor(len(arguments),
+                                     mp_context=context) as executor:
+                futures = [executor.submit(export_range, *args)
+                           for args in arguments]
+                exported = sum(future.result() for future in futures)
+        else:
+            exported = sum(export_range(*args) for args in arguments)
+
+        if format == "parquet":
+            merge_parquet(shards, path, fields, types)
+        else:
+            merge_ndjson(shards, path)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return exported
+
+
+__all__ = ["PageRange", "export", "export_range", "formats", "partition"]
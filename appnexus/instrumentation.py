@@ -0,0 +1,225 @@
+import bisect
+import logging
+import socket
+import threading
+from collections import defaultdict
+
+hook_names = ("on_request", "on_response", "on_retry", "on_rate_limited",
+              "on_token_refresh", "on_circuit_open")
+
+logger = logging.getLogger("appnexus-client")
+
+
+class Event(object):
+    """Describes something that happened to a request sent by a client
+
+    Events have a `name` (``request``, ``response``, ``retry``,
+    ``rate_limited``, ``token_refresh`` or ``circuit_open``), the
+    `service_name` and HTTP `method` of the request, and fields depending on
+    their name: `uri`, `attempt`, `status_code`, `elapsed` (in seconds),
+    `bytes`, `reason`, `waiting_time` and `source`. Missing fields are None.
+    """
+
+    def __init__(self, name, service_name=None, method=None, **fields):
+        self.name = name
+        self.service_name = service_name
+        self.method = method
+        self.__dict__.update(fields)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return None
+
+    def __repr__(self):
+        fields = ", ".join("{}={!r}".format(key, value)
+                           for key, value in sorted(self.__dict__.items()))
+        return "Event({})".format(fields)
+
+
+class Hooks(object):
+    """Holds the callbacks called with the events of a client"""
+
+    def __init__(self):
+        self._callbacks = {name: [] for name in hook_names}
+
+    def __bool__(self):
+        return any(self._callbacks.values())
+
+    def register(self, name, callback):
+        if name not in self._callbacks:
+            raise ValueError("unknown hook '{}'".format(name))
+        self._callbacks[name].append(callback)
+        return callback
+
+    def unregister(self, name, callback):
+        self._callbacks[name].remove(callback)
+
+    def emit(self, event):
+        """Call the callbacks of `event`; their errors are logged, not raised,
+        so they can't fail the request
+        """
+        for callback in self._callbacks["on_" + event.name]:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("on_%s hook %r failed", event.name,
+                                 callback)
+
+
+class Metrics(object):
+    """Counts the requests of clients and measures their latency
+
+    Counters and latency histograms are kept per service and method, and can
+    be exported in the Prometheus text format.
+    """
+
+    buckets = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self, buckets=None):
+        if buckets is not None:
+            self.buckets = tuple(sorted(buckets))
+        self.counters = defaultdict(int)
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def attach(self, client):
+        """Register the hooks of the metrics on `client`"""
+        for name in hook_names:
+            if name != "on_request":
+                getattr(client, name)(self.record)
+        return self
+
+    def record(self, event):
+        labels = (event.service_name, event.method)
+        with self._lock:
+            if event.name == "response":
+                self.counters["requests", labels + (event.status_code,)] += 1
+                self.counters["response_bytes", labels] += event.bytes or 0
+                self._observe(labels, event.elapsed)
+            elif event.name == "retry":
+                self.counters["retries", labels + (event.reason,)] += 1
+            elif event.name == "rate_limited":
+                self.counters["rate_limited", labels + (event.source,)] += 1
+            elif event.name == "token_refresh":
+                self.counters["token_refreshes", ()] += 1
+            elif event.name == "circuit_open":
+                self.counters["circuits_opened", (event.service_name,)] += 1
+
+    def _observe(self, labels, elapsed):
+        histogram = self.histograms.get(labels)
+        if histogram is None:
+            histogram = self.histograms[labels] = {
+                "buckets": [0] * len(self.buckets), "sum": 0, "count": 0}
+        index = bisect.bisect_left(self.buckets, elapsed)
+        if index < len(self.buckets):
+            histogram["buckets"][index] += 1
+        histogram["sum"] += elapsed
+        histogram["count"] += 1
+
+    label_names = {"requests": ("service", "method", "status"),
+                   "response_bytes": ("service", "method"),
+                   "retries": ("service", "method", "reason"),
+                   "rate_limited": ("service", "method", "source"),
+                   "token_refreshes": (),
+                   "circuits_opened": ("service",)}
+
+    descriptions = {"requests": "Responses received, by status code",
+                    "response_bytes": "Bytes of the responses received",
+                    "retries": "Requests retried, by reason",
+                    "rate_limited": "Requests delayed by a rate limit",
+                    "token_refreshes": "Authentication tokens requested",
+                    "circuits_opened": "Circuit breakers opened",
+                    "request_seconds": "Latency of the requests"}
+
+    @staticmethod
+    def _escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"') \
+            .replace("\n", "\\n")
+
+    def _labels(self, names, values):
+        if not names:
+            return ""
+        return "{" + ",".join('{}="{}"'.format(name, self._escape(value))
+                              for name, value in zip(names, values)) + "}"
+
+    def _header(self, lines, prefix, name, kind):
+        metric = "{}_{}".format(prefix, name)
+        if kind == "counter":
+            metric += "_total"
+        lines.append("# HELP {} {}".format(metric, self.descriptions[name]))
+        lines.append("# TYPE {} {}".format(metric, kind))
+
+    def to_prometheus(self, prefix="appnexus"):
+        """Export the metrics in the Prometheus text format"""
+        lines = []
+        with self._lock:
+            previous = None
+            for (name, values), value in sorted(self.counters.items(),
+                                                key=repr):
+                if name != previous:
+                    self._header(lines, prefix, name, "counter")
+                    previous = name
+                lines.append("{}_{}_total{} {}".format(
+                    prefix, name, self._labels(self.label_names[name],
+                                               values), value))
+            if self.histograms:
+                self._header(lines, prefix, "request_seconds", "histogram")
+            for labels, histogram in sorted(self.histograms.items(),
+                                            key=repr):
+                label = self._labels(("service", "method"), labels)[1:-1]
+                cumulated = 0
+                for bound, count in zip(self.buckets, histogram["buckets"]):
+                    cumulated += count
+                    lines.append('{}_request_seconds_bucket{{{},le="{}"}} {}'
+                                 .format(prefix, label, bound, cumulated))
+                lines.append('{}_request_seconds_bucket{{{},le="+Inf"}} {}'
+                             .format(prefix, label, histogram["count"]))
+                lines.append("{}_request_seconds_sum{{{}}} {}".format(
+                    prefix, label, histogram["sum"]))
+                lines.append("{}_request_seconds_count{{{}}} {}".format(
+                    prefix, label, histogram["count"]))
+        return "\n".join(lines) + "\n"
+
+
+class StatsdMetrics(object):
+    """Sends the counters and latencies of a client to a StatsD server"""
+
+    def __init__(self, host="localhost", port=8125, prefix="appnexus"):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def attach(self, client):
+        """Register the hooks of the metrics on `client`"""
+        for name in hook_names:
+            if name != "on_request":
+                getattr(client, name)(self.record)
+        return self
+
+    def _name(self, *parts):
+        return ".".join(str(part).replace(".", "_").replace("/", "_")
+                        for part in (self.prefix,) + parts)
+
+    def record(self, event):
+        if event.name == "response":
+            path = (event.service_name, event.method)
+            lines = ["{}:1|c".format(self._name("requests", *path + (
+                event.status_code,))),
+                "{}:{:.3f}|ms".format(self._name("latency", *path),
+                                      event.elapsed * 1000)]
+        elif event.name == "token_refresh":
+            lines = ["{}:1|c".format(self._name("token_refreshes"))]
+        else:
+            lines = ["{}:1|c".format(self._name(
+                event.name, event.service_name, event.method))]
+        try:
+            self.socket.sendto("\n".join(lines).encode(), self.address)
+        except OSError:
+            pass
+
+    def close(self):
+        self.socket.close()
+
+
+__all__ = ["Event", "Hooks", "Metrics", "StatsdMetrics", "hook_names"]
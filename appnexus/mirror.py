@@ -0,0 +1,88 @@
+from appnexus.cursor import Cursor
+from appnexus.sync import SQLiteStore, Synchronizer
+
+
+class MirrorCursor(Cursor):
+    """Cursor reading its pages from a :class:`Mirror` instead of the API"""
+
+    def __init__(self, mirror, client, service_name, representation,
+                 **specs):
+        super(MirrorCursor, self).__init__(client, service_name,
+                                           representation, **specs)
+        self.mirror = mirror
+
+    def get_page(self, start_element=0, num_elements=None, stream=False):
+        if num_elements is None:
+            num_elements = self._batch_size
+        store = self.mirror.store
+        objects = store.query(self.service_name, self.specs, start_element,
+                              num_elements)
+        page = {"count": store.count(self.service_name, **self.specs),
+                "start_element": start_element,
+                "num_elements": len(objects),
+                self.service_name: objects}
+        self._count = page["count"]
+        return page
+
+    def stream(self):
+        return self
+
+    def clone(self):
+        return MirrorCursor(self.mirror, self.client, self.service_name,
+                            self.representation, **self.specs)
+
+
+class Mirror(Synchronizer):
+    """Answers `find` requests from a local copy of some services
+
+    When a client has a mirror, the requests of `find` on a mirrored service
+    whose filters are all indexed are answered from the local store. Other
+    requests are sent to the API. A service is synchronized before being read
+    when its last synchronization is older than its maximum age, and writes
+    to a service mark it as stale. This synchronization runs in the `find`
+    call and blocks it until it is done: call :meth:`sync` beforehand (for
+    instance, periodically in a background thread) to keep `find` fast.
+
+    :param path: the path of the SQLite database (in memory by default)
+    :param services: maps the mirrored services to their maximum age in
+                     seconds, or lists them to use `max_age`
+    :param indexes: the fields which can be filtered on
+    """
+
+    default_indexes = ("advertiser_id", "line_item_id", "insertion_order_id",
+                       "campaign_id", "state", "code")
+
+    def __init__(self, path=":memory:", services=(), indexes=None,
+                 max_age=3600, client=None, detect_deletions=True,
+                 reconcile_interval=24 * 60 * 60):
+        if indexes is None:
+            indexes = self.default_indexes
+        if not isinstance(services, dict):
+            services = dict.fromkeys(services, max_age)
+        super(Mirror, self).__init__(client, SQLiteStore(path, indexes),
+                                     list(services), detect_deletions,
+                                     reconcile_interval)
+        self.max_ages = services
+        self.indexes = frozenset(indexes) | {"id"}
+
+    def answers(self, service_name, filters):
+        """Tell whether a `find` request can be answered by the mirror"""
+        return (service_name in self.max_ages
+                and all(field in self.indexes for field in filters))
+
+    def cursor(self, service_name, representation, **filters):
+        """Return a cursor on the mirrored objects matching `filters`
+
+        A stale service is synchronized first, before this returns.
+        """
+        if self.is_stale(service_name, self.max_ages[service_name]):
+            self.sync(service_name)
+        return MirrorCursor(self, self.client, service_name, representation,
+                            **filters)
+
+    def expire(self, service_name):
+        if service_name in self.max_ages:
+            self.store.expire(service_name)
+
+
+__all__ = ["Mirror", "MirrorCursor"]
@@ -1,17 +1,41 @@
+import functools
 import logging
 import time
 
 from thingy import Thingy
 
+from appnexus.bulk import run_bulk
 from appnexus.client import AppNexusClient, client, services_list
 from appnexus.utils import classproperty, normalize_service_name
 
 logger = logging.getLogger("appnexus-client")
 
 
+class Relation(object):
+    """Describes how related objects are loaded for many models at once
+
+    :param model_name: the name of the model of the related objects
+    :param key: the field of the model holding the key of the relation
+    :param foreign_key: the field of the related objects matching the key
+    """
+
+    def __init__(self, model_name, key, foreign_key="id"):
+        self.model_name = model_name
+        self.key = key
+        self.foreign_key = foreign_key
+
+
+relations = {
+    "budget_splitter": Relation("BudgetSplitter", "id"),
+    "profile": Relation("Profile", "profile_id"),
+}
+
+
 class Model(Thingy):
     """Generic model for AppNexus data"""
+    __slots__ = ("_related",)
     _update_on_save = True
+    prefetch_batch_size = 100
     client = client
 
     @classmethod
@@ -29,7 +53,11 @@ class Model(Thingy):
 
     @classmethod
     def find_one(cls, **kwargs):
-        return cls.find(**kwargs).first
+        representation = (kwargs.pop("representation", None)
+                          or cls.client.representation
+                          or cls.constructor)
+        return cls.client.find_one(cls.service_name,
+                                   representation=representation, **kwargs)
 
     @classmethod
     def count(cls, **kwargs):
@@ -59,14 +87,16 @@ class Model(Thingy):
 
     @classmethod
     def constructor(cls, client, service_name, obj):
-        cls.client = client
-        cls.service_name = service_name
+        if cls.client is not client:
+            cls.client = client
+        if cls.service_name != service_name:
+            cls.service_name = service_name
         return cls(obj)
 
     def save(self, **kwargs):
         payload = self.__dict__
         if "id" not in self.__dict__:
-            logger.info("creating a {}".format(self.service_name))
+            logger.info("creating a %s", self.service_name)
             result = self.create(payload, **kwargs)
         else:
             result = self.modify(payload, id=self.id, **kwargs)
@@ -75,6 +105,56 @@ class Model(Thingy):
             self.update(result)
         return self
 
+    def _get_related(self, name, load):
+        """Return the prefetched related objects `name`, or `load` them"""
+        related = self._related
+        if related is None or name not in related:
+            return load()
+        return related[name]
+
+    def _set_related(self, name, value):
+        if self._related is None:
+            object.__setattr__(self, "_related", {})
+        self._related[name] = value
+
+    @classmethod
+    def prefetch_related(cls, objects, *names):
+        """Load the related objects `names` of `objects` in bulk
+
+        Keys are collected from every object and the related objects are
+        requested with lists of keys, rather than with a request per object.
+        They are kept out of the fields of the objects, so they aren't sent
+        when saving.
+        """
+        for name in names:
+            relation = relations.get(name)
+            if relation is None or not hasattr(cls, name):
+                raise ValueError("'{}' has no prefetchable relation '{}'"
+                                 .format(cls.__name__, name))
+            keys = sorted({getattr(obj, relation.key) for obj in objects}
+                          - {None})
+            model = get_model(relation.model_name)
+            related = {}
+            for start in range(0, len(keys), cls.prefetch_batch_size):
+                filters = {relation.foreign_key:
+                           keys[start:start + cls.prefetch_batch_size]}
+                for related_object in model.find(**filters):
+                    related[getattr(related_object, relation.foreign_key)] = \
+                        related_object
+            for obj in objects:
+                obj._set_related(name, related.get(getattr(obj, relation.key)))
+
+    @classmethod
+    def save_many(cls, objects, workers=8, **kwargs):
+        """Save `objects` concurrently
+
+        Each object is created or modified like with `save`. Failures don't
+        stop the other saves, they are reported in the returned
+        :class:`appnexus.bulk.BulkWriteResult`.
+        """
+        calls = [functools.partial(obj.save, **kwargs) for obj in objects]
+        return run_bulk(calls, workers=workers)
+
 
 class AlphaModel(Model):
     _update_on_save = False
@@ -127,12 +207,51 @@ class LineItemModel(AlphaModel):
 
 class Report(Model):
 
-    def download(self, retry_count=3, **kwargs):
+    def _wait(self, retry_count):
         while not self.is_ready and retry_count > 0:
             retry_count -= 1
             time.sleep(1)
+
+    def download(self, retry_count=3, **kwargs):
+        self._wait(retry_count)
         return self.client.get("report-download", id=self.report_id)
 
+    def column_types(self):
+        """Map the requested columns to their types, from the report meta"""
+        from appnexus.reports import report_column_types
+
+        return report_column_types(self.client, self.report_type,
+                                   self.columns)
+
+    def reader(self, types=None, retry_count=3, decompress=None):
+        """Stream the download in a :class:`appnexus.reports.ReportReader`
+
+        Columns are typed from the report meta unless `types` is given.
+        """
+        from appnexus.reports import ReportReader, open_download
+
+        if types is None:
+            types = self.column_types()
+        self._wait(retry_count)
+        return ReportReader(open_download(self.client, self.report_id,
+                                          decompress), types)
+
+    def iter_rows(self, types=None, **kwargs):
+        """Iterate over the rows of the report, with typed values"""
+        with self.reader(types, **kwargs) as reader:
+            for row in reader.iter_rows():
+                yield row
+
+    def to_numpy(self, types=None, **kwargs):
+        """Load the report as a dictionary of numpy arrays"""
+        with self.reader(types, **kwargs) as reader:
+            return reader.to_numpy()
+
+    def to_dataframe(self, types=None, **kwargs):
+        """Load the report in a `pandas.DataFrame`"""
+        with self.reader(types, **kwargs) as reader:
+            return reader.to_dataframe()
+
     @property
     def is_ready(self):
         status = self.client.get("report",
@@ -144,39 +263,73 @@ class BudgetSplitterMixin():
 
     @property
     def budget_splitter(self):
-        return BudgetSplitter.find_one(id=self.id)  # noqa: F821
+        return self._get_related(
+            "budget_splitter",
+            lambda: get_model("BudgetSplitter").find_one(id=self.id))
 
 
 class ChangeLogMixin():
 
     @property
     def changelog(self):
-        return ChangeLog.find(service=self.service_name,  # noqa: F821
-                              resource_id=self.id)
+        return get_model("ChangeLog").find(service=self.service_name,
+                                           resource_id=self.id)
 
 
 class ProfileMixin():
 
     @property
     def profile(self):
-        return Profile.find_one(id=self.profile_id)  # noqa: F821
+        return self._get_related(
+            "profile",
+            lambda: get_model("Profile").find_one(id=self.profile_id))
+
+
+def create_model(service_name):
+    """Create the model class of the service `service_name`"""
+    ancestors = [Model]
+    if service_name in ("LineItem"):
+        ancestors.append(BudgetSplitterMixin)
+    if service_name in ("Campaign", "InsertionOrder", "LineItem",
+                        "Profile"):
+        ancestors.append(ChangeLogMixin)
+    if service_name in ("AdQualityRule", "Advertiser", "Campaign",
+                        "Creative", "LineItem", "PaymentRule"):
+        ancestors.append(ProfileMixin)
+    return type(service_name, tuple(ancestors), {})
 
 
 def create_models(services_list):
+    """Create the models of the services in `services_list` now rather
+    than on first use
+    """
     for service_name in services_list:
-        ancestors = [Model]
-        if service_name in ("LineItem"):
-            ancestors.append(BudgetSplitterMixin)
-        if service_name in ("Campaign", "InsertionOrder", "LineItem",
-                            "Profile"):
-            ancestors.append(ChangeLogMixin)
-        if service_name in ("AdQualityRule", "Advertiser", "Campaign",
-                            "Creative", "LineItem", "PaymentRule"):
-            ancestors.append(ProfileMixin)
-        model = type(service_name, tuple(ancestors), {})
-        globals().setdefault(service_name, model)
-
-
-create_models(services_list)
-
-__all__ = ["Model", "services_list"] + services_list
+        get_model(service_name)
+
+
+def get_model(service_name):
+    """Return the model of the service `service_name`
+
+    Models which aren't defined in this module are created on first use.
+    """
+    model = globals().get(service_name)
+    if model is None:
+        if service_name not in service_models:
+            raise AttributeError("module '{}' has no attribute '{}'".format(
+                __name__, service_name))
+        model = globals().setdefault(service_name,
+                                     create_model(service_name))
+    return model
+
+
+# Models are created when they are first imported or accessed, which keeps
+# importing the package cheap
+service_models = frozenset(services_list)
+__getattr__ = get_model
+
+
+def __dir__():
+    return sorted(set(globals()) | service_models)
+
+
+__all__ = ["Model", "Relation", "services_list"] + services_list
@@ -0,0 +1,68 @@
+from urllib.parse import quote
+
+# Characters left as is in the values of query parameters: commas separate
+# the members of lists (``id=1,2,3``), colons and slashes are common in dates
+# and paths
+safe_characters = ",:/"
+
+
+def encode_value(value):
+    """Encode the value of a query parameter
+
+    Lists and tuples are joined with commas, booleans are sent as ``true`` or
+    ``false``, and everything is URL-encoded (as UTF-8).
+    """
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, (list, tuple)):
+        return ",".join([quote(str(member), safe=safe_characters)
+                         for member in value])
+    return quote(str(value), safe=safe_characters)
+
+
+def encode_query(parameters):
+    """Encode query parameters, sorted by name so that the same parameters
+    always give the same query string
+    """
+    return "&".join(["{}={}".format(quote(str(key), safe=""),
+                                    encode_value(value))
+                     for key, value in sorted(parameters.items())])
+
+
+class PreparedRequest(object):
+    """The target of requests sent to a service with fixed parameters
+
+    The fixed parameters are encoded once. Requests which only add other
+    parameters, such as the pages of a cursor adding ``start_element`` and
+    ``num_elements``, only have these encoded.
+    """
+
+    def __init__(self, service_name, parameters=None):
+        self.service_name = service_name
+        self.parameters = dict(parameters or {})
+        self.query = encode_query(self.parameters)
+
+    def target(self, **parameters):
+        """Return the path and query string of a request
+
+        `parameters` are added to the fixed parameters, which they may
+        repeat. Only the other parameters are encoded, unless the value of a
+        fixed parameter is changed.
+        """
+        extra = {}
+        for key, value in parameters.items():
+            if key not in self.parameters:
+                extra[key] = value
+            elif not (value is self.parameters[key]
+                      or value == self.parameters[key]):
+                merged = dict(self.parameters, **parameters)
+                return PreparedRequest(self.service_name, merged).target()
+        query = "&".join(filter(None, [self.query, encode_query(extra)]))
+        if query:
+            return "{}?{}".format(self.service_name, query)
+        return self.service_name
+
+
+__all__ = ["PreparedRequest", "encode_query", "encode_value"]
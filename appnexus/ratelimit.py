@@ -0,0 +1,170 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: nocover
+    fcntl = None
+
+
+class TokenBucket(object):
+    """Allows `rate` requests per `period` seconds
+
+    Tokens are refilled continuously, up to `capacity` (`rate` by default).
+    A request that finds the bucket empty takes its token anyway and is told
+    how long to wait before being sent, so requests queue up fairly. The
+    bucket can be shared between threads.
+    """
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, rate, period=60, capacity=None):
+        if rate <= 0 or period <= 0:
+            raise ValueError("rate and period must be positive")
+        self.rate = rate
+        self.period = period
+        self.capacity = capacity if capacity is not None else rate
+        self._lock = threading.Lock()
+        self._state = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked_state(self):
+        with self._lock:
+            if self._state is None:
+                self._state = [self.capacity, self.clock()]
+            yield self._state
+
+    def reserve(self, tokens=1):
+        """Take `tokens` from the bucket and return how long to wait"""
+        with self._locked_state() as state:
+            now = self.clock()
+            refill = (now - state[1]) * self.rate / self.period
+            state[0] = min(self.capacity, state[0] + refill) - tokens
+            state[1] = now
+            if state[0] >= 0:
+                return 0
+            return -state[0] * self.period / self.rate
+
+    def acquire(self, tokens=1):
+        """Wait until `tokens` can be spent, return the time waited"""
+        waiting_time = self.reserve(tokens)
+        if waiting_time:
+            time.sleep(waiting_time)
+        return waiting_time
+
+
+class FileTokenBucket(TokenBucket):
+    """A token bucket stored in a file, shareable between processes
+
+    Every process using the same `path` shares the same budget. The file is
+    locked while the bucket is updated.
+    """
+
+    clock = staticmethod(time.time)
+
+    def __init__(self, path, rate, period=60, capacity=None):
+        if fcntl is None:  # pragma: nocover
+            raise RuntimeError("FileTokenBucket requires fcntl")
+        super(FileTokenBucket, self).__init__(rate, period, capacity)
+        self.path = path
+
+    @contextmanager
+    def _locked_state(self):
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            with os.fdopen(fd, "r+") as fp:
+                fcntl.flock(fp, fcntl.LOCK_EX)
+                try:
+                    state = json.loads(fp.read() or "null")
+                    if state is None:
+                        state = [self.capacity, self.clock()]
+                    yield state
+                    fp.seek(0)
+                    fp.truncate()
+                    fp.write(json.dumps(state))
+                    fp.flush()
+                finally:
+                    fcntl.flock(fp, fcntl.LOCK_UN)
+
+
+class RateLimiter(object):
+    """Paces the requests of a client under the AppNexus rate limits
+
+    AppNexus limits reads and writes separately, so GET requests take their
+    token from the `read` bucket and the other methods from the `write`
+    bucket. Authentication requests use the `auth` bucket if there is one.
+    """
+
+    write_methods = {"post", "put", "delete", "patch"}
+
+    def __init__(self, read=None, write=None, auth=None):
+        self.read = read
+        self.write = write
+        self.auth = auth
+
+    @classmethod
+    def from_limits(cls, reads=100, writes=60, period=60, path=None):
+        """Create a limiter allowing `reads` and `writes` per `period`
+
+        If `path` is given, the budgets are stored in files prefixed by it and
+        shared by every process using the same path.
+        """
+        if path is None:
+            return cls(TokenBucket(reads, period), TokenBucket(writes, period))
+        return cls(FileTokenBucket(path + ".read", reads, period),
+                   FileTokenBucket(path + ".write", writes, period))
+
+    def shared(self, path):
+        """Return a limiter with the same budgets, shared between processes
+
+        Buckets which aren't already stored in files are replaced by file
+        buckets prefixed by `path`. The returned limiter can be pickled and
+        sent to other processes.
+        """
+        def share(bucket, suffix):
+            if bucket is None or isinstance(bucket, FileTokenBucket):
+                return bucket
+            return FileTokenBucket(path + suffix, bucket.rate, bucket.period,
+                                   bucket.capacity)
+        return RateLimiter(share(self.read, ".read"),
+                           share(self.write, ".write"),
+                           share(self.auth, ".auth"))
+
+    def bucket(self, method):
+        if method == "auth":
+            return self.auth
+        if method.lower() in self.write_methods:
+            return self.write
+        return self.read
+
+    def reserve(self, method):
+        """Take a token for `method` and return how long to wait"""
+        bucket = self.bucket(method)
+        if bucket is None:
+            return 0
+        return bucket.reserve()
+
+    def acquire(self, method):
+        """Wait until a request with `method` can be sent
+
+        :return: the time waited, in seconds
+        """
+        waiting_time = self.reserve(method)
+        if waiting_time:
+            time.sleep(waiting_time)
+        return waiting_time
+
+
+__all__ = ["FileTokenBucket", "RateLimiter", "TokenBucket"]
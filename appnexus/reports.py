@@ -0,0 +1,421 @@
+import csv
+import gzip
+import heapq
+import io
+import itertools
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from appnexus import columns
+from appnexus.exceptions import ReportError
+from appnexus.streaming import StreamedPage
+
+logger = logging.getLogger("appnexus-client")
+
+converters = {"int": int, "double": float, "money": float}
+numpy_dtypes = {"int": "int64", "double": "float64", "money": "float64"}
+
+
+class ChunksReader(io.RawIOBase):
+    """Reads an iterable of bytes chunks as a binary file"""
+
+    def __init__(self, chunks, close=None):
+        self._chunks = iter(chunks)
+        self._chunk = b""
+        self._close = close
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._chunk:
+            self._chunk = next(self._chunks, None)
+            if self._chunk is None:
+                self._chunk = b""
+                return 0
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+    def close(self):
+        if self._close is not None:
+            self._close()
+            self._close = None
+        super(ChunksReader, self).close()
+
+
+def open_chunks(chunks, decompress=None, close=None):
+    """Open an iterable of bytes chunks as a binary file
+
+    With `decompress` set to None, gzipped contents are detected from their
+    first bytes and decompressed on the fly.
+    """
+    reader = io.BufferedReader(ChunksReader(chunks, close),
+                               buffer_size=64 * 1024)
+    if decompress is None:
+        decompress = reader.peek(2)[:2] == b"\x1f\x8b"
+    if decompress:
+        return gzip.GzipFile(fileobj=reader, mode="rb")
+    return reader
+
+
+def open_download(client, report_id, decompress=None):
+    """Open the download of a ready report as a streamed binary file
+
+    :raises ReportError: if the API answers with JSON instead of the report
+    """
+    response = client.get("report-download", id=report_id, stream=True)
+    if isinstance(response, StreamedPage):
+        page = response.page
+        response.close()
+        raise ReportError(report_id, page.get("error")
+                          or "the download returned no report")
+    chunks = response.iter_content(client.stream_chunk_size)
+    return open_chunks(chunks, decompress, close=response.close)
+
+
+def report_column_types(client, report_type, report_columns=None):
+    """Map the columns of a report type to their types, given by its meta
+
+    :param report_columns: the requested columns, to keep only their types
+    """
+    response = client.get("report", meta=report_type) or {}
+    meta = response.get("meta") or {}
+    types = {column["column"]: column.get("type")
+             for column in meta.get("columns", ())}
+    if report_columns is not None:
+        types = {column: types.get(column) for column in report_columns}
+    return types
+
+
+def _converter(type):
+    convert = converters.get(type)
+    if convert is None:
+        return None
+
+    def convert_value(value):
+        return convert(value) if value else None
+    return convert_value
+
+
+def _numpy_column(numpy, values, type):
+    dtype = numpy_dtypes.get(type)
+    if dtype is None:
+        return numpy.array(values, dtype=object)
+    strings = numpy.array(values)
+    try:
+        return strings.astype(dtype)
+    except ValueError:
+        return numpy.where(strings == "", "nan", strings).astype("float64")
+
+
+class ReportReader(object):
+    """Parses a report in CSV, converting its columns to their types
+
+    Values of ``int``, ``double`` and ``money`` columns are converted to
+    numbers, empty ones to None. Other columns are kept as strings.
+
+    :param source: the report as a binary file
+    :param types: maps columns to their AppNexus types
+    """
+
+    chunk_size = 100000
+
+    def __init__(self, source, types=None, encoding="utf-8"):
+        self.source = source
+        self.types = types or {}
+        self.encoding = encoding
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.source.close()
+
+    def _reader(self):
+        text = io.TextIOWrapper(self.source, encoding=self.encoding,
+                                newline="")
+        reader = csv.reader(text)
+        header = next(reader, None) or []
+        return header, reader
+
+    def iter_rows(self):
+        """Iterate over the rows of the report, as dictionaries"""
+        header, reader = self._reader()
+        conversions = [(index, converter) for index, converter in enumerate(
+            _converter(self.types.get(column)) for column in header)
+            if converter is not None]
+        for row in reader:
+            for index, converter in conversions:
+                row[index] = converter(row[index])
+            yield dict(zip(header, row))
+
+    def iter_chunks(self):
+        """Iterate over chunks of `chunk_size` rows, as lists of columns"""
+        header, reader = self._reader()
+        while True:
+            rows = list(itertools.islice(reader, self.chunk_size))
+            if not rows:
+                return
+            yield header, list(zip(*rows))
+
+    def _line_chunks(self, text):
+        """Iterate over chunks of about `chunk_size` lines made of whole
+        records, and whether one of their records spans several lines
+
+        A record goes on while it has an odd number of quotes, as quotes
+        inside quoted values are doubled.
+        """
+        chunk, multiline, quotes = [], False, 0
+        for line in text:
+            chunk.append(line)
+            quotes += line.count('"')
+            if quotes % 2:
+                multiline = True
+                continue
+            quotes = 0
+            if len(chunk) >= self.chunk_size:
+                yield chunk, multiline
+                chunk, multiline = [], False
+        if chunk:
+            yield chunk, multiline
+
+    def to_numpy(self):
+        """Load the report as a dictionary of numpy arrays
+
+        Chunks of `chunk_size` lines are parsed at once by `numpy.loadtxt`.
+        Chunks it can't parse, such as integer columns with empty values or
+        quoted values with line breaks, are parsed with the `csv` module and
+        their integer columns are loaded as floats, with NaN for the empty
+        values.
+        """
+        numpy = columns.import_optional("numpy", "load reports in arrays")
+        text = io.TextIOWrapper(self.source, encoding=self.encoding,
+                                newline="")
+        header = next(csv.reader([text.readline()]), [])
+        dtype = [("f{}".format(index),
+                  numpy_dtypes.get(self.types.get(name), "O"))
+                 for index, name in enumerate(header)]
+        chunks = []
+        for lines, multiline in self._line_chunks(text):
+            try:
+                if multiline:
+                    raise ValueError("records span several lines")
+                array = numpy.loadtxt(lines, dtype=dtype, delimiter=",",
+                                      quotechar='"', comments=None, ndmin=1)
+                chunks.append([array[name] for name, _ in dtype])
+            except Exception:
+                values = zip(*csv.reader(lines))
+                chunks.append([_numpy_column(numpy, column,
+                                             self.types.get(name))
+                               for name, column in zip(header, values)])
+        if not chunks:
+            return {}
+        return {name: numpy.concatenate([chunk[index] for chunk in chunks])
+                for index, name in enumerate(header)}
+
+    def to_dataframe(self):
+        """Load the report in a `pandas.DataFrame` with its C CSV parser
+
+        Integer columns are parsed as numpy integers, and only converted to
+        nullable integers (``Int64``) when they have empty values, which is
+        much faster than parsing them as nullable integers.
+        """
+        pandas = columns.import_optional("pandas", "load reports in "
+                                         "DataFrames")
+        dtypes, numeric = {}, []
+        for column, type in self.types.items():
+            if type in numpy_dtypes:
+                numeric.append(column)
+                if type != "int":
+                    dtypes[column] = numpy_dtypes[type]
+            elif type is not None:
+                dtypes[column] = "object"
+        dataframe = pandas.read_csv(
+            self.source, dtype=dtypes, encoding=self.encoding,
+            keep_default_na=False, na_values={column: [""]
+                                              for column in numeric})
+        for column, type in self.types.items():
+            if (type == "int" and column in dataframe
+                    and dataframe[column].dtype != "int64"):
+                dataframe[column] = dataframe[column].astype("Int64")
+        return dataframe
+
+
+class ReportJob(object):
+    """Tracks a report submitted to AppNexus until it is ready"""
+
+    def __init__(self, report_id, request=None, delay=1, submitted_at=0):
+        self.report_id = report_id
+        self.request = request
+        self.status = "pending"
+        self.polls = 0
+        self.delay = delay
+        self.submitted_at = submitted_at
+        self.next_poll = submitted_at + delay
+        self.error = None
+
+    @property
+    def is_ready(self):
+        return self.status == "ready"
+
+    @property
+    def is_done(self):
+        return self.status in ("ready", "error")
+
+    def __lt__(self, other):
+        return self.next_poll < other.next_poll
+
+    def __repr__(self):
+        return "<ReportJob {} {}>".format(self.report_id, self.status)
+
+
+class ReportManager(object):
+    """Runs many reports, from their submission to their download
+
+    Submitted reports are polled by a single scheduler loop: each report is
+    polled again after a delay growing exponentially from `initial_delay` up
+    to `max_delay`, which spares requests on long reports. Downloads are
+    streamed, to a file or to an iterator of lines or CSV rows, and gzipped
+    contents are decompressed on the fly.
+
+    :param client: an AppNexusClient instance
+    :param timeout: the number of seconds after which a report which isn't
+                    ready is considered failed
+    """
+
+    clock = staticmethod(time.monotonic)
+    sleep = staticmethod(time.sleep)
+
+    def __init__(self, client, initial_delay=1, max_delay=60, factor=2,
+                 timeout=3600):
+        self.client = client
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.timeout = timeout
+
+    def submit(self, report, **parameters):
+        """Submit a report request and return its :class:`ReportJob`"""
+        response = self.client.create("report", {"report": report},
+                                      **parameters)
+        job = ReportJob(response["report_id"], report, self.initial_delay,
+                        self.clock())
+        logger.info("submitted report %s", job.report_id)
+        return job
+
+    def submit_many(self, reports, **parameters):
+        return [self.submit(report, **parameters) for report in reports]
+
+    def poll(self, job):
+        """Update the status of a job with a single request"""
+        response = self.client.get("report", id=job.report_id)
+        job.polls += 1
+        status = response.get("execution_status")
+        if status == "ready":
+            job.status = "ready"
+        elif status == "error":
+            job.status = "error"
+            job.error = ReportError(job.report_id, response.get(
+                "report", {}).get("error") or "execution error")
+        elif self.clock() - job.submitted_at > self.timeout:
+            job.status = "error"
+            job.error = ReportError(job.report_id, "timed out after {} "
+                                    "seconds".format(self.timeout))
+        else:
+            job.status = status or job.status
+            job.delay = min(self.max_delay, job.delay * self.factor)
+            job.next_poll = self.clock() + job.delay
+        return job
+
+    def as_ready(self, jobs):
+        """Poll `jobs` until they are done, yielding each as soon as it is
+
+        Failed jobs are yielded too, with their `error` set.
+        """
+        queue = [job for job in jobs if not job.is_done]
+        heapq.heapify(queue)
+        for job in jobs:
+            if job.is_done:
+                yield job
+        while queue:
+            job = heapq.heappop(queue)
+            wait = job.next_poll - self.clock()
+            if wait > 0:
+                self.sleep(wait)
+            self.poll(job)
+            if job.is_done:
+                yield job
+            else:
+                heapq.heappush(queue, job)
+
+    def wait(self, jobs):
+        """Poll `jobs` until they are all done, then return them"""
+        return list(self.as_ready(jobs))
+
+    def open(self, job, decompress=None):
+        """Open the download of a ready report as a streamed binary file"""
+        if job.error is not None:
+            raise job.error
+        return open_download(self.client, job.report_id, decompress)
+
+    def download(self, job, path, decompress=None):
+        """Stream the download of a ready report to the file at `path`"""
+        with self.open(job, decompress) as source, open(path, "wb") as target:
+            shutil.copyfileobj(source, target, 64 * 1024)
+        return path
+
+    def iter_lines(self, job, decompress=None, encoding="utf-8"):
+        """Iterate over the lines of a ready report as it is downloaded"""
+        with self.open(job, decompress) as source:
+            for line in io.TextIOWrapper(source, encoding=encoding,
+                                         newline=""):
+                yield line
+
+    def iter_rows(self, job, decompress=None, encoding="utf-8", types=None):
+        """Iterate over the CSV rows of a ready report, as dictionaries
+
+        :param types: maps columns to their types (see :class:`ReportReader`)
+        """
+        with ReportReader(self.open(job, decompress), types,
+                          encoding) as reader:
+            for row in reader.iter_rows():
+                yield row
+
+    def download_all(self, jobs, directory, workers=4, decompress=None):
+        """Download each job to `directory` as soon as it is ready
+
+        Ready reports are downloaded by `workers` threads while the others
+        are still being polled.
+
+        :return: a dictionary mapping report ids to paths, or to the error of
+                 the failed reports
+        """
+        results, futures = {}, {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for job in self.as_ready(jobs):
+                if job.error is not None:
+                    results[job.report_id] = job.error
+                    continue
+                path = os.path.join(directory, "{}.csv".format(job.report_id))
+                futures[job.report_id] = executor.submit(self.download, job,
+                                                         path, decompress)
+            for report_id, future in futures.items():
+                try:
+                    results[report_id] = future.result()
+                except Exception as error:
+                    logger.warning("download of report %s failed: %s",
+                                   report_id, error)
+                    results[report_id] = error
+        return results
+
+
+__all__ = ["ReportJob", "ReportManager", "ReportReader", "open_chunks",
+           "open_download", "report_column_types"]
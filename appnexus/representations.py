@@ -1,5 +1,135 @@
+import keyword
+import threading
+
+
 def raw(client, service, obj):
     return obj
 
 
-__all__ = ["raw"]
+class Record(object):
+    """Base class of the records built by the `compact` representation
+
+    Known fields are stored in slots, other fields in the `_extra` dict.
+    Like models, records return None for missing fields, compare equal when
+    their fields are equal and, being mutable, are not hashable: index them
+    by their `id` instead.
+    """
+
+    __slots__ = ("_extra",)
+    _fields = ()
+    _field_set = frozenset()
+    _service_name = None
+
+    def __init__(self, obj):
+        extra = None
+        field_set = self._field_set
+        setattr = object.__setattr__
+        for key, value in obj.items():
+            if key in field_set:
+                setattr(self, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        setattr(self, "_extra", extra)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        if name == "_extra":
+            return None
+        extra = self._extra
+        if extra is not None:
+            return extra.get(name)
+        return None
+
+    def __setattr__(self, name, value):
+        if name in self._field_set:
+            object.__setattr__(self, name, value)
+            return
+        if self._extra is None:
+            object.__setattr__(self, "_extra", {})
+        self._extra[name] = value
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return self.to_dict() == other.to_dict()
+        return NotImplemented
+
+    # Equal records must hash equally, which their fields can't guarantee
+    # once modified
+    __hash__ = None
+
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__, self.to_dict())
+
+    def to_dict(self):
+        """Return the fields of the record as a dictionary"""
+        data = {}
+        for field in self._fields:
+            try:
+                data[field] = object.__getattribute__(self, field)
+            except AttributeError:
+                pass
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+
+class CompactRepresentation(object):
+    """Represents objects as instances of generated, slotted record classes
+
+    One :class:`Record` subclass is generated per service, with a slot for
+    each field listed by the service's `meta`. Slotted instances don't have a
+    per-object `__dict__`, which makes them much lighter than dictionaries or
+    models when many objects are kept in memory.
+    """
+
+    def __init__(self):
+        self.classes = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, client, service_name, obj):
+        record_class = self.classes.get(service_name)
+        if record_class is None:
+            record_class = self.record_class(client, service_name, obj)
+        return record_class(obj)
+
+    def record_class(self, client, service_name, sample=None):
+        """Return the record class of a service, generating it if needed"""
+        with self._lock:
+            if service_name not in self.classes:
+                fields = (self.fields(client, service_name)
+                          or list(sample or ()))
+                fields = tuple(field for field in fields
+                               if field.isidentifier()
+                               and not keyword.iskeyword(field)
+                               and not hasattr(Record, field))
+                name = "".join(word.capitalize()
+                               for word in service_name.split("-")) + "Record"
+                self.classes[service_name] = type(name, (Record,), {
+                    "__slots__": fields,
+                    "_fields": fields,
+                    "_field_set": frozenset(fields),
+                    "_service_name": service_name,
+                })
+            return self.classes[service_name]
+
+    def fields(self, client, service_name):
+        """List the names of the fields of a service from its meta"""
+        import inspect
+
+        meta = client.meta(service_name)
+        if inspect.isawaitable(meta):
+            meta.close()
+            raise TypeError("the compact representation needs a synchronous "
+                            "client to read the fields of '{}'"
+                            .format(service_name))
+        meta = meta or {}
+        return [field["name"] for field in meta.get("fields", ())]
+
+
+compact = CompactRepresentation()
+
+
+__all__ = ["CompactRepresentation", "Record", "compact", "raw"]
@@ -0,0 +1,149 @@
+import random
+import threading
+import time
+
+from appnexus.exceptions import CircuitOpen
+
+
+class CircuitBreaker(object):
+    """Suspends the requests to services which keep failing
+
+    After `failure_threshold` consecutive failures of a service, its circuit
+    opens: its requests fail right away with
+    :class:`appnexus.exceptions.CircuitOpen` for `reset_timeout` seconds.
+    A single request is then let through: the circuit closes if it succeeds,
+    and opens again otherwise.
+    """
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = {}
+        self._opened_at = {}
+        self._lock = threading.Lock()
+
+    def state(self, service_name):
+        """Return ``closed``, ``open`` or ``half-open``"""
+        with self._lock:
+            opened_at = self._opened_at.get(service_name)
+        if opened_at is None:
+            return "closed"
+        if opened_at + self.reset_timeout > self.clock():
+            return "open"
+        return "half-open"
+
+    def check(self, service_name):
+        """Raise `CircuitOpen` if requests to `service_name` are suspended"""
+        with self._lock:
+            opened_at = self._opened_at.get(service_name)
+            if opened_at is None:
+                return
+            now = self.clock()
+            retry_after = opened_at + self.reset_timeout - now
+            if retry_after > 0:
+                raise CircuitOpen(service_name, retry_after)
+            # Let this request through, and suspend the others until it ends
+            self._opened_at[service_name] = now
+
+    def record_success(self, service_name):
+        with self._lock:
+            self._failures.pop(service_name, None)
+            self._opened_at.pop(service_name, None)
+
+    def record_failure(self, service_name):
+        """Count a failure, return True if it opened the circuit"""
+        with self._lock:
+            failures = self._failures.get(service_name, 0) + 1
+            self._failures[service_name] = failures
+            if failures < self.failure_threshold:
+                return False
+            self._opened_at[service_name] = self.clock()
+            return True
+
+
+class RetryPolicy(object):
+    """Decides how requests failing with transient errors are retried
+
+    Timeouts, connection errors and the HTTP statuses of `retry_statuses`
+    are transient. A request failing with one of them is sent again, up to
+    `max_attempts` attempts in all, after an exponential backoff: the delay
+    starts at `initial_delay` seconds, is multiplied by `factor` after each
+    attempt up to `max_delay`, and with `jitter` a random delay between 0
+    and this one is used. Requests which aren't idempotent (``POST``, and
+    ``PUT`` appending to a list) are only retried when they couldn't have
+    reached AppNexus.
+
+    :param timeout: the connect and read timeouts of requests, in seconds
+    :param failure_threshold: the number of consecutive failures after
+                              which the circuit of a service opens (see
+                              :class:`CircuitBreaker`), None to disable it
+    """
+
+    idempotent_methods = frozenset(["GET", "HEAD", "OPTIONS", "PUT",
+                                    "DELETE"])
+    # Failures happening before the request was sent
+    safe_reasons = frozenset(["CONNECT_TIMEOUT", "CONNECT_ERROR"])
+    sleep = staticmethod(time.sleep)
+    uniform = staticmethod(random.uniform)
+
+    def __init__(self, max_attempts=4, timeout=(10, 300), initial_delay=0.5,
+                 max_delay=30, factor=2, jitter=True,
+                 retry_statuses=(500, 502, 503, 504), failure_threshold=5,
+                 reset_timeout=30):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be a positive integer")
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.circuit_breaker = None
+        if failure_threshold is not None:
+            self.circuit_breaker = CircuitBreaker(failure_threshold,
+                                                  reset_timeout)
+
+    def status_reason(self, status_code):
+        """The reason of a retry for an HTTP status, None if not transient"""
+        if status_code in self.retry_statuses:
+            return "HTTP_{}".format(status_code)
+
+    def should_retry(self, method, attempt, reason, idempotent=None):
+        """Whether the `attempt`th request with `method` is sent again
+
+        :param idempotent: whether sending the request twice is harmless,
+                           by default guessed from `method`
+        """
+        if attempt >= self.max_attempts:
+            return False
+        if idempotent is None:
+            idempotent = method.upper() in self.idempotent_methods
+        return idempotent or reason in self.safe_reasons
+
+    def delay(self, attempt):
+        """The time to wait after the `attempt`th attempt, in seconds"""
+        delay = min(self.max_delay,
+                    self.initial_delay * self.factor ** (attempt - 1))
+        if self.jitter:
+            return self.uniform(0, delay)
+        return delay
+
+    def before_request(self, service_name):
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.check(service_name)
+
+    def record_success(self, service_name):
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_success(service_name)
+
+    def record_failure(self, service_name):
+        """Count a transient failure, return True if it opened a circuit"""
+        if self.circuit_breaker is not None:
+            return self.circuit_breaker.record_failure(service_name)
+        return False
+
+
+__all__ = ["CircuitBreaker", "RetryPolicy"]
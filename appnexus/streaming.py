@@ -0,0 +1,195 @@
+import codecs
+import json
+import re
+
+whitespace_regex = re.compile(r"[ \t\n\r]*")
+container_regex = re.compile(r'[\[\]{}"]')
+string_regex = re.compile(r'["\\]')
+literal_end_regex = re.compile(r"[ \t\n\r,\]}]")
+
+
+class StreamedPage(object):
+    """Decode an AppNexus response incrementally
+
+    The objects of the list holding the data (the first list in the response
+    whose key isn't in `common_keys`) are decoded and yielded one at a time
+    when iterating over the page, so only one of them is kept in memory. Every
+    other field of the response is stored in the `page` dictionary, which is
+    complete once the iteration is over.
+
+    :param chunks: an iterable of bytes, usually ``response.iter_content()``
+    :param common_keys: keys of the response which never hold the data
+    :param close: a function called once the whole response was read
+    """
+
+    def __init__(self, chunks, common_keys=(), close=None):
+        self.page = {}
+        self.data_key = None
+        self.common_keys = common_keys
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._position = 0
+        self._close = close
+        self._events = self._parse()
+        self._pending = []
+
+    def __iter__(self):
+        for element in self._pending:
+            yield element
+        self._pending = []
+        for element in self._events:
+            yield element
+        if self.data_key is None:
+            for key in set(self.page) - set(self.common_keys):
+                if isinstance(self.page[key], dict):
+                    self.data_key = key
+                    yield self.page.pop(key)
+                    break
+
+    def prime(self):
+        """Read the response up to its first data element
+
+        This gives access to the fields preceding the data, such as errors.
+        """
+        for element in self._events:
+            self._pending.append(element)
+            break
+        return self.page
+
+    def close(self):
+        self._events.close()
+        if self._close is not None:
+            self._close()
+            self._close = None
+
+    def _parse(self):
+        try:
+            self._expect("{")
+            for key in self._keys():
+                if key != "response" or self._peek() != "{":
+                    self.page[key] = self._value()
+                    continue
+                self._expect("{")
+                for key in self._keys():
+                    if (self.data_key is None and key not in self.common_keys
+                            and self._peek() == "["):
+                        self.data_key = key
+                        self._expect("[")
+                        for element in self._elements():
+                            yield element
+                    else:
+                        self.page[key] = self._value()
+        finally:
+            if self._close is not None:
+                self._close()
+                self._close = None
+
+    def _fill(self):
+        """Append the next chunk to the buffer, return False at the end"""
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            if text:
+                self._buffer += text
+                return True
+        return False
+
+    def _peek(self):
+        while True:
+            match = whitespace_regex.match(self._buffer, self._position)
+            self._position = match.end()
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._fill():
+                raise ValueError("unexpected end of JSON response")
+
+    def _expect(self, character):
+        if self._peek() != character:
+            raise ValueError("expected '{}' in JSON response at {!r}".format(
+                character, self._buffer[self._position:][:20]))
+        self._position += 1
+
+    def _keys(self):
+        """Iterate over the keys of the object being read"""
+        if self._peek() == "}":
+            self._position += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            yield key
+            if self._peek() == "}":
+                self._position += 1
+                return
+            self._expect(",")
+
+    def _elements(self):
+        """Iterate over the elements of the array being read"""
+        if self._peek() == "]":
+            self._position += 1
+            return
+        while True:
+            yield self._value()
+            if self._peek() == "]":
+                self._position += 1
+                return
+            self._expect(",")
+
+    def _value(self):
+        """Decode the JSON value starting at the current position"""
+        first = self._peek()
+        start = self._position
+        if first in "{[\"":
+            end = self._scan_container(start)
+        else:
+            end = self._scan_literal(start)
+        value = json.loads(self._buffer[start:end])
+        if end > 65536:
+            self._buffer = self._buffer[end:]
+            end = 0
+        self._position = end
+        return value
+
+    def _scan_container(self, start):
+        depth, position = 0, start
+        in_string = False
+        while True:
+            regex = string_regex if in_string else container_regex
+            match = regex.search(self._buffer, position)
+            if match is None:
+                position = len(self._buffer)
+                if not self._fill():
+                    raise ValueError("unexpected end of JSON response")
+                continue
+            character = match.group()
+            position = match.end()
+            if in_string:
+                if character == "\\":
+                    while position >= len(self._buffer):
+                        if not self._fill():
+                            raise ValueError("unexpected end of JSON "
+                                             "response")
+                    position += 1
+                    continue
+                in_string = False
+            elif character == '"':
+                in_string = True
+                continue
+            elif character in "[{":
+                depth += 1
+                continue
+            else:
+                depth -= 1
+            if depth == 0:
+                return position
+
+    def _scan_literal(self, start):
+        while True:
+            match = literal_end_regex.search(self._buffer, start)
+            if match is not None:
+                return match.start()
+            if not self._fill():
+                return len(self._buffer)
+
+
+__all__ = ["StreamedPage"]
@@ -0,0 +1,308 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from appnexus.cursor import Cursor
+from appnexus.representations import raw
+
+logger = logging.getLogger("appnexus-client")
+
+
+class SQLiteStore(object):
+    """Stores AppNexus objects locally in a SQLite database
+
+    Objects are stored as JSON, per service and id, along with the
+    synchronization watermark of each service. Each field of `indexes` gets
+    an index, which makes filtering on it fast even with many objects.
+    """
+
+    def __init__(self, path=":memory:", indexes=()):
+        self.path = path
+        self.indexes = tuple(indexes)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.RLock()
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS objects (service TEXT, "
+                "id INTEGER, last_modified TEXT, data TEXT, "
+                "PRIMARY KEY (service, id))")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS watermarks (service TEXT PRIMARY "
+                "KEY, last_modified TEXT, synced_at REAL)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS reconciliations (service TEXT "
+                "PRIMARY KEY, reconciled_at REAL)")
+            for field in self.indexes:
+                if not field.isidentifier():
+                    raise ValueError("can't index field '{}'".format(field))
+                self.connection.execute(
+                    "CREATE INDEX IF NOT EXISTS objects_{0} ON objects "
+                    "(service, {1})".format(field, self._column(field)))
+
+    def close(self):
+        self.connection.close()
+
+    def upsert(self, service_name, objects):
+        """Insert or replace `objects` of a service"""
+        rows = [(service_name, obj["id"], obj.get("last_modified"),
+                 json.dumps(obj)) for obj in objects]
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO objects (service, id, last_modified, "
+                "data) VALUES (?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def delete(self, service_name, ids):
+        """Delete the objects of a service having one of `ids`"""
+        ids = list(ids)
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "DELETE FROM objects WHERE service = ? AND id = ?",
+                [(service_name, id) for id in ids])
+        return len(ids)
+
+    def ids(self, service_name):
+        """Return the set of the ids stored for a service"""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT id FROM objects WHERE service = ?", (service_name,))
+            return {row[0] for row in rows}
+
+    def _column(self, field):
+        if field == "id":
+            return "id"
+        return "json_extract(data, '$.{}')".format(field.replace("'", ""))
+
+    @staticmethod
+    def _values(value):
+        """The values accepted by a filter, as the API reads them
+
+        Strings with commas are lists of values, and numeric strings also
+        match the numbers they represent.
+        """
+        if isinstance(value, str) and "," in value:
+            value = [member.strip() for member in value.split(",")]
+        elif not isinstance(value, (list, tuple, set)):
+            value = [value]
+        values = []
+        for member in value:
+            if isinstance(member, bool):
+                member = int(member)
+            values.append(member)
+            if isinstance(member, str) and member.lstrip("-").isdigit():
+                values.append(int(member))
+        return values
+
+    def _where(self, service_name, filters):
+        clauses, parameters = ["service = ?"], [service_name]
+        for field, value in sorted(filters.items()):
+            column = self._column(field)
+            if value is None:
+                clauses.append("{} IS NULL".format(column))
+                continue
+            values = self._values(value)
+            if len(values) == 1:
+                clauses.append("{} = ?".format(column))
+            else:
+                clauses.append("{} IN ({})".format(
+                    column, ", ".join("?" * len(values))))
+            parameters.extend(values)
+        return " AND ".join(clauses), parameters
+
+    def find(self, service_name, **filters):
+        """Return the stored objects of a service matching `filters`
+
+        Each filter compares a field with a value, or with a list of accepted
+        values (also given as a string of comma-separated values, like to the
+        API).
+        """
+        return self.query(service_name, filters)
+
+    def query(self, service_name, filters, offset=0, limit=None):
+        """Return the stored objects matching `filters`, ordered by id"""
+        where, parameters = self._where(service_name, filters)
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT data FROM objects WHERE {} ORDER BY id LIMIT ? "
+                "OFFSET ?".format(where),
+                parameters + [-1 if limit is None else limit, offset])
+            rows = rows.fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def find_one(self, service_name, **filters):
+        """Return a stored object of a service matching `filters`, or None"""
+        objects = self.find(service_name, **filters)
+        return objects[0] if objects else None
+
+    def count(self, service_name, **filters):
+        where, parameters = self._where(service_name, filters)
+        with self._lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM objects WHERE {}".format(where),
+                parameters).fetchone()[0]
+
+    def watermark(self, service_name):
+        """Return the watermark of a service and when it was synchronized"""
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT last_modified, synced_at FROM watermarks WHERE "
+                "service = ?", (service_name,)).fetchone()
+        return row if row is not None else (None, None)
+
+    def set_watermark(self, service_name, last_modified, synced_at=None):
+        if synced_at is None:
+            synced_at = time.time()
+        with self._lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?)",
+                (service_name, last_modified, synced_at))
+
+    def reconciled_at(self, service_name):
+        """Return when the ids of a service were last compared with the
+        API, or None
+        """
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT reconciled_at FROM reconciliations WHERE service = ?",
+                (service_name,)).fetchone()
+        return row[0] if row is not None else None
+
+    def set_reconciled_at(self, service_name, reconciled_at=None):
+        if reconciled_at is None:
+            reconciled_at = time.time()
+        with self._lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO reconciliations VALUES (?, ?)",
+                (service_name, reconciled_at))
+
+    def expire(self, service_name):
+        """Mark a service as stale, keeping its watermark"""
+        with self._lock, self.connection:
+            self.connection.execute(
+                "UPDATE watermarks SET synced_at = 0 WHERE service = ?",
+                (service_name,))
+
+
+class SyncResult(object):
+    """Counts the objects updated and deleted by a synchronization"""
+
+    def __init__(self, service_name, updated=0, deleted=0, full=False):
+        self.service_name = service_name
+        self.updated = updated
+        self.deleted = deleted
+        self.full = full
+
+    def __repr__(self):
+        return "<SyncResult {} updated={} deleted={} full={}>".format(
+            self.service_name, self.updated, self.deleted, self.full)
+
+
+class Synchronizer(object):
+    """Keeps a local store of the objects of some services up to date
+
+    The first synchronization of a service downloads all of its objects.
+    The following ones only request the objects modified since the most
+    recent `last_modified` stored (the watermark) with the
+    `min_last_modified` filter. Deleted objects are detected by a
+    reconciliation, which compares the stored ids with every id still
+    returned by the API (requested alone with the `fields` filter). As it
+    pages through the whole service, it only runs once every
+    `reconcile_interval` seconds.
+
+    :param client: an AppNexusClient instance
+    :param store: a :class:`SQLiteStore` (in memory by default)
+    :param services: the names of the services to synchronize
+    :param detect_deletions: whether synchronizations reconcile the ids
+    :param reconcile_interval: the minimum time between reconciliations of a
+                               service, 0 to reconcile on every
+                               synchronization
+    """
+
+    def __init__(self, client, store=None, services=(),
+                 detect_deletions=True, reconcile_interval=24 * 60 * 60):
+        self.client = client
+        self.store = store if store is not None else SQLiteStore()
+        self.services = list(services)
+        self.detect_deletions = detect_deletions
+        self.reconcile_interval = reconcile_interval
+
+    def sync(self, service_name=None, reconcile=None):
+        """Synchronize one service, or all of them
+
+        :param reconcile: True or False to force or skip the detection of
+                          deleted objects, which otherwise runs when the last
+                          one is older than `reconcile_interval`
+        """
+        if service_name is None:
+            return [self.sync(name, reconcile) for name in self.services]
+        watermark, _ = self.store.watermark(service_name)
+        synced_at = time.time()
+        filters = {}
+        if watermark is not None:
+            filters["min_last_modified"] = watermark
+        result = SyncResult(service_name, full=watermark is None)
+
+        cursor = Cursor(self.client, service_name, raw, **filters)
+        for objects in cursor.iter_batches():
+            result.updated += self.store.upsert(service_name, objects)
+            for obj in objects:
+                last_modified = obj.get("last_modified")
+                if last_modified and (watermark is None
+                                      or last_modified > watermark):
+                    watermark = last_modified
+
+        if result.full:
+            self.store.set_reconciled_at(service_name, synced_at)
+        elif reconcile or (reconcile is None
+                           and self.is_reconciliation_due(service_name)):
+            result.deleted = self.reconcile(service_name)
+        self.store.set_watermark(service_name, watermark, synced_at)
+        logger.info("synchronized %r", result)
+        return result
+
+    def is_reconciliation_due(self, service_name):
+        if not self.detect_deletions:
+            return False
+        reconciled_at = self.store.reconciled_at(service_name)
+        return (reconciled_at is None
+                or time.time() - reconciled_at >= self.reconcile_interval)
+
+    def reconcile(self, service_name):
+        """Delete the stored objects of a service which the API no longer
+        returns, and return their number
+        """
+        reconciled_at = time.time()
+        deleted = self.store.delete(
+            service_name,
+            self.store.ids(service_name) - self.remote_ids(service_name))
+        self.store.set_reconciled_at(service_name, reconciled_at)
+        return deleted
+
+    def remote_ids(self, service_name):
+        """Return the set of the ids of a service known by the API"""
+        cursor = Cursor(self.client, service_name, raw, fields="id")
+        return {obj["id"] for objects in cursor.iter_batches()
+                for obj in objects}
+
+    def is_stale(self, service_name, max_age):
+        _, synced_at = self.store.watermark(service_name)
+        return synced_at is None or time.time() - synced_at > max_age
+
+    def find(self, service_name, max_age=None, **filters):
+        """Read objects from the local store
+
+        With `max_age` (in seconds), the service is synchronized first if its
+        last synchronization is older.
+        """
+        if max_age is not None and self.is_stale(service_name, max_age):
+            self.sync(service_name)
+        return self.store.find(service_name, **filters)
+
+    def find_one(self, service_name, max_age=None, **filters):
+        objects = self.find(service_name, max_age, **filters)
+        return objects[0] if objects else None
+
+
+__all__ = ["SQLiteStore", "SyncResult", "Synchronizer"]
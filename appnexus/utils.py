@@ -1,5 +1,33 @@
+import contextlib
+import json
+
 from thingy import names_regex
 
+try:
+    import fcntl
+except ImportError:  # pragma: nocover
+    fcntl = None
+
+
+class BufferedResponse(object):
+    """A fully read HTTP response
+
+    Gives responses that can't be read synchronously (aiohttp responses,
+    streamed responses) the interface that the exceptions and error handlers
+    expect.
+    """
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        pass
+
 
 class classproperty(property):
 
@@ -7,10 +35,28 @@ class classproperty(property):
         return self.fget(owner)
 
 
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on the file at `path`, shared by processes
+
+    Where file locks aren't supported, nothing is locked.
+    """
+    if fcntl is None:  # pragma: nocover
+        yield
+        return
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
 def normalize_service_name(service_name, delimiter='-'):
     words = [word.lower() for word in names_regex.findall(service_name)]
     normalized_name = delimiter.join(words)
     return normalized_name
 
 
-__all__ = ["classproperty", "normalize_service_name"]
+__all__ = ["BufferedResponse", "classproperty", "file_lock",
+           "normalize_service_name"]
@@ -0,0 +1,55 @@
+"""Measure the time it takes to import the client and start using it
+
+Run with ``python -m benchmarks.imports``. Each measure is taken in a fresh
+interpreter, in which the third-party dependencies are already imported, and
+the fastest of the runs is reported. The models and services are created on
+first access, the last measures create all of them.
+"""
+import argparse
+import subprocess
+import sys
+
+dependencies = "import requests, thingy"
+
+measures = [
+    ("dependencies", dependencies),
+    ("import appnexus", "import appnexus"),
+    ("first model", "from appnexus import Campaign"),
+    ("first service", "import appnexus; appnexus.client.campaign"),
+    ("all models", "from appnexus import *"),
+    ("all services",
+     "import appnexus; from appnexus.client import service_names; "
+     "[getattr(appnexus.client, name) for name in service_names]"),
+]
+
+timer = """
+import time
+{}
+start = time.perf_counter()
+{}
+print(time.perf_counter() - start)
+"""
+
+
+def measure(statement, runs, setup=""):
+    timings = []
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, "-c", timer.format(setup, statement)])
+        timings.append(float(output))
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-r", "--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    for name, statement in measures:
+        setup = dependencies if name != "dependencies" else ""
+        print("{:16} {:8.2f} ms".format(
+            name, measure(statement, args.runs, setup) * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Compare the ways of parsing a large network analytics report
+
+Run with ``python -m benchmarks.reports``.
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import tempfile
+import time
+
+from appnexus.reports import ReportReader
+
+types = {"day": "date", "advertiser_id": "int", "line_item_id": "int",
+         "imps": "int", "clicks": "int", "total_convs": "int",
+         "booked_revenue": "money", "media_cost": "money",
+         "geo_country": "string"}
+
+
+def generate_report(path, rows):
+    countries = ["FR", "US", "DE", "GB", "NA"]
+    with open(path, "w", newline="") as report:
+        writer = csv.writer(report)
+        writer.writerow(list(types))
+        for i in range(rows):
+            writer.writerow([
+                "2024-01-{:02}".format(i % 28 + 1),
+                random.randrange(1000),
+                random.randrange(100000),
+                random.randrange(100000),
+                random.randrange(100),
+                random.randrange(10),
+                "{:.4f}".format(random.random() * 100),
+                "{:.4f}".format(random.random() * 50),
+                random.choice(countries),
+            ])
+
+
+def dict_reader(path):
+    """Parse the report in dictionaries, converting them by hand"""
+    converters = {"int": int, "money": float}
+    with open(path, newline="") as report:
+        for row in csv.DictReader(report):
+            {column: converters.get(types[column], str)(value)
+             for column, value in row.items()}
+
+
+def iter_rows(path):
+    with ReportReader(io.open(path, "rb"), types) as reader:
+        for row in reader.iter_rows():
+            pass
+
+
+def to_numpy(path):
+    with ReportReader(io.open(path, "rb"), types) as reader:
+        reader.to_numpy()
+
+
+def to_dataframe(path):
+    with ReportReader(io.open(path, "rb"), types) as reader:
+        reader.to_dataframe()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--rows", type=int, default=5000000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "report.csv")
+        generate_report(path, args.rows)
+        size = os.path.getsize(path) / 2 ** 20
+        print("{} rows, {:.1f} MiB".format(args.rows, size))
+        for name, parse in [("DictReader", dict_reader),
+                            ("iter_rows", iter_rows),
+                            ("to_numpy", to_numpy),
+                            ("to_dataframe", to_dataframe)]:
+            start = time.perf_counter()
+            try:
+                parse(path)
+            except ImportError as error:
+                print("{:12} skipped ({})".format(name, error))
+                continue
+            elapsed = time.perf_counter() - start
+            print("{:12} {:6.2f} s".format(name, elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Compare the memory used by the representations of many objects
+
+Run with ``python -m benchmarks.representations``.
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from appnexus import representations
+from appnexus.model import Creative
+
+fields = ["id", "name", "code", "state", "advertiser_id", "member_id",
+          "width", "height", "media_url", "click_url", "format",
+          "audit_status", "is_expired", "last_modified", "created_on",
+          "categories", "segments"]
+
+
+class MetaClient(object):
+
+    def meta(self, service_name):
+        return {"fields": [{"name": field} for field in fields]}
+
+
+def generate_page(count):
+    return json.dumps([{
+        "id": i,
+        "name": "creative {}".format(i),
+        "code": None,
+        "state": random.choice(["active", "inactive"]),
+        "advertiser_id": random.randrange(1000),
+        "member_id": 1234,
+        "width": 300,
+        "height": 250,
+        "media_url": "https://cdn.example.com/{}.png".format(i),
+        "click_url": "https://example.com/?creative={}".format(i),
+        "format": "image",
+        "audit_status": "audited",
+        "is_expired": False,
+        "last_modified": "2024-01-01 00:00:00",
+        "created_on": "2023-01-01 00:00:00",
+        "categories": None,
+        "segments": None,
+    } for i in range(count)])
+
+
+def measure(representation, page, client):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    objects = [representation(client, "creative", obj)
+               for obj in json.loads(page)]
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return current, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--objects", type=int, default=200000)
+    args = parser.parse_args()
+
+    page = generate_page(args.objects)
+    client = MetaClient()
+    candidates = [("raw", representations.raw),
+                  ("model", Creative.constructor),
+                  ("compact", representations.CompactRepresentation())]
+    for name, representation in candidates:
+        memory, elapsed = measure(representation, page, client)
+        print("{:8} {:8.1f} MiB {:6.2f} s".format(
+            name, memory / 2 ** 20, elapsed))
+
+
+if __name__ == "__main__":
+    main()
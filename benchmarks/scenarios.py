@@ -0,0 +1,180 @@
+"""Measure the client against a local stand-in of the AppNexus API
+
+Run with ``python -m benchmarks.scenarios [scenario ...]``. Each scenario
+reports the number of requests per second, the median and 99th percentile
+latency of the requests, and the peak memory: the peak memory allocated by
+Python during the scenario with ``--trace-memory`` (which slows it down), the
+peak resident memory of the process otherwise.
+"""
+import argparse
+import os
+import resource
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from appnexus.client import AppNexusClient
+from appnexus.reports import ReportManager
+from appnexus.representations import raw
+from appnexus.retry import RetryPolicy
+
+from .server import ProcessServer
+
+
+def cursor_iteration(client, args):
+    """Iterate over every object of a service, page after page"""
+    return sum(1 for _ in client.find("campaign", representation=raw))
+
+
+def parallel_cursor_iteration(client, args):
+    """Iterate over every object of a service, with parallel requests"""
+    cursor = client.find("campaign", representation=raw)
+    return sum(1 for _ in cursor.parallel(args.workers))
+
+
+def cursor_export(client, args):
+    """Export every object of a service to NDJSON with worker processes
+
+    The requests of the workers aren't counted in the throughput.
+    """
+    cursor = client.find("campaign", representation=raw)
+    with tempfile.TemporaryDirectory() as directory:
+        return cursor.export(os.path.join(directory, "campaigns.ndjson"),
+                             processes=args.workers)
+
+
+def bulk_writes(client, args):
+    """Modify many objects concurrently"""
+    operations = [("modify", {"campaign": {"id": id, "state": "inactive"}},
+                   {"id": id}) for id in range(1, args.objects // 2 + 1)]
+    result = client.bulk_write("campaign", operations, workers=args.workers)
+    return len(result.results)
+
+
+def token_refresh_storm(client, args):
+    """Send concurrent requests while tokens expire every few requests"""
+    refreshes = []
+    client.on_token_refresh(refreshes.append)
+
+    def read(start_element):
+        return client.get("campaign", start_element=start_element,
+                          num_elements=100)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        pages = list(executor.map(read, range(0, args.objects, 100)))
+    assert len(refreshes) > 1, "no token expired, use more objects"
+    return len(pages)
+
+
+def rate_limited_reads(client, args):
+    """Read pages while the API accepts a limited number of requests"""
+    cursor = client.find("campaign", representation=raw)
+    return sum(1 for _ in cursor.parallel(args.workers))
+
+
+def flaky_reads(client, args):
+    """Read pages while some requests fail with server errors"""
+    client.retry_policy = RetryPolicy(initial_delay=0.01, max_delay=0.1)
+    cursor = client.find("campaign", representation=raw)
+    return sum(1 for _ in cursor.parallel(args.workers))
+
+
+def report_downloads(client, args):
+    """Submit reports, poll them and stream their rows"""
+    manager = ReportManager(client, initial_delay=0.1, max_delay=1)
+    jobs = manager.submit_many([{"report_type": "network_analytics"}] * 10)
+    rows = 0
+    for job in manager.as_ready(jobs):
+        rows += sum(1 for _ in manager.iter_rows(job, types={"imps": "int"}))
+    return rows
+
+
+scenarios = [cursor_iteration, parallel_cursor_iteration, cursor_export,
+             bulk_writes, token_refresh_storm, rate_limited_reads,
+             flaky_reads, report_downloads]
+# The options of the API of each scenario, depending on the arguments. Tokens
+# expire about ten times while the pages are read.
+api_options = {
+    token_refresh_storm: lambda args: {
+        "token_requests": max(1, args.objects // 100 // 10)},
+    rate_limited_reads: lambda args: {"rate_limit": 50},
+    flaky_reads: lambda args: {"error_rate": 0.05},
+}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(scenario, args):
+    options = dict(objects=args.objects, latency=args.latency,
+                   report_rows=args.report_rows)
+    if scenario in api_options:
+        options.update(api_options[scenario](args))
+    with ProcessServer(**options) as server:
+        client = AppNexusClient("user", "password", pool_size=args.workers)
+        client.url = server.url
+        latencies = []
+        lock = threading.Lock()
+
+        def record(event):
+            with lock:
+                latencies.append(event.elapsed)
+        client.on_response(record)
+
+        if args.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = scenario(client, args)
+        elapsed = time.perf_counter() - start
+        if args.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        else:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        client.close()
+        stats = server.stats()
+
+    print("{:26} {:>8} {:7.2f} s {:8.1f} req/s  {:6.1f} ms  {:6.1f} ms  "
+          "{:7.1f} MiB  {:>8}  {:>8}  {:>8}".format(
+              scenario.__name__, result, elapsed,
+              len(latencies) / elapsed,
+              statistics.median(latencies or [0]) * 1000,
+              percentile(latencies, 0.99) * 1000, peak / 2 ** 20,
+              stats.get("auth", 0), stats.get("rate_exceeded", 0),
+              stats.get("errors", 0)))
+
+
+def main():
+    names = [scenario.__name__ for scenario in scenarios]
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*",
+                        help="the scenarios to run (all by default): "
+                             "{}".format(", ".join(names)))
+    parser.add_argument("-n", "--objects", type=int, default=5000)
+    parser.add_argument("-l", "--latency", type=float, default=0.005,
+                        help="the latency of the API, in seconds")
+    parser.add_argument("-w", "--workers", type=int, default=8)
+    parser.add_argument("-r", "--report-rows", type=int, default=20000)
+    parser.add_argument("--trace-memory", action="store_true")
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in names]
+    if unknown:
+        parser.error("unknown scenario: {}".format(", ".join(unknown)))
+
+    print("{:26} {:>8} {:>9} {:>14}  {:>9}  {:>9}  {:>11}  {:>8}  {:>8}  "
+          "{:>8}".format("scenario", "result", "time", "throughput", "p50",
+                         "p99", "peak", "auth", "rate", "errors"))
+    for scenario in scenarios:
+        if not args.scenarios or scenario.__name__ in args.scenarios:
+            run(scenario, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""A local stand-in for the AppNexus API, used by the benchmarks"""
+import itertools
+import json
+import multiprocessing
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, data, status=200):
+        body = json.dumps({"response": data}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.send_json({"status": "OK", "count": 0, "start_element": 0,
+                        "num_elements": 0, "campaigns": []})
+
+    do_PUT = do_POST = do_DELETE = do_GET
+
+
+class FakeAppNexus(object):
+    """The state of an emulated AppNexus API
+
+    :param objects: the number of objects of each service
+    :param latency: the time spent handling each request, in seconds
+    :param token_ttl: the lifetime of the tokens, in seconds
+    :param token_requests: the number of requests a token is valid for
+    :param rate_limit: the number of requests accepted per second, after
+                       which ``RATE_EXCEEDED`` errors are returned
+    :param report_delay: the time a report takes to be ready, in seconds
+    :param report_rows: the number of rows of the reports
+    :param error_rate: the fraction of requests failing with a 503 error
+    """
+
+    page_size = 100
+
+    def __init__(self, objects=1000, latency=0, token_ttl=None,
+                 token_requests=None, rate_limit=None, report_delay=0.5,
+                 report_rows=10000, error_rate=0):
+        self.objects = objects
+        self.latency = latency
+        self.token_ttl = token_ttl
+        self.token_requests = token_requests
+        self.rate_limit = rate_limit
+        self.report_delay = report_delay
+        self.report_rows = report_rows
+        self.error_rate = error_rate
+        self.requests = Counter()
+        self.tokens = {}
+        self.token_uses = Counter()
+        self.reports = {}
+        self._ids = itertools.count(1)
+        self._recent = deque()
+        self._failures = 0
+        self._lock = threading.Lock()
+
+    def authenticate(self):
+        with self._lock:
+            self.requests["auth"] += 1
+            token = "token-{}".format(next(self._ids))
+            ttl = self.token_ttl
+            self.tokens[token] = (time.monotonic() + ttl
+                                  if ttl is not None else None)
+        return token
+
+    def is_authorized(self, token):
+        if token not in self.tokens:
+            return False
+        expiry = self.tokens[token]
+        if expiry is not None and expiry <= time.monotonic():
+            return False
+        if self.token_requests is None:
+            return True
+        with self._lock:
+            self.token_uses[token] += 1
+            return self.token_uses[token] <= self.token_requests
+
+    def is_failing(self):
+        """Whether the current request fails, for every 1 / error_rate"""
+        if not self.error_rate:
+            return False
+        with self._lock:
+            self._failures += self.error_rate
+            if self._failures < 1:
+                return False
+            self._failures -= 1
+            self.requests["errors"] += 1
+            return True
+
+    def is_rate_exceeded(self):
+        if self.rate_limit is None:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and self._recent[0] < now - 1:
+                self._recent.popleft()
+            if len(self._recent) >= self.rate_limit:
+                self.requests["rate_exceeded"] += 1
+                return True
+            self._recent.append(now)
+            return False
+
+    def page(self, service_name, start_element, num_elements):
+        num_elements = min(num_elements, self.page_size)
+        stop = min(self.objects, start_element + num_elements)
+        objects = [{"id": id, "name": "{} {}".format(service_name, id),
+                    "state": "active" if id % 3 else "inactive",
+                    "advertiser_id": id % 50,
+                    "last_modified": "2024-01-01 00:00:00"}
+                   for id in range(start_element + 1, stop + 1)]
+        return {"status": "OK", "count": self.objects,
+                "start_element": start_element,
+                "num_elements": len(objects), service_name + "s": objects}
+
+    def submit_report(self):
+        with self._lock:
+            report_id = "report-{}".format(next(self._ids))
+            self.reports[report_id] = time.monotonic() + self.report_delay
+        return report_id
+
+    def report_status(self, report_id):
+        ready_at = self.reports.get(report_id)
+        if ready_at is None:
+            return "error"
+        return "ready" if ready_at <= time.monotonic() else "pending"
+
+    def report_content(self):
+        lines = ["day,line_item_id,imps,clicks,booked_revenue"]
+        lines.extend("2024-01-{:02},{},{},{},{:.4f}".format(
+            row % 28 + 1, row % 1000, row * 7 % 10000, row % 13, row / 1000)
+            for row in range(self.report_rows))
+        return ("\n".join(lines) + "\n").encode()
+
+
+class AppNexusHandler(StubHandler):
+    """Emulates the AppNexus API with the state of ``server.api``"""
+
+    def send_error_response(self, error_id, error_code=None, status=400,
+                            headers=None):
+        body = {"status": "error", "error_id": error_id,
+                "error": "emulated {}".format(error_code or error_id)}
+        if error_code is not None:
+            body["error_code"] = error_code
+        body = json.dumps({"response": body}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return None
+        return json.loads(self.rfile.read(length))
+
+    def handle_api(self, method):
+        api = self.server.api
+        url = urlsplit(self.path)
+        service_name = url.path.strip("/")
+        query = {key: values[-1] for key, values in parse_qs(url.query)
+                 .items()}
+        payload = self.read_json()
+        if api.latency:
+            time.sleep(api.latency)
+        api.requests[method] += 1
+
+        if service_name == "_stats":
+            return self.send_json(dict(api.requests))
+        if service_name == "auth":
+            return self.send_json({"status": "OK",
+                                   "token": api.authenticate()})
+        if api.is_failing():
+            body = b"<html><body>503 Service Unavailable</body></html>"
+            self.send_response(503)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            return self.wfile.write(body)
+        if api.is_rate_exceeded():
+            return self.send_error_response(
+                "SYSTEM", "RATE_EXCEEDED", 429, {"Retry-After": "1"})
+        if not api.is_authorized(self.headers.get("Authorization")):
+            api.requests["noauth"] += 1
+            return self.send_error_response("NOAUTH", status=401)
+
+        if service_name == "report" and method == "POST":
+            return self.send_json({"status": "OK",
+                                   "report_id": api.submit_report()})
+        if service_name == "report":
+            return self.send_json({"status": "OK", "execution_status":
+                                   api.report_status(query.get("id"))})
+        if service_name == "report-download":
+            body = api.report_content()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            return self.wfile.write(body)
+        if method == "GET":
+            return self.send_json(api.page(
+                service_name, int(query.get("start_element", 0)),
+                int(query.get("num_elements", 100))))
+        obj = dict((payload or {}).get(service_name) or {})
+        obj.setdefault("id", query.get("id") or next(api._ids))
+        return self.send_json({"status": "OK", "id": obj["id"],
+                               service_name: obj})
+
+    def do_GET(self):
+        self.handle_api("GET")
+
+    def do_POST(self):
+        self.handle_api("POST")
+
+    def do_PUT(self):
+        self.handle_api("PUT")
+
+    def do_DELETE(self):
+        self.handle_api("DELETE")
+
+
+class HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class StubServer(object):
+    """Serve the stub API from a background thread
+
+    Use it as a context manager; the ``url`` attribute can be given to
+    ``AppNexusClient.url``. The `api` state is shared with the handlers.
+    """
+
+    def __init__(self, handler=StubHandler, host="127.0.0.1", port=0,
+                 api=None):
+        self.httpd = HTTPServer((host, port), handler)
+        self.httpd.api = self.api = api
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                                       daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return "http://{}:{}/".format(host, port)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+
+def _serve(handler, api_options, connection):
+    httpd = HTTPServer(("127.0.0.1", 0), handler)
+    httpd.api = FakeAppNexus(**api_options)
+    connection.send(httpd.server_address[1])
+    httpd.serve_forever()
+
+
+class ProcessServer(object):
+    """Serve the emulated API from another process
+
+    Unlike :class:`StubServer`, the server doesn't compete with the
+    measured client for the GIL. The counters of the API are returned by
+    `stats`.
+    """
+
+    def __init__(self, handler=AppNexusHandler, **api_options):
+        self.handler = handler
+        self.api_options = api_options
+        self.process = None
+        self.port = None
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}/".format(self.port)
+
+    def stats(self):
+        return requests.get(self.url + "_stats").json()["response"]
+
+    def __enter__(self):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self.process = multiprocessing.Process(
+            target=_serve, args=(self.handler, self.api_options, sender),
+            daemon=True)
+        self.process.start()
+        self.port = receiver.recv()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.join()
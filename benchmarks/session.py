@@ -0,0 +1,42 @@
+"""Compare per-request latency with and without a pooled HTTP session
+
+Run with ``python -m benchmarks.session``.
+"""
+import argparse
+import time
+
+import requests
+
+from appnexus.client import AppNexusClient
+
+from .server import StubServer
+
+
+def measure(send, url, requests_count):
+    start = time.perf_counter()
+    for _ in range(requests_count):
+        send(url)
+    return (time.perf_counter() - start) / requests_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    with StubServer() as server:
+        client = AppNexusClient()
+        client.url = server.url
+        url = server.url + "campaign"
+
+        without_session = measure(requests.get, url, args.requests)
+        with client:
+            with_session = measure(
+                lambda url: client.get("campaign"), url, args.requests)
+
+    print("requests.get:   {:.3f} ms/request".format(without_session * 1000))
+    print("client session: {:.3f} ms/request".format(with_session * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -32,6 +32,8 @@ setup(
     packages=["appnexus"],
     install_requires=["requests>=2.25.0",
                       "Thingy>=0.8.3"],
+    extras_require={"async": ["aiohttp>=3.8"],
+                    "columns": ["pandas", "pyarrow"]},
     classifiers=[
         "Intended Audience :: Developers",
         "Operating System :: OS Independent",
@@ -0,0 +1,204 @@
+import asyncio
+import json
+
+import pytest
+
+from appnexus import representations
+from appnexus.exceptions import AppNexusException
+
+from .helpers import gen_random_collection
+
+aio = pytest.importorskip("appnexus.aio")
+aiohttp = pytest.importorskip("aiohttp")
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def json_response(data):
+    content = json.dumps({"response": data}).encode()
+    return aio.BufferedResponse(200, {"Content-Type": "application/json"},
+                                content)
+
+
+@pytest.fixture
+def client():
+    client = aio.AsyncAppNexusClient("test", "test",
+                                     representation=representations.raw)
+    client.token = "test_token"
+    return client
+
+
+def test_get(mocker, client):
+    request = mocker.patch.object(client, "_request", mocker.AsyncMock())
+    request.return_value = json_response({"campaign": {"id": 42}})
+    response = run(client.get("campaign", id=42))
+    assert response == {"campaign": {"id": 42}}
+    args, kwargs = request.call_args
+    assert args[0] == "GET" and args[1].endswith("campaign?id=42")
+    assert kwargs["headers"]["Authorization"] == "test_token"
+
+
+@pytest.mark.parametrize("method,http_method", [("modify", "PUT"),
+                                                ("create", "POST")])
+def test_write_methods(mocker, client, method, http_method):
+    request = mocker.patch.object(client, "_request", mocker.AsyncMock())
+    request.return_value = json_response({"campaign": {}})
+    run(getattr(client, method)("campaign", {"field": "value"}))
+    args, kwargs = request.call_args
+    assert args[0] == http_method and kwargs["json"] == {"field": "value"}
+
+
+def test_unknown_error(mocker, client):
+    request = mocker.patch.object(client, "_request", mocker.AsyncMock())
+    request.return_value = json_response({"error_id": "WHATEVER"})
+    with pytest.raises(AppNexusException):
+        run(client.get("campaign"))
+
+
+def test_server_errors_are_retried(mocker, client):
+    sleep = mocker.patch("asyncio.sleep", mocker.AsyncMock())
+    request = mocker.patch.object(client, "_request", mocker.AsyncMock())
+    request.side_effect = [
+        aio.BufferedResponse(503, {"Content-Type": "text/html"}, b"<html>"),
+        asyncio.TimeoutError(),
+        json_response({"campaign": {"id": 42}})]
+    assert run(client.get("campaign")) == {"campaign": {"id": 42}}
+    assert request.call_count == 3 and sleep.call_count == 2
+    _, kwargs = request.call_args
+    assert kwargs["timeout"].sock_read == client.retry_policy.timeout[1]
+
+
+def test_append_is_not_retried_after_sending(mocker, client):
+    mocker.patch("asyncio.sleep", mocker.AsyncMock())
+    request = mocker.patch.object(client, "_request", mocker.AsyncMock())
+    request.side_effect = asyncio.TimeoutError()
+    with pytest.raises(asyncio.TimeoutError):
+        run(client.append("campaign", {"campaign": {}}, id=1))
+    assert request.call_count == 1
+
+
+def test_failure_reasons(client):
+    key = aiohttp.client_reqrep.ConnectionKey(
+        "api.appnexus.com", 443, True, True, None, None, None)
+    refused = aiohttp.ClientConnectorError(key, OSError(111, "refused"))
+    certificate = aiohttp.ClientConnectorCertificateError(
+        key, ValueError("invalid certificate"))
+    assert client._failure_reason(refused) == "CONNECT_ERROR"
+    assert client._failure_reason(certificate) is None
+    assert client._failure_reason(asyncio.TimeoutError()) == "TIMEOUT"
+
+
+def test_generated_services(client):
+    assert isinstance(client.campaign.find(), aio.AsyncCursor)
+
+
+def test_concurrent_noauth_refresh_token_once(mocker, client):
+    async def request(method, uri, **kwargs):
+        await asyncio.sleep(0)
+        if method == "POST":
+            return json_response({"token": "new_token"})
+        if kwargs["headers"]["Authorization"] == "new_token":
+            return json_response({"campaign": {}})
+        return json_response({"error_id": "NOAUTH"})
+
+    mocker.patch.object(client, "_request", side_effect=request)
+
+    async def main():
+        return await asyncio.gather(*[client.get("campaign")
+                                      for _ in range(10)])
+
+    assert run(main()) == [{"campaign": {}}] * 10
+    methods = [args[0] for args, _ in client._request.call_args_list]
+    assert methods.count("POST") == 1
+
+
+def test_cursor_iteration(mocker, client):
+    pages = gen_random_collection(count=300)
+    get = mocker.patch.object(client, "get", mocker.AsyncMock())
+    get.side_effect = lambda service, start_element, **kwargs: \
+        pages[start_element // 100]
+
+    async def main():
+        return [x async for x in client.find("campaign").skip(150)]
+
+    expected = [x for page in pages for x in page["campaigns"]]
+    assert run(main()) == expected[150:]
+
+
+def test_cursor_with_limit_can_be_iterated_twice(mocker, client):
+    pages = gen_random_collection(count=300)
+    get = mocker.patch.object(client, "get", mocker.AsyncMock())
+    get.side_effect = lambda service, start_element, **kwargs: \
+        pages[start_element // 100]
+    cursor = client.find("campaign").limit(5)
+
+    async def main():
+        return [x async for x in cursor], [x async for x in cursor]
+
+    first, second = run(main())
+    assert first == second == pages[0]["campaigns"][:5]
+    assert get.call_count == 1
+
+
+def test_cursor_parallel_iteration(mocker, client):
+    pages = gen_random_collection(count=300)
+    get = mocker.patch.object(client, "get", mocker.AsyncMock())
+    get.side_effect = lambda service, start_element, **kwargs: \
+        pages[start_element // 100]
+
+    async def main():
+        cursor = client.find("campaign").parallel(workers=3)
+        return [x async for x in cursor]
+
+    expected = [x for page in pages for x in page["campaigns"]]
+    assert run(main()) == expected
+    assert get.call_count == 3
+
+
+def test_cursor_first_and_count(mocker, client):
+    page = gen_random_collection(count=3)[0]
+    get = mocker.patch.object(client, "get", mocker.AsyncMock())
+    get.return_value = page
+    cursor = client.find("campaign")
+    assert run(cursor.first) == page["campaigns"][0]
+    assert run(cursor.count()) == 3
+
+
+def test_cursor_is_not_iterable_synchronously(client):
+    with pytest.raises(TypeError):
+        iter(client.find("campaign"))
+
+
+def test_cursor_count_page_is_reused(mocker, client):
+    page = gen_random_collection(count=3)[0]
+    get = mocker.patch.object(client, "get", mocker.AsyncMock())
+    get.return_value = page
+    cursor = client.find("campaign")
+
+    async def main():
+        await cursor.count()
+        return [x async for x in cursor]
+
+    assert run(main()) == page["campaigns"]
+    assert cursor.cached_count == 3
+    assert get.call_count == 1
+
+
+def test_sync_only_features_are_rejected(mocker, client):
+    meta = mocker.patch.object(client, "meta", mocker.AsyncMock())
+    with pytest.raises(TypeError):
+        client.bulk_write("campaign", [("create", {})])
+    with pytest.raises(TypeError):
+        representations.CompactRepresentation()(client, "campaign", {})
+    assert meta.called
+    cursor = client.find("campaign")
+    for method in (cursor.stream, cursor.prefetch, cursor.export,
+                   cursor.to_columns, cursor.to_arrow, cursor.to_dataframe):
+        with pytest.raises(TypeError):
+            method()
+    with pytest.raises(TypeError):
+        cursor.batch_size(adaptive=True)
+    with pytest.raises(TypeError, match="sliced"):
+        run(cursor[1:3])
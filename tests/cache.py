@@ -0,0 +1,111 @@
+import pytest
+
+from appnexus.cache import MemoryCache, SQLiteCache
+from appnexus.client import AppNexusClient
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmpdir):
+    if request.param == "memory":
+        return MemoryCache(max_size=2)
+    return SQLiteCache(str(tmpdir.join("cache.db")), max_size=2)
+
+
+@pytest.fixture
+def client(mocker, cache):
+    client = AppNexusClient("test", "test", cache=cache)
+    mocker.patch.object(client, "_send", return_value={"country": {"id": 1}})
+    return client
+
+
+def test_key_normalizes_parameters(cache):
+    assert (cache.key("country", {"a": 1, "id": [1, 2]})
+            == cache.key("country", {"id": (1, 2), "a": "1"}))
+
+
+def test_get_is_cached(client, cache):
+    assert client.get("country", id=1) == {"country": {"id": 1}}
+    assert client.get("country", id=1) == {"country": {"id": 1}}
+    assert client._send.call_count == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cached_response_is_not_shared(client):
+    client.get("country", id=1)["country"]["id"] = 2
+    assert client.get("country", id=1) == {"country": {"id": 1}}
+
+
+def test_uncached_service(client, cache):
+    client.get("campaign", id=1)
+    client.get("campaign", id=1)
+    assert client._send.call_count == 2
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_write_invalidates_service(client):
+    client.get("country", id=1)
+    client.modify("country", {}, id=1)
+    client.get("country", id=1)
+    assert client._send.call_count == 3
+
+
+def test_service_is_invalidated_after_write(client, cache):
+    def send(method, service_name, *args, **kwargs):
+        if method == "PUT":
+            # A read racing with the write, answered before it is applied
+            client.get("country", id=1)
+        return {"country": {"id": 1}}
+
+    client._send.side_effect = send
+    client.modify("country", {}, id=1)
+    client.get("country", id=1)
+    assert client._send.call_count == 3
+
+
+def test_read_before_invalidation_is_not_cached(client, cache):
+    def send(*args, **kwargs):
+        cache.invalidate("country")
+        return {"country": {"id": 1}}
+
+    client._send.side_effect = send
+    client.get("country", id=1)
+    client._send.side_effect = None
+    client.get("country", id=1)
+    assert client._send.call_count == 2
+
+
+def test_failed_write_invalidates_service(client):
+    client.get("country", id=1)
+    client._send.side_effect = ValueError
+    with pytest.raises(ValueError):
+        client.create("country", {})
+    client._send.side_effect = None
+    client.get("country", id=1)
+    assert client._send.call_count == 3
+
+
+def test_non_json_responses_are_not_cached(client, cache):
+    client._send.return_value = b"id,name\n1,France\n"
+    assert client.get("country", format="csv") == b"id,name\n1,France\n"
+    assert client.get("country", format="csv") == b"id,name\n1,France\n"
+    assert client._send.call_count == 2
+
+
+def test_entries_expire(mocker, client, cache):
+    time = mocker.patch("time.time", return_value=1000)
+    client.get("country", id=1)
+    time.return_value += cache.default_ttl + 1
+    client.get("country", id=1)
+    assert client._send.call_count == 2
+
+
+def test_least_recently_used_is_evicted(mocker, client):
+    time = mocker.patch("time.time", return_value=1000)
+    for id in (1, 2, 1, 3):
+        time.return_value += 1
+        client.get("country", id=id)
+    assert client._send.call_count == 3
+    client.get("country", id=1)
+    assert client._send.call_count == 3
+    client.get("country", id=2)
+    assert client._send.call_count == 4
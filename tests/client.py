@@ -1,8 +1,9 @@
 # -*- coding:utf-8-*-
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
-import requests
+from requests import Session
 
 from appnexus.client import AppNexusClient
 from appnexus.exceptions import AppNexusException, BadCredentials, NoAuth
@@ -42,29 +43,29 @@ def connected_client(client, token):
 
 
 def test_connect_send_credentials(mocker, client, credentials):
-    mocker.patch("requests.post")
+    mocker.patch("requests.Session.post")
     client.update_token()
-    args, kwargs = requests.post.call_args
+    args, kwargs = Session.post.call_args
     assert "json" in kwargs and kwargs["json"] == credentials
 
 
 def test_connect_store_token(mocker, client, token):
-    mocker.patch("requests.post")
-    requests.post().json.return_value = {"response": {"token": token}}
+    mocker.patch("requests.Session.post")
+    Session.post().json.return_value = {"response": {"token": token}}
     client.update_token()
     assert hasattr(client, "token") and client.token == token
 
 
 def test_connect_bad_credentials(mocker, client):
-    mocker.patch("requests.post")
-    requests.post().json.return_value = {"response": {"error_id": "NOAUTH"}}
+    mocker.patch("requests.Session.post")
+    Session.post().json.return_value = {"response": {"error_id": "NOAUTH"}}
     with pytest.raises(BadCredentials):
         client.update_token()
 
 
 def test_connect_exception(mocker, client):
-    mocker.patch("requests.post")
-    requests.post().json.return_value = {"response": {"error_id": "WHATEVER"}}
+    mocker.patch("requests.Session.post")
+    Session.post().json.return_value = {"response": {"error_id": "WHATEVER"}}
     with pytest.raises(AppNexusException):
         client.update_token()
 
@@ -87,9 +88,9 @@ def test_uri_list_parameter(client):
 
 
 def test_headers_token(mocker, connected_client, token):
-    mocker.patch.object(requests, "get")
+    mocker.patch.object(Session, "get")
     connected_client.get("campaign")
-    args, kwargs = requests.get.call_args
+    args, kwargs = Session.get.call_args
     headers = kwargs["headers"]
     assert "Authorization" in headers and headers["Authorization"] == token
 
@@ -103,111 +104,111 @@ def test_check_errors_noauth(mocker, client):
 
 
 def test_send_success(mocker, connected_client):
-    mocker.patch("requests.get")
-    requests.get.return_value.headers = {"Content-Type": "application/json"}
-    requests.get().json.return_value = {"response": {"campaign": {}}}
-    response = connected_client._send(requests.get, "campaign", id=3)
+    mocker.patch("requests.Session.get")
+    Session.get.return_value.headers = {"Content-Type": "application/json"}
+    Session.get().json.return_value = {"response": {"campaign": {}}}
+    response = connected_client._send("GET", "campaign", id=3)
     assert "campaign" in response
 
 
 def test_send_reconnect(mocker, connected_client):
-    mocker.patch("requests.get")
-    mocker.patch("requests.post")
-    requests.post().json.return_value = {"response": {"token": token}}
-    requests.get.return_value.headers = {"Content-Type": "application/json"}
-    requests.get().json.side_effect = [{"response": {"error_id": "NOAUTH"}},
-                                       {"response": {"campaign": {}}}]
-    response = connected_client._send(requests.get, "campaign", id=3)
-    assert requests.post().json.call_count == 1
+    mocker.patch("requests.Session.get")
+    mocker.patch("requests.Session.post")
+    Session.post().json.return_value = {"response": {"token": token}}
+    Session.get.return_value.headers = {"Content-Type": "application/json"}
+    Session.get().json.side_effect = [{"response": {"error_id": "NOAUTH"}},
+                                      {"response": {"campaign": {}}}]
+    response = connected_client._send("GET", "campaign", id=3)
+    assert Session.post().json.call_count == 1
     assert "campaign" in response
 
 
 def test_send_handle_rate_exceeded(mocker, connected_client):
-    mocker.patch("requests.get")
+    mocker.patch("requests.Session.get")
     mocker.patch.object(connected_client, "_handle_rate_exceeded")
-    requests.get().json.side_effect = [
+    Session.get().json.side_effect = [
         {"response": {"error_code": "RATE_EXCEEDED"}},
         {"response": {"campaign": {}}}
     ]
-    requests.get.return_value.headers = {"Content-Type": "application/json"}
-    connected_client._send(requests.get, "campaign", id=3)
+    Session.get.return_value.headers = {"Content-Type": "application/json"}
+    connected_client._send("GET", "campaign", id=3)
     assert connected_client._handle_rate_exceeded.called
 
 
 def test_send_unknown_error(mocker, connected_client):
-    mocker.patch("requests.get")
-    requests.get.return_value.headers = {"Content-Type": "application/json"}
-    requests.get().json.return_value = {"response": {"error_id": "WHATEVER"}}
+    mocker.patch("requests.Session.get")
+    Session.get.return_value.headers = {"Content-Type": "application/json"}
+    Session.get().json.return_value = {"response": {"error_id": "WHATEVER"}}
     with pytest.raises(AppNexusException):
-        connected_client._send(requests.get, "campaign", id=3)
+        connected_client._send("GET", "campaign", id=3)
 
 
 def test_send_method_send_json(mocker, connected_client):
-    mocker.patch.object(requests, "post")
+    mocker.patch.object(Session, "post")
     data = dict(field="value")
-    connected_client._send(requests.post, "campaign", data)
-    args, kwargs = requests.post.call_args
+    connected_client._send("POST", "campaign", data)
+    args, kwargs = Session.post.call_args
     assert "json" in kwargs and kwargs["json"] == data
 
 
 def test_send_raw(mocker, connected_client):
-    mocker.patch("requests.get")
-    requests.get().json.return_value = {"response": {"campaign": {}}}
-    requests.get.return_value.headers = {"Content-Type": "application/json"}
-    response = connected_client._send(requests.get, "campaign", id=3, raw=True)
+    mocker.patch("requests.Session.get")
+    Session.get().json.return_value = {"response": {"campaign": {}}}
+    Session.get.return_value.headers = {"Content-Type": "application/json"}
+    response = connected_client._send("GET", "campaign", id=3, raw=True)
     assert "response" in response
 
 
 def test_get_return_dict(mocker, connected_client):
-    mocker.patch("requests.get")
-    requests.get().json.return_value = {"response": {"campaign": {}}}
-    requests.get.return_value.headers = {"Content-Type": "application/json"}
+    mocker.patch("requests.Session.get")
+    Session.get().json.return_value = {"response": {"campaign": {}}}
+    Session.get.return_value.headers = {"Content-Type": "application/json"}
     cursor = connected_client.get("campaign")
     assert isinstance(cursor, dict)
 
 
 def test_modify_return_dict(mocker, connected_client):
-    mocker.patch("requests.put")
-    requests.put().json.return_value = {"response": {"campaign": {}}}
-    requests.put.return_value.headers = {"Content-Type": "application/json"}
+    mocker.patch("requests.Session.put")
+    Session.put().json.return_value = {"response": {"campaign": {}}}
+    Session.put.return_value.headers = {"Content-Type": "application/json"}
     cursor = connected_client.modify("campaign", None)
     assert isinstance(cursor, dict)
 
 
 def test_modify_send_json(mocker, connected_client):
-    mocker.patch.object(requests, "put")
+    mocker.patch.object(Session, "put")
     data = dict(field="value")
     connected_client.modify("campaign", data)
-    args, kwargs = requests.put.call_args
+    args, kwargs = Session.put.call_args
     assert "json" in kwargs and kwargs["json"] == data
 
 
 def test_create_return_dict(mocker, connected_client):
-    mocker.patch("requests.post")
-    requests.post().json.return_value = {"response": {"campaign": {}}}
-    requests.post.return_value.headers = {"Content-Type": "application/json"}
+    mocker.patch("requests.Session.post")
+    Session.post().json.return_value = {"response": {"campaign": {}}}
+    Session.post.return_value.headers = {"Content-Type": "application/json"}
     cursor = connected_client.create("campaign", None)
     assert isinstance(cursor, dict)
 
 
 def test_create_send_json(mocker, connected_client):
-    mocker.patch.object(requests, "post")
+    mocker.patch.object(Session, "post")
     data = dict(field="value")
     connected_client.create("campaign", data)
-    args, kwargs = requests.post.call_args
+    args, kwargs = Session.post.call_args
     assert "json" in kwargs and kwargs["json"] == data
 
 
 def test_delete_return_dict(mocker, connected_client):
-    mocker.patch("requests.delete")
-    requests.delete().json.return_value = {"response": {"campaign": {}}}
-    requests.delete.return_value.headers = {"Content-Type": "application/json"}
+    mocker.patch("requests.Session.delete")
+    Session.delete().json.return_value = {"response": {"campaign": {}}}
+    Session.delete.return_value.headers = {"Content-Type": "application/json"}
     cursor = connected_client.delete("campaign", 42)
     assert isinstance(cursor, dict)
 
 
 def test_delete_send_ids(mocker, connected_client):
-    mocker.patch.object(requests, "delete")
+    mocker.patch.object(Session, "delete")
     mocker.patch.object(connected_client, "_prepare_uri")
     ids = [1, 2, 3]
     connected_client.delete("campaign", *ids)
@@ -216,9 +217,9 @@ def test_delete_send_ids(mocker, connected_client):
 
 
 def test_append_return_dict(mocker, connected_client):
-    mocker.patch("requests.put")
-    requests.put().json.return_value = {"response": {"campaign": {}}}
-    requests.put.return_value.headers = {"Content-Type": "application/json"}
+    mocker.patch("requests.Session.put")
+    Session.put().json.return_value = {"response": {"campaign": {}}}
+    Session.put.return_value.headers = {"Content-Type": "application/json"}
     cursor = connected_client.append("campaign", None)
     assert isinstance(cursor, dict)
 
@@ -238,9 +239,9 @@ def test_meta_call_meta_endpoint(mocker, connected_client):
 
 
 def test_sleep_when_rate_exceeded_on_auth(mocker, connected_client):
-    mocker.patch("requests.post")
-    requests.post().json.return_value = {"response":
-                                         {"error_code": "RATE_EXCEEDED"}}
+    mocker.patch("requests.Session.post")
+    Session.post().json.return_value = {"response":
+                                        {"error_code": "RATE_EXCEEDED"}}
     mocker.patch("time.sleep")
     connected_client.update_token()
     assert time.sleep.called
@@ -253,13 +254,13 @@ def test_without_credentials():
 
 
 def test_connect(mocker):
-    mocker.patch.object(requests, "post")
-    requests.post().json.return_value = {"response": {"token": "TOKEN"}}
+    mocker.patch.object(Session, "post")
+    Session.post().json.return_value = {"response": {"token": "TOKEN"}}
     client = AppNexusClient()
     credentials = {"username": "appnexususer", "password": "my-password"}
     client.connect(**credentials)
     client.update_token()
-    _, kwargs = requests.post.call_args
+    _, kwargs = Session.post.call_args
     assert kwargs["json"] == {"auth": credentials}
 
 
@@ -293,6 +294,19 @@ def test_service_create(mocker, connected_client):
     assert connected_client.create.called
 
 
+def test_service_created_on_first_access(client):
+    assert "line_item" not in vars(client)
+    service = client.line_item
+    assert service.name == "line-item"
+    assert client.line_item is service
+    assert "ip_range_list" in dir(client)
+
+
+def test_unknown_service(client):
+    with pytest.raises(AttributeError):
+        client.unknown_service
+
+
 def test_global_client_connect(mocker):
     from appnexus import client, connect
     mocker.patch.object(client, "connect")
@@ -306,3 +320,161 @@ def test_global_client_find(mocker):
     mocker.patch.object(client, "find")
     find("creative")
     assert client.find.called
+
+
+def test_session_is_reused(client):
+    assert client.session is client.session
+
+
+def test_session_pool_size():
+    client = AppNexusClient(pool_size=32)
+    adapter = client.session.get_adapter(client.url)
+    assert adapter._pool_maxsize == 32
+
+
+def test_requests_go_through_session(mocker, connected_client):
+    mocker.patch.object(connected_client.session, "get")
+    connected_client.get("campaign")
+    assert connected_client.session.get.called
+
+
+def test_close_session(mocker, client):
+    session = client.session
+    mocker.patch.object(session, "close")
+    client.close()
+    assert session.close.called
+    assert client.session is not session
+
+
+def test_client_as_context_manager(mocker):
+    with AppNexusClient() as client:
+        session = client.session
+        mocker.patch.object(session, "close")
+    assert session.close.called
+
+
+def test_bulk_write_dispatches_operations(mocker, connected_client):
+    mocker.patch.object(connected_client, "create", return_value="created")
+    mocker.patch.object(connected_client, "modify", return_value="modified")
+    result = connected_client.bulk_write("campaign", [
+        ("create", {"name": "new"}),
+        ("modify", {"name": "changed"}, {"id": 42}),
+    ])
+    assert result.succeeded
+    assert result.results == {0: "created", 1: "modified"}
+    connected_client.modify.assert_called_once_with(
+        "campaign", {"name": "changed"}, id=42)
+
+
+def test_bulk_write_groups_deletions(mocker, connected_client):
+    mocker.patch.object(connected_client, "delete", return_value="deleted")
+    operations = [("delete", id) for id in range(5)]
+    result = connected_client.bulk_write("campaign", operations,
+                                         delete_batch_size=2)
+    assert connected_client.delete.call_count == 3
+    assert result.results == {index: "deleted" for index in range(5)}
+
+
+def test_bulk_write_collects_errors(mocker, connected_client):
+    error = AppNexusException()
+    mocker.patch.object(connected_client, "create",
+                        side_effect=[error, "created"])
+    result = connected_client.bulk_write("campaign", [("create", {})] * 2,
+                                         workers=1)
+    assert not result.succeeded
+    assert result.errors == {0: error}
+    assert result.results == {1: "created"}
+    assert result.throughput > 0
+
+
+def test_bulk_write_unknown_operation(connected_client):
+    with pytest.raises(ValueError):
+        connected_client.bulk_write("campaign", [("replace", {})])
+
+
+def test_send_stream(mocker, connected_client):
+    mocker.patch("requests.Session.get")
+    Session.get.return_value.headers = {"Content-Type": "application/json"}
+    Session.get.return_value.iter_content.return_value = [
+        b'{"response": {"count": 1, "campaigns": [{"id": 1}]}}']
+    page = connected_client.get("campaign", stream=True)
+    _, kwargs = Session.get.call_args
+    assert kwargs["stream"]
+    assert list(page) == [{"id": 1}] and page.page["count"] == 1
+
+
+def test_send_stream_error(mocker, connected_client):
+    mocker.patch("requests.Session.get")
+    Session.get.return_value.headers = {"Content-Type": "application/json"}
+    Session.get.return_value.iter_content.return_value = [
+        b'{"response": {"error_id": "WHATEVER", "error": "error"}}']
+    with pytest.raises(AppNexusException) as exception_info:
+        connected_client.get("campaign", stream=True)
+    assert "WHATEVER" in str(exception_info.value)
+
+
+def auth_response(mocker, token):
+    response = mocker.Mock()
+    response.json.return_value = {"response": {"token": token}}
+    return response
+
+
+def test_concurrent_token_refresh_is_single_flight(mocker, connected_client):
+    def get(uri, headers, **kwargs):
+        response = mocker.Mock(headers={"Content-Type": "application/json"})
+        if headers["Authorization"] == "new-token":
+            response.json.return_value = {"response": {"campaign": {}}}
+        else:
+            response.json.return_value = {"response": {"error_id": "NOAUTH"}}
+        return response
+
+    def post(uri, json):
+        time.sleep(0.05)
+        return auth_response(mocker, "new-token")
+
+    mocker.patch("requests.Session.get", side_effect=get)
+    mocker.patch("requests.Session.post", side_effect=post)
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(
+            lambda id: connected_client.get("campaign", id=id), range(16)))
+    assert all("campaign" in result for result in results)
+    assert Session.post.call_count == 1
+
+
+def test_token_file_is_shared(mocker, tmpdir):
+    token_file = str(tmpdir.join("token"))
+    mocker.patch("requests.Session.post",
+                 return_value=auth_response(mocker, "new-token"))
+    first = AppNexusClient("user", "password", token_file=token_file)
+    second = AppNexusClient("user", "password", token_file=token_file)
+    first.token = second.token = "old-token"
+    first.update_token(expired_token="old-token")
+    assert second.update_token(expired_token="old-token") == "new-token"
+    assert Session.post.call_count == 1
+    assert tmpdir.listdir(lambda path: path.basename.startswith(".token-")) \
+        == []
+    assert AppNexusClient(token_file=token_file).token == "new-token"
+
+
+def test_token_is_refreshed_before_expiry(mocker, client):
+    mocker.patch("requests.Session.get")
+    Session.get.return_value.headers = {"Content-Type": "application/json"}
+    Session.get().json.return_value = {"response": {"campaign": {}}}
+    mocker.patch("requests.Session.post",
+                 return_value=auth_response(mocker, "new-token"))
+    client._set_token("old-token", time.time() - client.token_lifetime + 60)
+    client.get("campaign")
+    assert Session.post.call_count == 1
+    _, kwargs = Session.get.call_args
+    assert kwargs["headers"]["Authorization"] == "new-token"
+    client.get("campaign")
+    assert Session.post.call_count == 1
+
+
+def test_token_set_by_hand_does_not_expire(mocker, connected_client):
+    mocker.patch("requests.Session.get")
+    Session.get.return_value.headers = {"Content-Type": "application/json"}
+    Session.get().json.return_value = {"response": {"campaign": {}}}
+    mocker.patch("requests.Session.post")
+    connected_client.get("campaign")
+    assert not Session.post.called
@@ -0,0 +1,183 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from appnexus import Campaign
+from appnexus.client import AppNexusClient
+from appnexus.coalesce import Batcher, SingleFlight, request_key
+from appnexus.representations import raw
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def client():
+    client = AppNexusClient("test", "test")
+    client.token = "token"
+    return client
+
+
+def test_request_key_does_not_depend_on_the_order_of_parameters():
+    assert request_key("campaign", {"id": 1, "state": "active"}) == \
+        request_key("campaign", {"state": "active", "id": 1})
+    assert request_key("campaign", {"id": 1}) != \
+        request_key("campaign", {"id": 2})
+
+
+def test_single_flight_shares_concurrent_calls(mocker):
+    single_flight = SingleFlight()
+    release = threading.Event()
+
+    def function():
+        release.wait(5)
+        return {"campaign": {"id": 1}}
+
+    function = mocker.Mock(side_effect=function)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(single_flight.call, "key", function)
+                   for _ in range(4)]
+        wait_for(lambda: single_flight.shared == 3)
+        release.set()
+        results = [future.result() for future in futures]
+    assert function.call_count == 1
+    assert all(result == {"campaign": {"id": 1}} for result in results)
+    assert len({id(result["campaign"]) for result in results}) == 4
+    assert single_flight.call("key", lambda: "again") == "again"
+
+
+def test_single_flight_shares_errors():
+    single_flight = SingleFlight()
+    release = threading.Event()
+
+    def function():
+        release.wait(5)
+        raise ValueError("failed")
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(single_flight.call, "key", function)
+                   for _ in range(3)]
+        wait_for(lambda: single_flight.shared == 2)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result()
+
+
+def test_concurrent_identical_gets_share_a_request(mocker, client):
+    release = threading.Event()
+
+    def send(method, service_name, **kwargs):
+        release.wait(5)
+        return {"campaign": {"id": kwargs["id"]}}
+
+    mocker.patch.object(client, "_send", side_effect=send)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(client.get, "campaign", id=1, state="x"),
+                   executor.submit(client.get, "campaign", state="x", id=1)]
+        wait_for(lambda: client.single_flight.shared == 1)
+        futures.append(executor.submit(client.get, "campaign", id=2))
+        wait_for(lambda: client._send.call_count == 2)
+        release.set()
+        results = [future.result() for future in futures]
+    assert [result["campaign"]["id"] for result in results] == [1, 1, 2]
+    assert client._send.call_count == 2
+
+
+def test_gets_after_a_write_do_not_join_earlier_gets(mocker, client):
+    release = threading.Event()
+
+    def send(method, service_name, *args, **kwargs):
+        if method == "GET" and not release.is_set():
+            release.wait(5)
+            return {"campaign": {"state": "active"}}
+        return {"campaign": {"state": "inactive"}}
+
+    mocker.patch.object(client, "_send", side_effect=send)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        before = executor.submit(client.get, "campaign", id=1)
+        wait_for(lambda: client._send.call_count == 1)
+        client.modify("campaign", {"state": "inactive"}, id=1)
+        release.set()
+        after = client.get("campaign", id=1)
+        assert before.result() == {"campaign": {"state": "active"}}
+    assert after == {"campaign": {"state": "inactive"}}
+    assert client.single_flight.shared == 0
+    assert client._send.call_count == 3
+
+
+def test_gets_are_not_coalesced_when_disabled(mocker):
+    client = AppNexusClient("test", "test", coalesce=False)
+    mocker.patch.object(client, "_send", return_value={})
+    client.get("campaign", id=1)
+    assert client.single_flight is None
+    assert client._send.called
+
+
+def test_batcher_merges_concurrent_lookups(mocker, client):
+    client.batcher = Batcher(client, window=0.2)
+    mocker.patch.object(client, "get", return_value={
+        "status": "OK", "count": 2, "start_element": 0, "num_elements": 3,
+        "campaigns": [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]})
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(client.find_one, "campaign", id=id,
+                                   representation=raw)
+                   for id in (1, "2", 3, 1)]
+        results = [future.result() for future in futures]
+    assert results == [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}, None,
+                       {"id": 1, "name": "a"}]
+    assert results[0] is not results[3]
+    client.get.assert_called_once_with("campaign", id=[1, "2", 3],
+                                       num_elements=3)
+    assert (client.batcher.requests, client.batcher.lookups) == (1, 4)
+
+
+def test_batcher_sends_full_batches_early(mocker, client):
+    batcher = Batcher(client, window=5, max_size=2)
+    mocker.patch.object(client, "get",
+                        return_value={"campaigns": [{"id": 1}, {"id": 2}]})
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = list(executor.map(lambda id: batcher.get("campaign", id),
+                                    [1, 2]))
+    assert results == [{"id": 1}, {"id": 2}]
+    assert time.monotonic() - started < 5
+
+
+def test_batcher_shares_errors(mocker, client):
+    batcher = Batcher(client, window=0.1)
+    mocker.patch.object(client, "get", side_effect=ValueError("failed"))
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(batcher.get, "campaign", id)
+                   for id in (1, 2)]
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result()
+    assert client.get.call_count == 1
+
+
+def test_find_one_without_single_id_is_not_batched(mocker, client):
+    client.batcher = mocker.Mock()
+    mocker.patch.object(client, "find")
+    client.find_one("campaign", id=[1, 2], representation=raw)
+    client.find_one("campaign", id="1,2", representation=raw)
+    client.find_one("campaign", id=1, state="active", representation=raw)
+    assert client.find.call_count == 3
+    assert not client.batcher.get.called
+
+
+def test_model_find_one_is_batched(mocker, client):
+    client.batcher = Batcher(client, window=0)
+    mocker.patch.object(Campaign, "client", client)
+    mocker.patch.object(client, "get",
+                        return_value={"campaigns": [{"id": 4}]})
+    campaign = Campaign.find_one(id=4)
+    assert isinstance(campaign, Campaign)
+    assert campaign.id == 4
+    client.get.assert_called_once_with("campaign", id=[4], num_elements=1)
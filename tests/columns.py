@@ -0,0 +1,85 @@
+import array
+
+import pytest
+
+from appnexus import representations
+from appnexus.client import AppNexusClient
+from appnexus.cursor import Cursor
+
+
+@pytest.fixture
+def pages():
+    return [
+        {"count": 3, "start_element": 0, "num_elements": 2, "campaigns": [
+            {"id": 1, "name": "first", "budget": 1.5},
+            {"id": 2, "name": "second", "budget": None},
+        ]},
+        {"count": 3, "start_element": 2, "num_elements": 1, "campaigns": [
+            {"id": 3, "name": "third", "budget": 2, "labels": [1, 2]},
+        ]},
+    ]
+
+
+@pytest.fixture
+def cursor(mocker, pages):
+    client = AppNexusClient("test", "test")
+    mocker.patch.object(client, "get")
+    client.get.side_effect = lambda service, start_element, **kwargs: \
+        pages[start_element // 2]
+    mocker.patch.object(client, "meta")
+    client.meta.return_value = {"fields": [{"name": "id", "type": "int"},
+                                           {"name": "budget",
+                                            "type": "money"}]}
+    return Cursor(client, "campaign", representations.raw)
+
+
+def test_to_columns(cursor):
+    columns = cursor.to_columns()
+    assert list(columns) == ["id", "name", "budget", "labels"]
+    assert columns["id"] == [1, 2, 3]
+    assert columns["labels"] == [None, None, [1, 2]]
+
+
+def test_to_columns_projection_and_skip(cursor):
+    columns = cursor.skip(1).to_columns(fields=["name"])
+    assert columns == {"name": ["second", "third"]}
+
+
+def test_to_columns_with_meta_types(cursor):
+    columns = cursor.limit(1).to_columns(meta=True)
+    assert columns["id"] == array.array("q", [1])
+    assert columns["budget"] == array.array("d", [1.5])
+
+
+def test_to_columns_typed_column_with_nulls(cursor):
+    columns = cursor.to_columns(meta=True)
+    assert isinstance(columns["id"], array.array)
+    assert columns["budget"] == [1.5, None, 2]
+
+
+def test_to_columns_boolean_columns(cursor, pages):
+    pages[0]["campaigns"][0]["active"] = True
+    pages[0]["campaigns"][1]["active"] = False
+    pages[1]["campaigns"][0]["active"] = None
+    columns = cursor.to_columns(types={"active": "boolean"})
+    assert columns["active"] == [True, False, None]
+    assert type(columns["active"][0]) is bool
+    columns = cursor.limit(2).to_columns(types={"active": "boolean"})
+    assert columns["active"] == [True, False]
+    assert all(type(value) is bool for value in columns["active"])
+
+
+def test_to_arrow(cursor):
+    pyarrow = pytest.importorskip("pyarrow")
+    table = cursor.to_arrow(meta=True)
+    assert table.num_rows == 3
+    assert table.schema.field("id").type == pyarrow.int64()
+    assert table.schema.field("budget").type == pyarrow.float64()
+    assert table.column("labels").to_pylist() == [None, None, "[1, 2]"]
+
+
+def test_to_dataframe(cursor):
+    pytest.importorskip("pandas")
+    dataframe = cursor.to_dataframe(fields=["id", "name"])
+    assert list(dataframe.columns) == ["id", "name"]
+    assert list(dataframe["name"]) == ["first", "second", "third"]
@@ -1,8 +1,11 @@
+import json
+
 import pytest
+import requests
 
 from appnexus import representations
 from appnexus.client import AppNexusClient
-from appnexus.cursor import Cursor
+from appnexus.cursor import AdaptiveBatchSize, Cursor
 
 from .helpers import gen_random_collection
 
@@ -164,3 +167,252 @@ def test_uncallable_representation():
 def test_requests_volume_on_iteration(cursor):
     _ = [r for r in cursor]
     assert cursor.client.get.call_count == 1
+
+
+def test_skip_within_first_page(cursor, response_dict):
+    assert list(cursor.skip(1)) == response_dict["campaigns"][1:]
+
+
+def test_parallel_iteration_keeps_order(random_cursor, random_response_dict):
+    random_cursor.client.get.side_effect = \
+        lambda service, start_element, **kwargs: \
+        random_response_dict[start_element // 100]
+    expected = [x for page in random_response_dict for x in page["campaigns"]]
+    cursor = random_cursor.parallel(workers=4)
+    assert [x for x in cursor] == expected
+    assert random_cursor.client.get.call_count == len(random_response_dict)
+
+
+def test_parallel_iteration_honours_limit(random_cursor,
+                                          random_response_dict):
+    random_cursor.client.get.side_effect = \
+        lambda service, start_element, **kwargs: \
+        random_response_dict[start_element // 100]
+    cursor = random_cursor.parallel(workers=4).skip(150).limit(20)
+    expected = random_response_dict[1]["campaigns"][50:70]
+    assert [x for x in cursor] == expected
+    assert random_cursor.client.get.call_count == 2
+
+
+def test_parallel_invalid_workers(cursor):
+    with pytest.raises(ValueError):
+        cursor.parallel(workers=0)
+
+
+def test_cursor_stream(mocker, cursor, response_dict):
+    from appnexus.streaming import StreamedPage
+
+    def get(service_name, stream, start_element, **kwargs):
+        content = json.dumps({"response": response_dict}).encode()
+        return StreamedPage([content], Cursor.common_keys)
+
+    cursor.client.get.side_effect = get
+    assert [x for x in cursor.stream()] == response_dict["campaigns"]
+    assert cursor.client.get.call_count == 1
+
+
+def test_cursor_stream_with_skip_and_limit(mocker, cursor, response_dict):
+    from appnexus.streaming import StreamedPage
+
+    cursor.client.get.return_value = StreamedPage(
+        [json.dumps({"response": response_dict}).encode()],
+        Cursor.common_keys)
+    assert [x for x in cursor.stream().skip(1).limit(1)] == \
+        response_dict["campaigns"][:1]
+    _, kwargs = cursor.client.get.call_args
+    assert kwargs["start_element"] == 1
+
+
+def test_streamed_cursor_with_limit(random_cursor, random_response_dict):
+    from appnexus.streaming import StreamedPage
+
+    def get(service_name, stream, start_element, **kwargs):
+        page = random_response_dict[start_element // 100]
+        return StreamedPage([json.dumps({"response": page}).encode()],
+                            Cursor.common_keys)
+
+    random_cursor.client.get.side_effect = get
+    cursor = random_cursor.stream().limit(100)
+    expected = random_response_dict[0]["campaigns"]
+    assert [x for x in cursor] == expected
+    assert random_cursor.client.get.call_count == 1
+    assert [x for x in cursor] == expected
+    assert random_cursor.client.get.call_count == 2
+
+
+def test_batch_size(cursor):
+    cursor.batch_size(20)
+    cursor.get_page()
+    _, kwargs = cursor.client.get.call_args
+    assert kwargs["num_elements"] == 20
+
+
+def test_offsets_and_page_size(cursor):
+    assert cursor.offsets() == (0, 2)
+    assert cursor.skip(1).offsets() == (1, 2)
+    assert cursor.limit(0).offsets() == (1, 1)
+    assert cursor.page_size == 100
+    assert cursor.batch_size(20).page_size == 20
+
+
+@pytest.mark.parametrize("size", [0, 101])
+def test_invalid_batch_size(cursor, size):
+    with pytest.raises(ValueError):
+        cursor.batch_size(size)
+
+
+def test_batch_size_service_maximum(mocker, cursor):
+    mocker.patch.dict(Cursor.max_batch_sizes, {"campaign": 1000})
+    cursor.batch_size(1000)
+    with pytest.raises(ValueError):
+        cursor.batch_size(1001)
+
+
+def test_adaptive_batch_size_grows_and_shrinks():
+    adaptive = AdaptiveBatchSize(100, 10, 1000, target_time=5)
+    adaptive.record(100, 1.0)
+    assert adaptive.size == 200
+    adaptive.record(200, 1.5)
+    assert adaptive.size == 400
+    adaptive.record(400, 6.0)
+    assert adaptive.size == 200
+
+
+def test_adaptive_iteration_retries_smaller_page_on_timeout(mocker, cursor,
+                                                            response_dict):
+    cursor.client.get.side_effect = [requests.Timeout(), response_dict]
+    assert [x for x in cursor.batch_size(100, adaptive=True)] == \
+        response_dict["campaigns"]
+    sizes = [kwargs["num_elements"]
+             for _, kwargs in cursor.client.get.call_args_list]
+    assert sizes == [100, 50]
+
+
+def test_adaptive_iteration_gives_up_at_minimum(cursor):
+    cursor.client.get.side_effect = requests.Timeout()
+    with pytest.raises(requests.Timeout):
+        [x for x in cursor.batch_size(10, adaptive=True)]
+
+
+def test_adaptive_batch_size_grows_from_default(mocker, cursor):
+    def get(service_name, start_element, num_elements, **kwargs):
+        return {"count": 1000, "start_element": start_element,
+                "num_elements": num_elements,
+                "campaigns": [{"id": id} for id in range(
+                    start_element, start_element + num_elements)]}
+
+    cursor.client.get.side_effect = get
+    # Every page takes a second, so larger pages are cheaper per element
+    clock = mocker.patch("appnexus.cursor.time")
+    clock.monotonic.side_effect = range(1000)
+    cursor.batch_size(adaptive=True).limit(175)
+    assert len([x for x in cursor]) == 175
+    sizes = [kwargs["num_elements"]
+             for _, kwargs in cursor.client.get.call_args_list]
+    assert sizes == [25, 50, 100]
+    with pytest.raises(TypeError):
+        cursor.batch_size()
+
+
+def test_adaptive_iteration_shrinks_on_request_timeouts(mocker):
+    from appnexus.retry import RetryPolicy
+
+    def get(uri, **kwargs):
+        if "num_elements=100" in uri:
+            raise requests.ReadTimeout()
+        response = mocker.Mock(headers={"Content-Type": "application/json"},
+                               status_code=200)
+        response.json.return_value = {"response": {
+            "count": 1, "start_element": 0, "num_elements": 1,
+            "campaigns": [{"id": 1}]}}
+        return response
+
+    client = AppNexusClient("test", "test",
+                            retry_policy=RetryPolicy(max_attempts=1))
+    client.token = "token"
+    session_get = mocker.patch("requests.Session.get", side_effect=get)
+    cursor = Cursor(client, "campaign", representations.raw)
+    assert [x for x in cursor.batch_size(100, adaptive=True)] == [{"id": 1}]
+    assert [call[0][0].split("num_elements=")[1][:3]
+            for call in session_get.call_args_list] == ["100", "50&"]
+    _, kwargs = session_get.call_args
+    assert kwargs["timeout"] == client.retry_policy.timeout
+
+
+def test_count_is_memoized(cursor, response_dict):
+    assert cursor.cached_count is None
+    assert cursor.count() == cursor.count() == len(cursor)
+    assert cursor.cached_count == response_dict["count"]
+    assert cursor.client.get.call_count == 1
+
+
+def test_count_page_is_reused_by_iteration(cursor, response_dict):
+    if len(cursor):
+        assert [x for x in cursor] == response_dict["campaigns"]
+    assert cursor.client.get.call_count == 1
+
+
+def test_count_is_known_after_iteration(cursor, response_dict):
+    assert [x for x in cursor]
+    assert cursor.size() == response_dict["count"]
+    assert cursor.client.get.call_count == 1
+
+
+def test_first_reuses_first_page(cursor, response_dict):
+    cursor.count()
+    assert cursor.first == response_dict["campaigns"][0]
+    assert cursor[1] == response_dict["campaigns"][1]
+    assert cursor.client.get.call_count == 1
+
+
+@pytest.fixture
+def paged_cursor(random_cursor):
+    pages = gen_random_collection(count=350)
+    pages[-1]["start_element"] = 300
+    random_cursor.client.get.side_effect = \
+        lambda service, start_element, **kwargs: pages[start_element // 100]
+    random_cursor.elements = [x for page in pages for x in page["campaigns"]]
+    return random_cursor
+
+
+def test_cursor_slice(paged_cursor):
+    assert paged_cursor[150:250] == paged_cursor.elements[150:250]
+    assert paged_cursor.client.get.call_count == 2
+
+
+def test_cursor_slice_with_step(paged_cursor):
+    assert paged_cursor[10:320:30] == paged_cursor.elements[10:320:30]
+
+
+def test_cursor_slice_past_the_end(paged_cursor):
+    assert paged_cursor[340:400] == paged_cursor.elements[340:400]
+
+
+def test_cursor_negative_slice(paged_cursor):
+    assert paged_cursor[-20:] == paged_cursor.elements[-20:]
+    assert paged_cursor[::-50] == paged_cursor.elements[::-50]
+
+
+def test_cursor_negative_index(paged_cursor):
+    assert paged_cursor[-1] == paged_cursor.elements[-1]
+
+
+def test_cursor_index_out_of_range(paged_cursor):
+    with pytest.raises(IndexError):
+        paged_cursor[-351]
+    with pytest.raises(IndexError):
+        paged_cursor[350]
+
+
+def test_cursor_pages_are_shared(paged_cursor):
+    assert [paged_cursor[i] for i in (120, 150, 199)] == \
+        [paged_cursor.elements[i] for i in (120, 150, 199)]
+    assert paged_cursor.first == paged_cursor.elements[0]
+    assert [x for x in paged_cursor] == paged_cursor.elements
+    assert paged_cursor.client.get.call_count == 5
+
+
+def test_cursor_page_cache_is_bounded(paged_cursor):
+    paged_cursor.page_cache_size = 2
+    [x for x in paged_cursor]
+    assert list(paged_cursor._pages) == [200, 300]
@@ -0,0 +1,130 @@
+import json
+import os
+
+import pytest
+
+from appnexus import export
+from appnexus.client import AppNexusClient
+from appnexus.ratelimit import RateLimiter
+from appnexus.representations import raw
+from tests.helpers import FakeAPI
+
+
+@pytest.fixture
+def api():
+    with FakeAPI(objects=350) as api:
+        yield api
+
+
+@pytest.fixture
+def client(api):
+    client = AppNexusClient("test", "test")
+    client.url = api.url
+    yield client
+    client.close()
+
+
+def read_ids(path):
+    with open(path) as fp:
+        return [json.loads(line)["id"] for line in fp]
+
+
+def test_partition():
+    assert export.partition(0, 350, 100, 3) == [(0, 100), (100, 200),
+                                                (200, 350)]
+    assert export.partition(50, 250, 100, 4) == [(50, 150), (150, 250)]
+    assert export.partition(0, 0, 100, 4) == []
+
+
+def test_infer_format():
+    assert export.infer_format("campaigns.parquet") == "parquet"
+    assert export.infer_format("campaigns.json") == "ndjson"
+
+
+def test_export_in_process(client, api, tmpdir):
+    path = str(tmpdir.join("campaigns.ndjson"))
+    cursor = client.find("campaign", representation=raw)
+    assert cursor.export(path, processes=1, fields=["id", "state"]) == 350
+    with open(path) as fp:
+        assert json.loads(next(fp)) == {"id": 1, "state": "active"}
+    assert read_ids(path) == list(range(1, 351))
+    assert tmpdir.listdir() == [tmpdir.join("campaigns.ndjson")]
+
+
+def test_export_with_processes(client, api, tmpdir):
+    path = str(tmpdir.join("campaigns.ndjson"))
+    cursor = client.find("campaign", representation=raw)
+    assert cursor.export(path, processes=3) == 350
+    assert read_ids(path) == list(range(1, 351))
+    assert api.requests["auth"] == 1
+    assert api.requests["GET"] - api.requests["noauth"] == 5
+
+
+def test_export_with_skip_and_limit(client, api, tmpdir):
+    path = str(tmpdir.join("campaigns.ndjson"))
+    cursor = client.find("campaign", representation=raw).batch_size(50)
+    assert cursor.skip(25).limit(100).export(path, processes=2) == 100
+    assert read_ids(path) == list(range(26, 126))
+
+
+def test_export_shares_the_rate_limiter(client, api, tmpdir):
+    directory = str(tmpdir)
+    assert export.client_options(client, directory)["rate_limiter"] is None
+    client.rate_limiter = RateLimiter.from_limits()
+    limiter = export.client_options(client, directory)["rate_limiter"]
+    assert limiter.read.path == str(tmpdir.join("ratelimit.read"))
+    assert limiter.read.rate == 100
+
+
+def test_export_temporary_token_file_is_private(client, tmpdir):
+    client.token = "secret"
+    token_file = export.client_options(client, str(tmpdir))["token_file"]
+    with open(token_file) as fp:
+        assert fp.read() == "secret"
+    assert os.stat(token_file).st_mode & 0o777 == 0o600
+
+
+def test_export_shares_token_file(client, api, tmpdir):
+    token_file = str(tmpdir.join("token"))
+    client.token_file = token_file
+    cursor = client.find("campaign", representation=raw)
+    cursor.export(str(tmpdir.join("campaigns.ndjson")), processes=1)
+    assert client.token is not None
+    with open(token_file) as fp:
+        assert fp.read() == client.token
+    assert api.requests["auth"] == 1
+
+
+def test_export_parquet(client, api, tmpdir):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    path = str(tmpdir.join("campaigns.parquet"))
+    cursor = client.find("campaign", representation=raw)
+    assert cursor.export(path, processes=2, fields=["id", "name"],
+                         types={"id": "int"}) == 350
+    table = parquet.read_table(path)
+    assert table.column_names == ["id", "name"]
+    assert table["id"].to_pylist() == list(range(1, 351))
+    assert table["name"][0].as_py() == "campaign 1"
+
+
+def test_merge_parquet_unifies_columns(tmpdir):
+    pyarrow = pytest.importorskip("pyarrow")
+    parquet = pytest.importorskip("pyarrow.parquet")
+    shards = [str(tmpdir.join("part000")), str(tmpdir.join("part001"))]
+    parquet.write_table(pyarrow.table({"id": [1, 2],
+                                       "code": pyarrow.nulls(2)}), shards[0])
+    parquet.write_table(pyarrow.table({"id": [3], "code": ["x"],
+                                       "name": ["c"]}), shards[1])
+    path = str(tmpdir.join("merged.parquet"))
+    export.merge_parquet(shards, path)
+    assert parquet.read_table(path).to_pydict() == {
+        "id": [1, 2, 3], "code": [None, None, "x"],
+        "name": [None, None, "c"]}
+
+
+def test_export_unknown_format(client):
+    cursor = client.find("campaign", representation=raw)
+    with pytest.raises(ValueError):
+        cursor.export("campaigns.csv", format="csv")
+    with pytest.raises(ValueError):
+        cursor.export("campaigns.ndjson", processes=0)
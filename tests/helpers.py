@@ -1,4 +1,10 @@
+import itertools
+import json
 import random
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
 
 
 def gen_random_object():
@@ -36,3 +42,84 @@ def gen_random_collection(count=None, object_type="campaigns"):
                                       num_elements=count % 100)
         result.append(random_page)
     return result
+
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, data, status=200):
+        body = json.dumps({"response": data}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        api = self.server.api
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        with api.lock:
+            api.requests["auth"] += 1
+            token = "token-{}".format(next(api.token_ids))
+            api.tokens.add(token)
+        self.send_json({"status": "OK", "token": token})
+
+    def do_GET(self):
+        api = self.server.api
+        url = urlsplit(self.path)
+        query = {key: values[-1]
+                 for key, values in parse_qs(url.query).items()}
+        with api.lock:
+            api.requests["GET"] += 1
+            if self.headers.get("Authorization") not in api.tokens:
+                api.requests["noauth"] += 1
+                return self.send_json({"status": "error",
+                                       "error_id": "NOAUTH"}, 401)
+        self.send_json(api.page(url.path.strip("/"),
+                                int(query.get("start_element", 0)),
+                                int(query.get("num_elements", 100))))
+
+
+class FakeAPI(object):
+    """A local HTTP server serving pages of objects like the AppNexus API
+
+    Use it as a context manager, and give its ``url`` to the client. It
+    counts the requests it receives in ``requests``.
+    """
+
+    def __init__(self, objects=100):
+        self.objects = objects
+        self.requests = Counter()
+        self.tokens = set()
+        self.token_ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), FakeAPIHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.api = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                                       daemon=True)
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}/".format(self.httpd.server_address[1])
+
+    def page(self, service_name, start_element, num_elements):
+        stop = min(self.objects, start_element + min(num_elements, 100))
+        objects = [{"id": id, "name": "{} {}".format(service_name, id),
+                    "state": "active" if id % 3 else "inactive"}
+                   for id in range(start_element + 1, stop + 1)]
+        return {"status": "OK", "count": self.objects,
+                "start_element": start_element,
+                "num_elements": len(objects), service_name + "s": objects}
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
@@ -0,0 +1,161 @@
+import json
+import socket
+
+import pytest
+import requests
+
+from appnexus.client import AppNexusClient
+from appnexus.instrumentation import Event, Hooks, Metrics, StatsdMetrics
+
+
+def make_response(data, status_code=200, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps({"response": data}).encode()
+    response.headers.update({"Content-Type": "application/json"})
+    response.headers.update(headers or {})
+    return response
+
+
+@pytest.fixture
+def client(mocker):
+    client = AppNexusClient("test", "test")
+    client.token = "secret-token"
+    mocker.patch("requests.Session.get")
+    mocker.patch("requests.Session.post")
+    mocker.patch.object(client, "_handle_rate_exceeded")
+    return client
+
+
+@pytest.fixture
+def events(client):
+    events = []
+    for name in ("on_request", "on_response", "on_retry", "on_rate_limited",
+                 "on_token_refresh"):
+        getattr(client, name)(events.append)
+    return events
+
+
+def test_event():
+    event = Event("response", "campaign", "GET", status_code=200)
+    assert event.status_code == 200
+    assert event.bytes is None
+    assert "status_code=200" in repr(event)
+
+
+def test_hooks():
+    hooks = Hooks()
+    assert not hooks
+    calls = []
+    hooks.register("on_retry", calls.append)
+    assert hooks
+    hooks.emit(Event("retry"))
+    hooks.emit(Event("request"))
+    assert [event.name for event in calls] == ["retry"]
+    hooks.unregister("on_retry", calls.append)
+    assert not hooks
+    with pytest.raises(ValueError):
+        hooks.register("on_anything", print)
+
+
+def test_hook_errors_do_not_fail_requests(client, caplog):
+    client.on_response(lambda event: 1 / 0)
+    requests.Session.get.return_value = make_response({"campaign": {}})
+    with caplog.at_level("ERROR", logger="appnexus-client"):
+        assert client.get("campaign", id=1) == {"campaign": {}}
+    assert "on_response hook" in caplog.text
+    assert "ZeroDivisionError" in caplog.text
+
+
+def test_request_events(client, events):
+    requests.Session.get.return_value = make_response({"campaign": {}})
+    client.get("campaign", id=1)
+    request, response = events
+    assert request.name == "request" and request.attempt == 1
+    assert (request.service_name, request.method) == ("campaign", "GET")
+    assert request.uri.endswith("campaign?id=1")
+    assert response.status_code == 200
+    assert response.bytes == len(b'{"response": {"campaign": {}}}')
+    assert response.elapsed >= 0
+
+
+def test_retry_events(client, events):
+    requests.Session.get.side_effect = [
+        make_response({"error_code": "RATE_EXCEEDED"}, 429,
+                      {"Retry-After": "3"}),
+        make_response({"error_id": "NOAUTH"}, 401),
+        make_response({"campaign": {}}),
+    ]
+    requests.Session.post.return_value = make_response({"token": "new"})
+    client.get("campaign")
+    names = [event.name for event in events]
+    assert names == ["request", "response", "rate_limited", "retry",
+                     "request", "response", "retry", "token_refresh",
+                     "request", "response"]
+    assert events[2].source == "api" and events[2].waiting_time == "3"
+    assert events[3].reason == "RATE_EXCEEDED"
+    assert events[6].reason == "NOAUTH" and events[8].attempt == 3
+
+
+def test_rate_limiter_event(client, events, mocker):
+    client.rate_limiter = mocker.Mock()
+    client.rate_limiter.acquire.return_value = 0.5
+    requests.Session.get.return_value = make_response({"campaign": {}})
+    client.get("campaign")
+    assert events[0].name == "rate_limited"
+    assert events[0].source == "limiter" and events[0].waiting_time == 0.5
+
+
+def test_token_is_not_logged(client, caplog):
+    requests.Session.get.return_value = make_response({"campaign": {}})
+    with caplog.at_level("DEBUG", logger="appnexus-client"):
+        client.get("campaign", id=1)
+    assert "campaign?id=1" in caplog.text
+    assert "secret-token" not in caplog.text
+
+
+def test_metrics(client):
+    metrics = Metrics(buckets=[0.5, 10]).attach(client)
+    requests.Session.get.side_effect = [
+        make_response({"error_code": "RATE_EXCEEDED"}, 429),
+        make_response({"campaign": {}}),
+    ]
+    client.get("campaign")
+    labels = ("campaign", "GET")
+    assert metrics.counters["requests", labels + (200,)] == 1
+    assert metrics.counters["requests", labels + (429,)] == 1
+    assert metrics.counters["retries", labels + ("RATE_EXCEEDED",)] == 1
+    assert metrics.histograms[labels]["count"] == 2
+    text = metrics.to_prometheus()
+    assert ('appnexus_requests_total{service="campaign",method="GET",'
+            'status="200"} 1') in text
+    assert ('appnexus_request_seconds_bucket{service="campaign",'
+            'method="GET",le="+Inf"} 2') in text
+    assert 'appnexus_rate_limited_total{service="campaign"' in text
+    assert text.count("# TYPE appnexus_requests_total counter\n") == 1
+    assert "# HELP appnexus_requests_total " in text
+    assert "# TYPE appnexus_request_seconds histogram\n" in text
+
+
+def test_prometheus_label_values_are_escaped():
+    metrics = Metrics()
+    metrics.record(Event("retry", "campaign", "GET",
+                         reason='a "quoted"\\path\nline'))
+    assert ('appnexus_retries_total{service="campaign",method="GET",'
+            'reason="a \\"quoted\\"\\\\path\\nline"} 1'
+            ) in metrics.to_prometheus()
+
+
+def test_statsd_metrics(client):
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(("127.0.0.1", 0))
+    server.settimeout(5)
+    metrics = StatsdMetrics("127.0.0.1", server.getsockname()[1])
+    metrics.attach(client)
+    requests.Session.get.return_value = make_response({"campaign": {}})
+    client.get("creative/meta")
+    lines = server.recv(1024).decode().splitlines()
+    assert lines[0] == "appnexus.requests.creative_meta.GET.200:1|c"
+    assert lines[1].startswith("appnexus.latency.creative_meta.GET:")
+    metrics.close()
+    server.close()
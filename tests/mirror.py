@@ -0,0 +1,104 @@
+import pytest
+
+from appnexus.client import AppNexusClient
+from appnexus.cursor import Cursor
+from appnexus.mirror import Mirror, MirrorCursor
+from appnexus.model import LineItem
+from appnexus.representations import raw
+
+line_items = [
+    {"id": 1, "state": "active", "advertiser_id": 10,
+     "last_modified": "2024-01-01 00:00:00"},
+    {"id": 2, "state": "inactive", "advertiser_id": 10,
+     "last_modified": "2024-01-02 00:00:00"},
+    {"id": 3, "state": "active", "advertiser_id": 11,
+     "last_modified": "2024-01-03 00:00:00"},
+]
+
+
+@pytest.fixture
+def mirror(tmpdir):
+    return Mirror(str(tmpdir.join("mirror.db")), services=["line-item"])
+
+
+@pytest.fixture
+def client(mocker, mirror):
+    client = AppNexusClient("test", "test", mirror=mirror)
+    mocker.patch.object(client, "get")
+    client.get.return_value = {"count": 3, "start_element": 0,
+                               "num_elements": 3, "line-items": line_items}
+    return client
+
+
+def test_mirror_is_bound_to_the_client(client, mirror):
+    assert mirror.client is client
+
+
+def test_find_is_answered_by_the_mirror(client):
+    cursor = client.find("line-item", state="active", representation=raw)
+    assert isinstance(cursor, MirrorCursor)
+    assert [x["id"] for x in cursor] == [1, 3]
+    assert client.get.call_count == 1
+    cursor = client.find("line-item", advertiser_id=10, representation=raw)
+    assert cursor.count() == 2
+    assert cursor[1]["id"] == 2
+    assert [x["id"] for x in cursor.skip(1)] == [2]
+    assert client.get.call_count == 1
+
+
+def test_mirror_reads_filters_like_the_api(client):
+    cursor = client.find("line-item", id="1,3", representation=raw)
+    assert [x["id"] for x in cursor] == [1, 3]
+    cursor = client.find("line-item", advertiser_id="10", representation=raw)
+    assert [x["id"] for x in cursor] == [1, 2]
+    cursor = client.find("line-item", advertiser_id="10,11", state="active",
+                         representation=raw)
+    assert [x["id"] for x in cursor] == [1, 3]
+    assert client.get.call_count == 1
+
+
+def test_model_find_uses_the_mirror(mocker, client):
+    mocker.patch.object(LineItem, "client", client)
+    line_item = LineItem.find_one(id=3)
+    assert isinstance(line_item, LineItem)
+    assert line_item.advertiser_id == 11
+    assert LineItem.count(state="inactive") == 1
+    assert client.get.call_count == 1
+
+
+def test_unindexed_filters_fall_back_to_the_api(client):
+    assert type(client.find("line-item", name="x", representation=raw)) is \
+        Cursor
+    assert type(client.find("campaign", representation=raw)) is Cursor
+
+
+def test_pages_are_served_by_the_store(client):
+    cursor = client.find("line-item", representation=raw).batch_size(2)
+    pages = list(cursor.iter_pages())
+    assert [page["num_elements"] for page in pages] == [2, 1]
+    assert cursor.first["id"] == 1
+
+
+def test_writes_make_the_service_stale(client, mirror, mocker):
+    client.find("line-item", representation=raw).count()
+    assert not mirror.is_stale("line-item", 3600)
+    mocker.patch.object(client, "_send")
+    client.modify("line-item", {"line-item": {"state": "inactive"}}, id=1)
+    assert mirror.is_stale("line-item", 3600)
+    client.find("line-item", representation=raw).count()
+    _, kwargs = client.get.call_args_list[1]
+    assert kwargs["min_last_modified"] == "2024-01-03 00:00:00"
+
+
+def test_filters_use_indexes(mirror):
+    plan = mirror.store.connection.execute(
+        "EXPLAIN QUERY PLAN SELECT data FROM objects WHERE {}".format(
+            mirror.store._where("line-item", {"state": "active"})[0]),
+        ["line-item", "active"]).fetchall()
+    assert "objects_state" in str(plan)
+
+
+def test_services_max_age():
+    mirror = Mirror(services={"line-item": 60, "campaign": 10})
+    assert mirror.max_ages == {"line-item": 60, "campaign": 10}
+    assert mirror.services == ["line-item", "campaign"]
@@ -1,10 +1,17 @@
 # -*- coding:utf-8-*-
 
+import subprocess
+import sys
+
 import pytest
 
+import appnexus.model
 from appnexus.client import AppNexusClient
 from appnexus.cursor import Cursor
-from appnexus.model import Campaign, Model, Report
+from appnexus.exceptions import ReportError
+from appnexus.model import (BudgetSplitter, Campaign, LineItem, Model, Profile,
+                            Report)
+from appnexus.streaming import StreamedPage
 
 Model.client = AppNexusClient("Test.", "dumb")
 
@@ -131,6 +138,41 @@ def test_guess_composed_service_name():
     assert TestService.service_name == "test-service"
 
 
+def test_models_created_on_first_access():
+    script = ("import appnexus.model as model; "
+              "assert 'Segment' not in vars(model); "
+              "from appnexus import Segment; "
+              "assert vars(model)['Segment'] is Segment")
+    subprocess.check_call([sys.executable, "-c", script])
+
+
+def test_optional_modules_are_imported_on_first_use():
+    script = ("import sys, appnexus; "
+              "loaded = {'appnexus.columns', 'appnexus.export', "
+              "'appnexus.reports', 'appnexus.streaming', "
+              "'concurrent.futures'} & set(sys.modules); "
+              "assert not loaded, loaded")
+    subprocess.check_call([sys.executable, "-c", script])
+
+
+def test_create_models():
+    script = ("import appnexus.model as model; "
+              "model.create_models(['Segment', 'Campaign']); "
+              "assert 'Segment' in vars(model)")
+    subprocess.check_call([sys.executable, "-c", script])
+
+
+def test_get_model():
+    assert appnexus.model.get_model("Campaign") is Campaign
+    assert appnexus.model.get_model("Report") is Report
+    assert appnexus.Creative is appnexus.model.Creative
+    assert "Creative" in dir(appnexus.model)
+    with pytest.raises(AttributeError):
+        appnexus.model.get_model("Unknown")
+    with pytest.raises(AttributeError):
+        appnexus.Unknown
+
+
 def test_setitem():
     x = Campaign(field=1)
     x.field = 42
@@ -176,3 +218,93 @@ def test_changelog():
     assert isinstance(changelogs_cursor, Cursor)
     assert changelogs_cursor.specs.get("resource_id") == x.id
     assert changelogs_cursor.specs.get("service") == x.service_name
+
+
+def test_save_many(mocker):
+    mocker.patch.object(Campaign.client, "create", return_value={"id": 1})
+    mocker.patch.object(Campaign.client, "modify", return_value={"id": 2})
+    campaigns = [Campaign(name="new"), Campaign(id=2, name="changed")]
+    result = Campaign.save_many(campaigns)
+    assert result.succeeded
+    assert Campaign.client.create.called and Campaign.client.modify.called
+    assert campaigns[0].id == 1
+
+
+def test_prefetch_related(mocker):
+    def get(service_name, **kwargs):
+        if service_name == "line-item":
+            objects = [{"id": 1, "profile_id": 10},
+                       {"id": 2, "profile_id": 11},
+                       {"id": 3, "profile_id": None}]
+        elif service_name == "profile":
+            objects = [{"id": id} for id in kwargs["id"]]
+        else:
+            objects = [{"id": 1, "splits": []}]
+        return {"count": len(objects), "start_element": 0,
+                "num_elements": len(objects), service_name: objects}
+
+    client = AppNexusClient("test", "test")
+    mocker.patch.object(client, "get", side_effect=get)
+    for model in (LineItem, Profile, BudgetSplitter):
+        mocker.patch.object(model, "client", client)
+    cursor = LineItem.find().prefetch("profile", "budget_splitter")
+    line_items = [x for x in cursor]
+    assert client.get.call_count == 3
+    _, kwargs = client.get.call_args_list[1]
+    assert kwargs["id"] == [10, 11]
+    _, kwargs = client.get.call_args_list[2]
+    assert kwargs["id"] == [1, 2, 3]
+
+    assert line_items[1].profile.id == 11
+    assert line_items[2].profile is None
+    assert line_items[0].budget_splitter.splits == []
+    assert line_items[1].budget_splitter is None
+    assert client.get.call_count == 3
+    assert isinstance(line_items[0].changelog, Cursor)
+    assert "_related" not in line_items[0].__dict__
+    assert line_items[0] == LineItem(id=1, profile_id=10)
+
+
+def test_prefetch_unknown_relation(mocker, response):
+    client = AppNexusClient("test", "test")
+    mocker.patch.object(client, "get", return_value=response)
+    mocker.patch.object(Campaign, "client", client)
+    with pytest.raises(ValueError):
+        next(iter(Campaign.find().prefetch("budget_splitter")))
+    with pytest.raises(ValueError):
+        next(iter(Campaign.find().prefetch("changelog")))
+
+
+def test_report_iter_rows(mocker):
+    class Download(object):
+        def iter_content(self, chunk_size):
+            yield b"day,imps\n2024-01-01,12\n"
+
+        def close(self):
+            pass
+
+    def get(service_name, **kwargs):
+        if service_name == "report-download":
+            return Download()
+        return {"meta": {"columns": [{"column": "day", "type": "date"},
+                                     {"column": "imps", "type": "int"}]}}
+
+    client = AppNexusClient("test", "test")
+    mocker.patch.object(client, "get", side_effect=get)
+    mocker.patch.object(Report, "client", client)
+    mocker.patch.object(Report, "is_ready", True)
+    report = Report(report_id=1, report_type="network_analytics",
+                    columns=["day", "imps"])
+    assert list(report.iter_rows()) == [{"day": "2024-01-01", "imps": 12}]
+
+
+def test_report_reader_raises_on_json_download(mocker):
+    page = StreamedPage([b'{"response": {"status": "OK"}}'])
+    page.prime()
+    client = AppNexusClient("test", "test")
+    mocker.patch.object(client, "get", return_value=page)
+    mocker.patch.object(Report, "client", client)
+    mocker.patch.object(Report, "is_ready", True)
+    report = Report(report_id=1, report_type="network_analytics")
+    with pytest.raises(ReportError):
+        report.reader(types={})
@@ -0,0 +1,58 @@
+from requests import Session
+
+from appnexus.client import AppNexusClient
+from appnexus.prepared import PreparedRequest, encode_query, encode_value
+from appnexus.representations import raw
+
+
+def test_encode_value():
+    assert encode_value([1, 2, 3]) == "1,2,3"
+    assert encode_value(True) == "true"
+    assert encode_value("a&b c") == "a%26b%20c"
+    assert encode_value("2024-01-01 00:00:00") == "2024-01-01%2000:00:00"
+    assert encode_value("café") == "caf%C3%A9"
+    assert encode_value(["a b", "c=d"]) == "a%20b,c%3Dd"
+
+
+def test_encode_query_is_sorted():
+    assert encode_query({"the": "game", "id": 42}) == "id=42&the=game"
+    assert encode_query({}) == ""
+
+
+def test_prepared_request_adds_parameters():
+    prepared = PreparedRequest("campaign", {"search": "a&b", "id": [1, 2]})
+    assert prepared.query == "id=1,2&search=a%26b"
+    assert prepared.target() == "campaign?id=1,2&search=a%26b"
+    assert (prepared.target(id=[1, 2], search="a&b", start_element=100)
+            == "campaign?id=1,2&search=a%26b&start_element=100")
+    assert PreparedRequest("campaign").target() == "campaign"
+
+
+def test_prepared_request_changed_parameter():
+    prepared = PreparedRequest("campaign", {"search": "a", "id": 1})
+    assert (prepared.target(id=2, start_element=0)
+            == "campaign?id=2&search=a&start_element=0")
+
+
+def test_uri_escapes_values():
+    client = AppNexusClient("test", "test")
+    assert (client._prepare_uri("campaign", search="R&D ads")
+            == client.url + "campaign?search=R%26D%20ads")
+
+
+def test_cursor_pages_use_prepared_request(mocker):
+    client = AppNexusClient("test", "test")
+    client.token = "token"
+    mocker.patch.object(Session, "get")
+    Session.get.return_value.headers = {"Content-Type": "application/json"}
+    Session.get.return_value.json.return_value = {"response": {
+        "status": "OK", "count": 150, "start_element": 0,
+        "num_elements": 100, "campaigns": [{"id": 1}] * 100}}
+    cursor = client.find("campaign", representation=raw, search="a b")
+    cursor.get_page(100)
+    args, _ = Session.get.call_args
+    assert args[0] == (client.url + "campaign?search=a%20b&num_elements=100"
+                       "&start_element=100")
+    prepared = cursor.prepared
+    cursor.get_page(0)
+    assert cursor.prepared is prepared
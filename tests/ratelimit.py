@@ -0,0 +1,95 @@
+import pickle
+
+import pytest
+
+from appnexus.client import AppNexusClient
+from appnexus.ratelimit import FileTokenBucket, RateLimiter, TokenBucket
+
+
+@pytest.fixture
+def clock(mocker):
+    clock = mocker.Mock(return_value=1000.0)
+    mocker.patch.object(TokenBucket, "clock", clock)
+    mocker.patch.object(FileTokenBucket, "clock", clock)
+    return clock
+
+
+def test_bucket_allows_burst_up_to_capacity(clock):
+    bucket = TokenBucket(10, period=60)
+    assert [bucket.reserve() for _ in range(10)] == [0] * 10
+
+
+def test_bucket_spreads_requests_over_period(clock):
+    bucket = TokenBucket(10, period=60)
+    for _ in range(10):
+        bucket.reserve()
+    assert bucket.reserve() == pytest.approx(6)
+    assert bucket.reserve() == pytest.approx(12)
+
+
+def test_bucket_refills_over_time(clock):
+    bucket = TokenBucket(10, period=60)
+    for _ in range(10):
+        bucket.reserve()
+    clock.return_value += 30
+    assert [bucket.reserve() for _ in range(5)] == [0] * 5
+    assert bucket.reserve() > 0
+
+
+def test_bucket_invalid_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+
+
+def test_file_bucket_is_shared(clock, tmpdir):
+    path = str(tmpdir.join("bucket"))
+    first = FileTokenBucket(path, 2, period=60)
+    second = FileTokenBucket(path, 2, period=60)
+    assert first.reserve() == 0
+    assert second.reserve() == 0
+    assert first.reserve() == pytest.approx(30)
+
+
+def test_limiter_separates_reads_and_writes(clock):
+    limiter = RateLimiter.from_limits(reads=1, writes=1)
+    assert limiter.reserve("get") == 0
+    assert limiter.reserve("put") == 0
+    assert limiter.reserve("get") > 0
+    assert limiter.reserve("delete") > 0
+
+
+def test_limiter_without_auth_bucket(clock):
+    limiter = RateLimiter.from_limits(reads=1, writes=1)
+    assert [limiter.reserve("auth") for _ in range(3)] == [0] * 3
+
+
+def test_client_waits_for_limiter(mocker):
+    limiter = mocker.Mock()
+    client = AppNexusClient("test", "test", rate_limiter=limiter)
+    client.token = "token"
+    mocker.patch("requests.Session.send")
+    client.modify("campaign", {})
+    limiter.acquire.assert_called_once_with("put")
+
+
+def test_limiter_shared_between_processes(clock, tmpdir):
+    limiter = RateLimiter(TokenBucket(10), FileTokenBucket(
+        str(tmpdir.join("write")), 5))
+    shared = pickle.loads(pickle.dumps(limiter.shared(str(tmpdir.join("rl")))))
+    assert isinstance(shared.read, FileTokenBucket)
+    assert shared.read.path == str(tmpdir.join("rl.read"))
+    assert (shared.read.rate, shared.read.period) == (10, 60)
+    assert shared.write.path == str(tmpdir.join("write"))
+    assert shared.auth is None
+    other = limiter.shared(str(tmpdir.join("rl")))
+    assert [shared.reserve("get") for _ in range(5)] == [0] * 5
+    assert [other.reserve("get") for _ in range(5)] == [0] * 5
+    assert shared.reserve("get") > 0
+
+
+def test_bucket_can_be_pickled(clock):
+    bucket = TokenBucket(2)
+    bucket.reserve()
+    copy = pickle.loads(pickle.dumps(bucket))
+    assert copy.reserve() == 0
+    assert copy.reserve() > 0
@@ -0,0 +1,207 @@
+import gzip
+import io
+
+import pytest
+
+from appnexus.client import AppNexusClient
+from appnexus.exceptions import ReportError
+from appnexus.reports import (ReportJob, ReportManager, ReportReader,
+                              open_chunks, report_column_types)
+from appnexus.streaming import StreamedPage
+
+csv_content = b"day,imps,clicks\n2024-01-01,10,1\n2024-01-02,20,2\n"
+typed_content = (b"day,imps,cost,country\n2024-01-01,10,1.5,NA\n"
+                 b"2024-01-02,,2,FR\n")
+types = {"day": "date", "imps": "int", "cost": "money", "country": "string"}
+
+
+class FakeDownload(object):
+
+    def __init__(self, content, chunk_size=7):
+        self.content = content
+        self.chunk_size = chunk_size
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), self.chunk_size):
+            yield self.content[start:start + self.chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def manager(mocker, clock):
+    client = AppNexusClient("test", "test")
+    mocker.patch.object(client, "create")
+    mocker.patch.object(client, "get")
+    manager = ReportManager(client, initial_delay=1, max_delay=8)
+    manager.clock = clock
+    manager.sleep = clock.sleep
+    return manager
+
+
+def test_open_chunks():
+    assert open_chunks([b"ab", b"", b"cd"]).read() == b"abcd"
+    compressed = gzip.compress(csv_content)
+    chunks = [compressed[i:i + 5] for i in range(0, len(compressed), 5)]
+    assert open_chunks(chunks).read() == csv_content
+    assert open_chunks([compressed], decompress=False).read() == compressed
+
+
+def test_submit(manager):
+    manager.client.create.side_effect = [{"report_id": "a"},
+                                         {"report_id": "b"}]
+    jobs = manager.submit_many([{"report_type": "network_analytics"}] * 2)
+    assert [job.report_id for job in jobs] == ["a", "b"]
+    args, _ = manager.client.create.call_args
+    assert args == ("report", {"report": {"report_type":
+                                          "network_analytics"}})
+
+
+def test_polling_backs_off(manager, clock):
+    statuses = {"slow": ["pending"] * 5 + ["ready"],
+                "fast": ["pending", "ready"],
+                "failed": ["error"]}
+
+    def get(service_name, id):
+        return {"execution_status": statuses[id].pop(0)}
+
+    manager.client.get.side_effect = get
+    jobs = [ReportJob(id, delay=1) for id in ("slow", "fast", "failed")]
+    done = [job.report_id for job in manager.as_ready(jobs)]
+    assert done == ["failed", "fast", "slow"]
+    assert [job.polls for job in jobs] == [6, 2, 1]
+    assert isinstance(jobs[2].error, ReportError)
+    # the slow report is polled 1, 2, 4, 8, 8 and 8 seconds apart
+    assert clock.now == 1 + 2 + 4 + 8 + 8 + 8
+
+
+def test_polling_timeout(manager):
+    manager.timeout = 10
+    manager.client.get.return_value = {"execution_status": "pending"}
+    job, = manager.wait([ReportJob(1)])
+    assert job.status == "error"
+    with pytest.raises(ReportError):
+        manager.open(job)
+
+
+def test_iter_rows(manager):
+    download = FakeDownload(gzip.compress(csv_content))
+    manager.client.get.return_value = download
+    job = ReportJob(1)
+    job.status = "ready"
+    rows = list(manager.iter_rows(job))
+    assert rows[1] == {"day": "2024-01-02", "imps": "20", "clicks": "2"}
+    _, kwargs = manager.client.get.call_args
+    assert kwargs == {"id": 1, "stream": True}
+    assert download.closed
+
+
+def test_json_download_raises_report_error(mocker, manager):
+    page = StreamedPage([b'{"response": {"status": "OK", "error": "gone"}}'])
+    page.prime()
+    manager.client.get.return_value = page
+    job = ReportJob(1)
+    job.status = "ready"
+    with pytest.raises(ReportError) as error:
+        manager.open(job)
+    assert error.value.reason == "gone"
+
+
+def test_download_all(manager, tmpdir):
+    manager.client.get.side_effect = lambda service_name, **kwargs: (
+        FakeDownload(csv_content) if service_name == "report-download"
+        else {"execution_status": "error" if kwargs["id"] == 2 else "ready"})
+    results = manager.download_all([ReportJob(1), ReportJob(2)], str(tmpdir))
+    assert tmpdir.join("1.csv").read_binary() == csv_content
+    assert results[1] == str(tmpdir.join("1.csv"))
+    assert isinstance(results[2], ReportError)
+
+
+def test_report_column_types(manager):
+    manager.client.get.return_value = {"meta": {"columns": [
+        {"column": "imps", "type": "int"}, {"column": "day", "type": "date"},
+        {"column": "cost", "type": "money"}]}}
+    assert report_column_types(manager.client, "network_analytics",
+                               ["day", "imps", "other"]) == \
+        {"day": "date", "imps": "int", "other": None}
+    manager.client.get.assert_called_with("report", meta="network_analytics")
+
+
+def test_reader_iter_rows():
+    reader = ReportReader(io.BytesIO(typed_content), types)
+    assert list(reader.iter_rows()) == [
+        {"day": "2024-01-01", "imps": 10, "cost": 1.5, "country": "NA"},
+        {"day": "2024-01-02", "imps": None, "cost": 2.0, "country": "FR"},
+    ]
+
+
+def test_reader_iter_chunks():
+    reader = ReportReader(io.BytesIO(csv_content))
+    reader.chunk_size = 1
+    chunks = list(reader.iter_chunks())
+    assert len(chunks) == 2
+    assert chunks[1] == (["day", "imps", "clicks"],
+                         [("2024-01-02",), ("20",), ("2",)])
+
+
+def test_reader_to_numpy():
+    numpy = pytest.importorskip("numpy")
+    reader = ReportReader(io.BytesIO(typed_content + b"2024-01-03,3,4,\n"),
+                          types)
+    reader.chunk_size = 2
+    arrays = reader.to_numpy()
+    assert arrays["cost"].dtype == numpy.float64
+    assert arrays["cost"].tolist() == [1.5, 2.0, 4.0]
+    assert numpy.isnan(arrays["imps"][1]) and arrays["imps"][2] == 3
+    assert arrays["country"].tolist() == ["NA", "FR", ""]
+    reader = ReportReader(io.BytesIO(csv_content), {"imps": "int"})
+    assert reader.to_numpy()["imps"].dtype == numpy.int64
+    assert ReportReader(io.BytesIO(b"")).to_numpy() == {}
+
+
+def test_reader_to_numpy_keeps_hashes():
+    pytest.importorskip("numpy")
+    content = b"day,country\n2024-01-01,a#b\n2024-01-02,#c\n"
+    arrays = ReportReader(io.BytesIO(content)).to_numpy()
+    rows = list(ReportReader(io.BytesIO(content)).iter_rows())
+    assert arrays["country"].tolist() == ["a#b", "#c"]
+    assert arrays["country"].tolist() == [row["country"] for row in rows]
+
+
+def test_reader_to_numpy_quoted_line_breaks():
+    pytest.importorskip("numpy")
+    content = (b'day,imps,country\n2024-01-01,1,"a\nb"\n'
+               b'2024-01-02,2,"c ""d"""\n2024-01-03,3,e\n')
+    reader = ReportReader(io.BytesIO(content), {"imps": "int"})
+    reader.chunk_size = 1
+    arrays = reader.to_numpy()
+    assert arrays["country"].tolist() == ["a\nb", 'c "d"', "e"]
+    assert arrays["imps"].tolist() == [1, 2, 3]
+
+
+def test_reader_to_dataframe():
+    pytest.importorskip("pandas")
+    dataframe = ReportReader(io.BytesIO(typed_content), types).to_dataframe()
+    assert str(dataframe["imps"].dtype) == "Int64"
+    assert dataframe["imps"].isna().tolist() == [False, True]
+    assert dataframe["cost"].tolist() == [1.5, 2.0]
+    assert dataframe["country"].tolist() == ["NA", "FR"]
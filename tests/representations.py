@@ -0,0 +1,67 @@
+import pytest
+
+from appnexus.representations import CompactRepresentation, Record, raw
+
+
+@pytest.fixture
+def client(mocker):
+    client = mocker.Mock()
+    client.meta.return_value = {"fields": [{"name": "id", "type": "int"},
+                                           {"name": "name", "type": "string"},
+                                           {"name": "to_dict"},
+                                           {"name": "class"}]}
+    return client
+
+
+@pytest.fixture
+def compact():
+    return CompactRepresentation()
+
+
+def test_raw(client):
+    obj = {"id": 42}
+    assert raw(client, "campaign", obj) is obj
+
+
+def test_compact_uses_meta_fields(client, compact):
+    record = compact(client, "line-item", {"id": 42, "name": "test"})
+    assert isinstance(record, Record)
+    assert type(record).__name__ == "LineItemRecord"
+    assert type(record)._fields == ("id", "name")
+    assert (record.id, record.name) == (42, "test")
+    assert not hasattr(record, "__dict__")
+
+
+def test_compact_generates_one_class_per_service(client, compact):
+    first = compact(client, "campaign", {"id": 1})
+    second = compact(client, "campaign", {"id": 2})
+    assert type(first) is type(second)
+    assert client.meta.call_count == 1
+
+
+def test_compact_unknown_fields(client, compact):
+    record = compact(client, "campaign", {"id": 1, "state": "active",
+                                          "class": "x"})
+    assert record.state == "active"
+    assert record.missing is None
+    assert record.to_dict() == {"id": 1, "state": "active", "class": "x"}
+
+
+def test_compact_setattr(client, compact):
+    record = compact(client, "campaign", {"id": 1})
+    record.name = "named"
+    record.other = True
+    assert record.to_dict() == {"id": 1, "name": "named", "other": True}
+
+
+def test_compact_without_meta_fields(client, compact):
+    client.meta.return_value = {}
+    record = compact(client, "campaign", {"id": 1, "name": "test"})
+    assert type(record)._fields == ("id", "name")
+
+
+def test_compact_equality(client, compact):
+    assert compact(client, "campaign", {"id": 1}) == \
+        compact(client, "campaign", {"id": 1})
+    with pytest.raises(TypeError):
+        hash(compact(client, "campaign", {"id": 1}))
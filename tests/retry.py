@@ -0,0 +1,187 @@
+import pytest
+import requests
+from requests import Session
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from appnexus.client import AppNexusClient
+from appnexus.exceptions import CircuitOpen, ServerError
+from appnexus.instrumentation import Metrics
+from appnexus.retry import CircuitBreaker, RetryPolicy
+from appnexus.utils import BufferedResponse
+
+
+def json_response(data, status_code=200):
+    return BufferedResponse(status_code, {"Content-Type": "application/json"},
+                            ('{"response": %s}' % data).encode())
+
+
+def html_response(status_code):
+    return BufferedResponse(status_code, {"Content-Type": "text/html"},
+                            b"<html>Bad gateway</html>")
+
+
+@pytest.fixture
+def clock(mocker):
+    clock = mocker.Mock(return_value=1000.0)
+    mocker.patch.object(CircuitBreaker, "clock", clock)
+    return clock
+
+
+@pytest.fixture
+def policy(mocker):
+    policy = RetryPolicy(jitter=False)
+    mocker.patch.object(policy, "sleep")
+    return policy
+
+
+@pytest.fixture
+def client(policy):
+    client = AppNexusClient("test", "test", retry_policy=policy)
+    client.token = "token"
+    return client
+
+
+def test_delays_grow_exponentially():
+    policy = RetryPolicy(initial_delay=1, max_delay=5, jitter=False)
+    assert [policy.delay(attempt) for attempt in range(1, 6)] == \
+        [1, 2, 4, 5, 5]
+
+
+def test_delays_are_jittered(mocker):
+    policy = RetryPolicy(initial_delay=1)
+    uniform = mocker.patch.object(policy, "uniform", return_value=0.3)
+    assert policy.delay(3) == 0.3
+    uniform.assert_called_with(0, 4)
+
+
+def test_should_retry():
+    policy = RetryPolicy(max_attempts=3)
+    assert policy.should_retry("get", 1, "TIMEOUT")
+    assert not policy.should_retry("GET", 3, "TIMEOUT")
+    assert not policy.should_retry("POST", 1, "TIMEOUT")
+    assert policy.should_retry("POST", 1, "CONNECT_TIMEOUT")
+    assert not policy.should_retry("PUT", 1, "TIMEOUT", idempotent=False)
+    assert policy.should_retry("PUT", 1, "CONNECT_ERROR", idempotent=False)
+    assert policy.status_reason(503) == "HTTP_503"
+    assert policy.status_reason(404) is None
+
+
+def test_circuit_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    assert not breaker.record_failure("campaign")
+    assert breaker.record_failure("campaign")
+    assert breaker.state("campaign") == "open"
+    with pytest.raises(CircuitOpen) as error:
+        breaker.check("campaign")
+    assert error.value.retry_after == 30
+    breaker.check("advertiser")
+
+    clock.return_value += 30
+    assert breaker.state("campaign") == "half-open"
+    breaker.check("campaign")
+    with pytest.raises(CircuitOpen):
+        breaker.check("campaign")
+    breaker.record_success("campaign")
+    assert breaker.state("campaign") == "closed"
+    breaker.check("campaign")
+
+
+def test_retry_server_errors(mocker, client, policy):
+    get = mocker.patch.object(Session, "get", side_effect=[
+        html_response(502), html_response(503),
+        json_response('{"campaign": {"id": 1}}')])
+    assert client.get("campaign", id=1) == {"campaign": {"id": 1}}
+    assert get.call_count == 3
+    assert [args[0] for args, _ in policy.sleep.call_args_list] == [0.5, 1]
+    _, kwargs = get.call_args
+    assert kwargs["timeout"] == policy.timeout
+
+
+def test_server_error_after_max_attempts(mocker, client):
+    get = mocker.patch.object(Session, "get", return_value=html_response(502))
+    with pytest.raises(ServerError) as error:
+        client.get("campaign")
+    assert "502" in str(error.value)
+    assert get.call_count == 4
+
+
+def test_retry_timeouts(mocker, client):
+    mocker.patch.object(Session, "get", side_effect=[
+        requests.ReadTimeout(), requests.ConnectionError(),
+        json_response('{"campaign": {}}')])
+    assert client.get("campaign") == {"campaign": {}}
+
+
+def test_create_is_retried_when_the_connection_is_refused(mocker, client):
+    refused = requests.ConnectionError(MaxRetryError(
+        None, "/campaign", NewConnectionError(None, "Connection refused")))
+    post = mocker.patch.object(Session, "post", side_effect=[
+        refused, json_response('{"id": 1}')])
+    assert client.create("campaign", {"campaign": {}}) == {"id": 1}
+    assert post.call_count == 2
+
+
+def test_certificate_errors_are_not_retried(mocker, client):
+    get = mocker.patch.object(Session, "get",
+                              side_effect=requests.exceptions.SSLError())
+    with pytest.raises(requests.exceptions.SSLError):
+        client.get("campaign")
+    assert get.call_count == 1
+
+
+def test_create_is_not_retried_after_sending(mocker, client):
+    post = mocker.patch.object(Session, "post", side_effect=[
+        requests.ReadTimeout(), requests.ConnectTimeout(),
+        json_response('{"id": 1}')])
+    with pytest.raises(requests.ReadTimeout):
+        client.create("campaign", {"campaign": {}})
+    assert post.call_count == 1
+    assert client.create("campaign", {"campaign": {}}) == {"id": 1}
+
+
+def test_append_is_not_retried_after_sending(mocker, client):
+    put = mocker.patch.object(Session, "put", side_effect=[
+        html_response(503), requests.ConnectTimeout(),
+        json_response('{"id": 1}')])
+    with pytest.raises(ServerError):
+        client.append("campaign", {"campaign": {}}, id=1)
+    assert put.call_count == 1
+    assert client.append("campaign", {"campaign": {}}, id=1) == {"id": 1}
+    assert put.call_count == 3
+
+
+def test_other_errors_are_raised(mocker, client):
+    get = mocker.patch.object(Session, "get",
+                              side_effect=requests.TooManyRedirects())
+    with pytest.raises(requests.TooManyRedirects):
+        client.get("campaign")
+    assert get.call_count == 1
+
+
+def test_circuit_opens_on_repeated_failures(mocker, clock):
+    policy = RetryPolicy(max_attempts=1, failure_threshold=2)
+    client = AppNexusClient("test", "test", retry_policy=policy)
+    client.token = "token"
+    events = []
+    client.on_circuit_open(events.append)
+    get = mocker.patch.object(Session, "get", return_value=html_response(503))
+    for _ in range(2):
+        with pytest.raises(ServerError):
+            client.get("campaign")
+    assert [event.service_name for event in events] == ["campaign"]
+    with pytest.raises(CircuitOpen):
+        client.get("campaign")
+    assert get.call_count == 2
+
+    clock.return_value += policy.circuit_breaker.reset_timeout
+    get.return_value = json_response('{"campaign": {}}')
+    assert client.get("campaign") == {"campaign": {}}
+    assert policy.circuit_breaker.state("campaign") == "closed"
+
+
+def test_retries_are_measured(mocker, client):
+    metrics = Metrics().attach(client)
+    mocker.patch.object(Session, "get", side_effect=[
+        requests.ReadTimeout(), json_response('{"campaign": {}}')])
+    client.get("campaign")
+    assert metrics.counters["retries", ("campaign", "GET", "TIMEOUT")] == 1
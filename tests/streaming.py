@@ -0,0 +1,71 @@
+# -*- coding:utf-8-*-
+import json
+
+import pytest
+
+from appnexus.cursor import Cursor
+from appnexus.streaming import StreamedPage
+
+
+@pytest.fixture
+def response():
+    return {
+        "response": {
+            "status": "OK",
+            "count": 3,
+            "start_element": 0,
+            "campaigns": [
+                {"id": 1, "name": "quote \" and [brackets{"},
+                {"id": 2, "labels": [{"value": "]"}], "empty": []},
+                {"id": 3, "name": u"unicodé"},
+            ],
+            "num_elements": 3,
+            "dbg_info": {"time": 12.5},
+        }
+    }
+
+
+def chunked(response, size):
+    content = json.dumps(response, ensure_ascii=False).encode("utf-8")
+    return [content[i:i + size] for i in range(0, len(content), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 16, 4096])
+def test_streamed_page_yields_elements(response, size):
+    page = StreamedPage(chunked(response, size), Cursor.common_keys)
+    assert list(page) == response["response"]["campaigns"]
+    assert page.data_key == "campaigns"
+    assert page.page["count"] == 3
+    assert page.page["dbg_info"] == {"time": 12.5}
+
+
+def test_prime_reads_up_to_data(response):
+    page = StreamedPage(chunked(response, 8), Cursor.common_keys)
+    assert page.prime() == {"status": "OK", "count": 3, "start_element": 0}
+    assert len(list(page)) == 3
+
+
+def test_prime_reads_errors():
+    response = {"response": {"error_id": "NOAUTH", "error": "expired"}}
+    page = StreamedPage(chunked(response, 8), Cursor.common_keys)
+    assert page.prime() == response["response"]
+    assert list(page) == []
+
+
+def test_single_object(response):
+    response = {"response": {"status": "OK", "campaign": {"id": 1}}}
+    page = StreamedPage(chunked(response, 8), Cursor.common_keys)
+    assert list(page) == [{"id": 1}]
+
+
+def test_close_is_called(mocker, response):
+    close = mocker.Mock()
+    page = StreamedPage(chunked(response, 8), Cursor.common_keys, close)
+    list(page)
+    assert close.call_count == 1
+
+
+def test_truncated_response(response):
+    page = StreamedPage(chunked(response, 8)[:-3], Cursor.common_keys)
+    with pytest.raises(ValueError):
+        list(page)
@@ -0,0 +1,104 @@
+import pytest
+
+from appnexus.client import AppNexusClient
+from appnexus.sync import SQLiteStore, Synchronizer
+
+
+def page(objects, count=None):
+    return {"count": len(objects) if count is None else count,
+            "start_element": 0, "num_elements": len(objects),
+            "line-items": objects}
+
+
+@pytest.fixture
+def store(tmpdir):
+    return SQLiteStore(str(tmpdir.join("store.db")))
+
+
+@pytest.fixture
+def client(mocker):
+    client = AppNexusClient("test", "test")
+    mocker.patch.object(client, "get")
+    return client
+
+
+@pytest.fixture
+def synchronizer(client, store):
+    return Synchronizer(client, store, services=["line-item"])
+
+
+def test_store_find(store):
+    store.upsert("line-item", [
+        {"id": 1, "state": "active", "advertiser_id": 10},
+        {"id": 2, "state": "inactive", "advertiser_id": 10},
+        {"id": 3, "state": "active", "advertiser_id": 11},
+    ])
+    assert [x["id"] for x in store.find("line-item", state="active")] == [1, 3]
+    assert [x["id"] for x in store.find("line-item", advertiser_id=[11])] == \
+        [3]
+    assert store.find_one("line-item", id=2)["state"] == "inactive"
+    assert store.find("campaign") == []
+    assert store.count("line-item", advertiser_id=10) == 2
+
+
+def test_first_sync_is_full(synchronizer, client, store):
+    client.get.return_value = page([
+        {"id": 1, "last_modified": "2024-01-01 00:00:00"},
+        {"id": 2, "last_modified": "2024-01-02 00:00:00"},
+    ])
+    result = synchronizer.sync("line-item")
+    assert result.full and result.updated == 2
+    _, kwargs = client.get.call_args
+    assert "min_last_modified" not in kwargs
+    assert store.watermark("line-item")[0] == "2024-01-02 00:00:00"
+
+
+def test_incremental_sync(synchronizer, client, store):
+    store.upsert("line-item", [{"id": 1, "name": "old"}, {"id": 2}])
+    store.set_watermark("line-item", "2024-01-02 00:00:00")
+    client.get.side_effect = [
+        page([{"id": 1, "name": "new",
+               "last_modified": "2024-01-03 00:00:00"}]),
+        page([{"id": 1}]),
+    ]
+    result = synchronizer.sync()[0]
+    assert (result.updated, result.deleted) == (1, 1)
+    _, kwargs = client.get.call_args_list[0]
+    assert kwargs["min_last_modified"] == "2024-01-02 00:00:00"
+    _, kwargs = client.get.call_args_list[1]
+    assert kwargs["fields"] == "id"
+    assert store.find("line-item") == [
+        {"id": 1, "name": "new", "last_modified": "2024-01-03 00:00:00"}]
+    assert store.watermark("line-item")[0] == "2024-01-03 00:00:00"
+
+
+def test_deletions_are_reconciled_periodically(mocker, synchronizer,
+                                               client, store):
+    clock = mocker.patch("time.time", return_value=1000)
+    modified = "2024-01-01 00:00:00"
+    client.get.return_value = page([{"id": 1, "last_modified": modified},
+                                    {"id": 2, "last_modified": modified}])
+    assert synchronizer.sync("line-item").full
+    client.get.return_value = page([{"id": 1, "last_modified": modified}])
+    clock.return_value += 3600
+    assert synchronizer.sync("line-item").deleted == 0
+    assert client.get.call_count == 2
+    assert synchronizer.sync("line-item", reconcile=True).deleted == 1
+    assert client.get.call_count == 4
+    _, kwargs = client.get.call_args
+    assert kwargs["fields"] == "id"
+
+    store.upsert("line-item", [{"id": 2}])
+    clock.return_value += synchronizer.reconcile_interval
+    assert synchronizer.sync("line-item").deleted == 1
+    synchronizer.detect_deletions = False
+    clock.return_value += synchronizer.reconcile_interval
+    assert synchronizer.sync("line-item").deleted == 0
+    assert client.get.call_count == 7
+
+
+def test_find_syncs_stale_services(mocker, synchronizer, client):
+    client.get.return_value = page([{"id": 1}])
+    assert synchronizer.find("line-item", max_age=60) == [{"id": 1}]
+    assert synchronizer.find_one("line-item", max_age=60) == {"id": 1}
+    assert client.get.call_count == 1